@@ -19,6 +19,7 @@ const VideoUploadModal = ({ isOpen, onClose, onUpload }) => {
   const [videoDate, setVideoDate] = useState('');
   const [startTime, setStartTime] = useState('');
   const [endTime, setEndTime] = useState('');
+  const [analysisOnly, setAnalysisOnly] = useState(false);
 
   // Load locations when modal opens
   useEffect(() => {
@@ -225,6 +226,7 @@ const VideoUploadModal = ({ isOpen, onClose, onUpload }) => {
     if (startTime) formData.append('start_time', startTime);
     if (endTime) formData.append('end_time', endTime);
     if (locationId) formData.append('location_id', locationId);
+    if (analysisOnly) formData.append('analysis_only', 'true');
 
     try {
       // ✅ FIXED: Use correct API endpoint
@@ -274,6 +276,7 @@ const VideoUploadModal = ({ isOpen, onClose, onUpload }) => {
     setVideoDate('');
     setStartTime('');
     setEndTime('');
+    setAnalysisOnly(false);
     setUploadId(null);
     onClose();
   };
@@ -478,6 +481,18 @@ const VideoUploadModal = ({ isOpen, onClose, onUpload }) => {
           </select>
         </div>
         
+        <div style={{ marginBottom: '24px' }}>
+          <label style={{ display: 'flex', alignItems: 'center', gap: '8px', fontSize: '14px' }}>
+            <input 
+              type="checkbox" 
+              checked={analysisOnly}
+              onChange={(e) => setAnalysisOnly(e.target.checked)}
+              disabled={uploading || isProcessing}
+            />
+            Counts only (skip the annotated video, faster)
+          </label>
+        </div>
+        
         {uploadResult && !isProcessing && (
           <div style={{
             marginBottom: '16px',
@@ -120,6 +120,7 @@ function AnalysisResults() {
     const statusConfig = {
       'completed': { color: '#10b981', text: 'Completed' },
       'processing': { color: '#f59e0b', text: 'Processing' },
+      'queued': { color: '#3b82f6', text: 'Queued' },
       'failed': { color: '#ef4444', text: 'Failed' },
       'uploaded': { color: '#6b7280', text: 'Uploaded' }
     };
@@ -1,16 +1,37 @@
 # ml/baliwasan_yjunction_detector.py
 import cv2
-from ultralytics import YOLO
 import os
 import numpy as np
 import time
 from collections import defaultdict, deque
 import threading
+import torch
+from .video_pipeline import VideoPipeline
+from .batched_inference import BatchedTracker
+from .model_registry import model_registry
+from .detection_store import DetectionRecorder, DetectionReplay, detections_output_path
+from .counting_zones import CountingGeometry
+from .detection_batch import DetectionBatch
+from .overlay_renderer import OverlaySprite, TextSprites, blend_rect, draw_label
+from .frame_source import FrameSource, roi_around, roi_from_fractions
+from .tiled_inference import TileLayout
+from .inference_backend import backend_available
+from .checkpoints import AnalysisCheckpoint, checkpoint_dir
 
 class BaliwasanYJunctionDetector:
-    def __init__(self, model_path='yolov8x.pt'):
-        print("🚀 Initializing YOLO model for Baliwasan Y-Junction...")
-        self.model = YOLO(model_path)
+    def __init__(self, model_path='yolov8x.pt', pipelined=True, analysis_only=False, counting_zones=None,
+                 hw_decode=False, frame_roi=None, decode_width=None, tile_size=None, tile_overlap=0.2,
+                 inference_backend='torch', int8=False, inference_threads=None, checkpoint_interval=60):
+        # Shared weights, loaded on first use; this detector's ByteTrack state lives in self.tracker
+        self.model_path = model_path
+        self._shared_model = None
+        # 'torch', or a cached ONNX Runtime / OpenVINO export running on the CPU (see ml.inference_backend)
+        if not backend_available(inference_backend):
+            print(f"⚠️ {inference_backend} runtime is not installed - using PyTorch inference")
+            inference_backend = 'torch'
+        self.inference_backend = inference_backend
+        self.int8 = int8
+        self.inference_threads = inference_threads
         self.vehicle_classes = [2, 3, 5, 7]  # car, motorcycle, bus, truck
         
         # Vehicle type colors and names
@@ -27,55 +48,250 @@ class BaliwasanYJunctionDetector:
             5: "Bus",
             7: "Truck"
         }
+        # Drawing gets class names, so look colors up by name directly
+        self.name_colors = {name: self.vehicle_colors[class_id] for class_id, name in self.vehicle_names.items()}
         
         # Tracking variables (will be reset for each video)
         self.track_history = None
         self.vehicle_status = None
         self.vehicle_type_counts = None
         self.vehicle_crossed = None
+        self.tracker = None
         self.frame_count = 0
         self.total_count = 0
+        self.pipelined = pipelined
+        # Counts only: never annotate or encode a processed video
+        self.analysis_only = analysis_only
+        # Location zones / count lines replace the fixed sloped line when configured
+        self.counting_zones = counting_zones
+        self.counting_geometry = CountingGeometry.from_config(counting_zones)
+        self.approach_counts = defaultdict(lambda: defaultdict(int))
+        # Line, zone labels and title are rendered once per video; labels come from a sprite cache
+        self.static_layer = None
+        self.text_sprites = TextSprites()
+        # Decode settings: None = whole frame, 'zone' = around the counting line, or
+        # [left, top, right, bottom] fractions; decode_width shrinks the crop for inference
+        self.hw_decode = hw_decode
+        self.frame_roi = frame_roi
+        self.decode_width = decode_width
+        # Tiles of tile_size native pixels over the counting band replace the single 640px pass
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_layout = None
+        # Wall-clock seconds between checkpoints a failed analysis resumes from (0 = off)
+        self.checkpoint_interval = checkpoint_interval
         
         print("✅ Baliwasan Y-Junction Detector initialized successfully")
 
-    def analyze_video(self, video_path, progress_tracker=None, save_output=True):
-        """Main method to analyze video - compatible with Django system"""
-        print(f"🎯 Starting Baliwasan Y-Junction analysis: {video_path}")
+    @property
+    def shared_model(self):
+        if self._shared_model is None:
+            print("🚀 Initializing YOLO model for Baliwasan Y-Junction...")
+            device = 'cuda' if torch.cuda.is_available() and self.inference_backend == 'torch' else 'cpu'
+            self._shared_model = model_registry.get(
+                self.model_path, device, 640, backend=self.inference_backend, int8=self.int8,
+                threads=self.inference_threads
+            )
+        return self._shared_model
+
+    @property
+    def model(self):
+        return self.shared_model.model
+
+    def _setup_counting_line(self, width, height):
+        """Counting line and zone for the Baliwasan Y-Junction camera view"""
+        OFFSET_Y = -90
+        self.line_start = (0, int(height * 0.45) + OFFSET_Y)
+        self.line_end = (width - 1, int(height * 0.38) + OFFSET_Y)
         
-        # Initialize tracking for this video
+        # Create counting zone (buffer area around the line)
+        ZONE_BUFFER = 25  # pixels
+        self.counting_zone_top = self.line_start[1] - ZONE_BUFFER
+        self.counting_zone_bottom = self.line_start[1] + ZONE_BUFFER
+
+        # Line height for every pixel column, computed once instead of per detection
+        x1_l, y1_l = self.line_start
+        x2_l, y2_l = self.line_end
+        slope = (y2_l - y1_l) / (x2_l - x1_l) if x2_l != x1_l else 0
+        self.line_y_lookup = y1_l + slope * (np.arange(width) - x1_l)
+
+        if self.counting_geometry is not None:
+            self.counting_geometry.bind(width, height)
+        self.static_layer = OverlaySprite((width, height), lambda canvas, _: self._draw_static_layer(canvas))
+
+    def _counting_bounds(self, width):
+        """Rectangle around the configured zones, or around the sloped line plus its counting band"""
+        if self.counting_geometry is not None:
+            return self.counting_geometry.bounds()
+        band = self.counting_zone_bottom - self.line_start[1]
+        return {
+            'left': 0, 'right': width - 1,
+            'top': max(0, min(self.line_start[1], self.line_end[1]) - band),
+            'bottom': max(self.line_start[1], self.line_end[1]) + band
+        }
+
+    def _configure_frame_view(self, source):
+        """Crop / shrink decoded frames and lay out inference tiles as configured"""
+        frame_size = (source.width, source.height)
+        zone = self._counting_bounds(source.width)
+        roi = None
+        if self.frame_roi == 'zone':
+            roi = roi_around((zone['left'], zone['top'], zone['right'], zone['bottom']), frame_size)
+        elif self.frame_roi:
+            roi = roi_from_fractions(self.frame_roi, frame_size)
+        source.set_view(roi, self.decode_width)
+        self.tracker.set_view(source)
+        self.tracker.set_frame_rate(source.fps)
+        if source.reduced:
+            print(f"✂️ Inference view: {source.view_size[0]}x{source.view_size[1]} "
+                  f"from region {source.roi} of {source.width}x{source.height}")
+
+        # Computed once per video: tiles over the counting band, in inference-view pixels
+        self.tile_layout = None
+        if self.tile_size:
+            self.tile_layout = TileLayout(source.view_size, source.zone_to_view(zone), self.tile_size, self.tile_overlap)
+            print(f"🧩 Tiled inference: {len(self.tile_layout)} tiles of {self.tile_layout.tile_size}px")
+        self.tracker.tile_layout = self.tile_layout
+
+    def _draw_static_layer(self, canvas):
+        """Counting line (or configured zones) and panel title; the same on every frame"""
+        if self.counting_geometry is not None:
+            self.counting_geometry.draw(canvas, (0, 0, 255))
+        else:
+            # Draw counting line with better visibility
+            cv2.line(canvas, self.line_start, self.line_end, (0, 0, 255), 4)
+            cv2.putText(canvas, "COUNTING LINE", (self.line_start[0], self.line_start[1] - 15), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        cv2.putText(canvas, "BALIWASAN Y-JUNCTION ANALYSIS", (20, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+    def _annotate_frame(self, frame, frame_count, fps, total_current_vehicles, detections, overlay_state):
+        """Zone band, counting line and detection info, drawn in place"""
+        if self.counting_geometry is None:
+            # Draw counting zone background for better visibility (blended over the band only)
+            blend_rect(frame, (0, self.counting_zone_top), (frame.shape[1], self.counting_zone_bottom),
+                       (0, 100, 0), 0.2)
+        self.static_layer.paste(frame)
+
+        # Draw detection information
+        return self.draw_detection_info(frame, detections, frame_count, fps, total_current_vehicles, overlay_state)
+
+    def _reset_tracking(self):
+        """Fresh counts and ByteTrack state for a new video or stream"""
         self.track_history = defaultdict(lambda: deque(maxlen=30))
         self.vehicle_status = {}
         self.vehicle_type_counts = defaultdict(int)
         self.vehicle_crossed = set()
+        self.approach_counts = defaultdict(lambda: defaultdict(int))
         self.frame_count = 0
         self.total_count = 0
+        self.tracker = BatchedTracker(
+            self.model, conf=0.4, classes=self.vehicle_classes,
+            device=None if self.inference_backend == 'torch' else 'cpu',
+            tracker="bytetrack.yaml", imgsz=640, lock=self.shared_model.lock, class_names=self.vehicle_names
+        )
+
+    def _checkpoint_key(self):
+        """Settings a checkpoint is only valid for"""
+        return ('BaliwasanYJunctionDetector', self.model_path, repr(self.counting_zones), self.frame_roi,
+                self.decode_width, self.tile_size, self.tile_overlap, self.inference_backend, self.int8)
+
+    def _checkpoint_state(self):
+        """Counting and tracking state, pickled by ml.checkpoints"""
+        return {
+            'track_history': dict(self.track_history),
+            'vehicle_status': self.vehicle_status,
+            'vehicle_type_counts': dict(self.vehicle_type_counts),
+            'vehicle_crossed': self.vehicle_crossed,
+            'approach_counts': {approach: dict(counts) for approach, counts in self.approach_counts.items()},
+            'frame_count': self.frame_count,
+            'total_count': self.total_count,
+            'geometry': self.counting_geometry.get_state() if self.counting_geometry is not None else None,
+            'tracker': self.tracker.tracker
+        }
+
+    def _restore_checkpoint_state(self, state):
+        self.track_history = defaultdict(lambda: deque(maxlen=30), state['track_history'])
+        self.vehicle_status = state['vehicle_status']
+        self.vehicle_type_counts = defaultdict(int, state['vehicle_type_counts'])
+        self.vehicle_crossed = state['vehicle_crossed']
+        self.approach_counts = defaultdict(lambda: defaultdict(int), {
+            approach: defaultdict(int, counts) for approach, counts in state['approach_counts'].items()
+        })
+        self.frame_count = state['frame_count']
+        self.total_count = state['total_count']
+        if self.counting_geometry is not None:
+            self.counting_geometry.set_state(state['geometry'])
+        self.tracker.tracker = state['tracker']
+
+    def start_stream(self, source):
+        """Reset tracking and set up the counting line and decode view for a stream (see ml.stream_analysis)"""
+        self._reset_tracking()
+        self._setup_counting_line(source.width, source.height)
+        self._configure_frame_view(source)
+
+    def process_stream_frame(self, frame, frame_number):
+        """Count one stream frame; returns vehicles in the zone and the frame's detections"""
+        self.frame_count = frame_number + 1
+        current_counts, detections = self.process_frame(frame, self.frame_count)
+        return sum(current_counts.values()), detections
+
+    def counted_totals(self):
+        return {self.vehicle_names[class_id].lower(): count for class_id, count in self.vehicle_type_counts.items()}
+
+    def forget_tracks(self, track_ids):
+        """Drop the state of tracks that left the stream for good"""
+        for track_id in track_ids:
+            self.track_history.pop(track_id, None)
+            self.vehicle_status.pop(track_id, None)
+            self.vehicle_crossed.discard(track_id)
+        if self.counting_geometry is not None:
+            self.counting_geometry.forget(track_ids)
+
+    def analyze_video(self, video_path, progress_tracker=None, save_output=True, pipelined=None):
+        """Main method to analyze video - compatible with Django system"""
+        print(f"🎯 Starting Baliwasan Y-Junction analysis: {video_path}")
+        if self.analysis_only and save_output:
+            print("ℹ️  Analysis-only profile: skipping annotation and video encoding")
+            save_output = False
+        pipelined = self.pipelined if pipelined is None else pipelined
+        
+        # Initialize tracking for this video
+        self._reset_tracking()
         
         if progress_tracker:
             progress_tracker.set_progress(10, "Opening video file...")
         
         # Open the provided video path (not hardcoded)
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
+        source = FrameSource(video_path, self.hw_decode)
+        if not source.isOpened():
             error_msg = f"❌ Error: Could not open video file: {video_path}"
             print(error_msg)
             raise Exception(error_msg)
 
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width, height = source.width, source.height
+        fps = source.fps
+        total_frames = source.total_frames
 
         print(f"📊 Video Info: {width}x{height}, {fps:.1f} FPS, {total_frames} frames")
 
         # Setup counting zone for Baliwasan Y-Junction
-        OFFSET_Y = -90
-        self.line_start = (0, int(height * 0.45) + OFFSET_Y)
-        self.line_end = (width - 1, int(height * 0.38) + OFFSET_Y)
-        
-        # Create counting zone (buffer area around the line)
-        ZONE_BUFFER = 25  # pixels
-        self.counting_zone_top = self.line_start[1] - ZONE_BUFFER
-        self.counting_zone_bottom = self.line_start[1] + ZONE_BUFFER
+        self._setup_counting_line(width, height)
+        self._configure_frame_view(source)
+
+        # Compact detections so the annotated video can be rendered later, on demand
+        recorder = DetectionRecorder(self, fps, width, height)
+        # A previous run of this video that failed resumes from its last checkpoint
+        checkpoint, start_frame, resumed_elapsed = None, 0, 0.0
+        if self.checkpoint_interval:
+            checkpoint = AnalysisCheckpoint(checkpoint_dir(video_path, self._checkpoint_key()), self.checkpoint_interval)
+            restored = checkpoint.load(recorder)
+            if restored is not None:
+                start_frame, state = restored
+                resumed_elapsed = state['elapsed']
+                self._restore_checkpoint_state(state)
+                source.seek(start_frame)
+                print(f"♻️ Resuming Baliwasan analysis from checkpoint at frame {start_frame}/{total_frames}")
 
         # Setup output video if requested - LIKE RTXVehicleDetector
         output_video_path = None
@@ -89,63 +305,77 @@ class BaliwasanYJunctionDetector:
             output_filename = f"baliwasan_processed_{name_without_ext}_{timestamp}.mp4"
             output_video_path = os.path.join('media/processed_videos', output_filename)
             
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
-            print(f"💾 Saving output to: {output_video_path}")
+            if start_frame:
+                # Frames before the checkpoint were never encoded; the whole video is drawn from detections at the end
+                print(f"💾 Output will be rendered from stored detections: {output_video_path}")
+            else:
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
+                print(f"💾 Saving output to: {output_video_path}")
 
         if progress_tracker:
             progress_tracker.set_progress(20, "Starting vehicle detection...")
 
-        print(f"📏 Counting line: {self.line_start} to {self.line_end}")
+        if self.counting_geometry is not None:
+            print(f"📏 Counting approaches: {', '.join(self.counting_geometry.approaches)}")
+        else:
+            print(f"📏 Counting line: {self.line_start} to {self.line_end}")
         print("🎯 Starting vehicle counting...")
 
         processing_times = []
-        analysis_start = time.time()
-
-        # Main processing loop
-        while cap.isOpened():
-            frame_start = time.time()
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            self.frame_count += 1
-            frame_copy = frame.copy()
-            
-            # Draw counting zone background for better visibility
-            zone_overlay = frame_copy.copy()
-            cv2.rectangle(zone_overlay, (0, self.counting_zone_top), (width, self.counting_zone_bottom), (0, 100, 0), -1)
-            cv2.addWeighted(zone_overlay, 0.2, frame_copy, 0.8, 0, frame_copy)
-            
-            # Draw counting line with better visibility
-            cv2.line(frame_copy, self.line_start, self.line_end, (0, 0, 255), 4)
-            cv2.putText(frame_copy, "COUNTING LINE", (self.line_start[0], self.line_start[1] - 15), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-
-            # Process frame
-            current_counts, detections = self.process_frame(frame, self.frame_count)
-            
-            # Draw detection information
-            annotated_frame = self.draw_detection_info(
-                frame_copy, detections, self.frame_count, fps, sum(current_counts.values())
+        analysis_start = time.time() - resumed_elapsed
+
+        def infer(frames, first_frame_number):
+            results = []
+            for frame in frames:
+                frame_start = time.time()
+                self.frame_count += 1
+
+                # Process frame
+                current_counts, detections = self.process_frame(frame, self.frame_count)
+
+                # Calculate processing time
+                processing_times.append(time.time() - frame_start)
+                recorder.add_frame(
+                    self.frame_count - 1, self.frame_count, sum(current_counts.values()),
+                    self.total_count, detections, active_tracks=len(self.track_history)
+                )
+
+                # Update progress
+                if progress_tracker and self.frame_count % 10 == 0:
+                    progress = min(90, 20 + int((self.frame_count / total_frames) * 70))
+                    message = f"Processing frame {self.frame_count}/{total_frames} - Count: {self.total_count}"
+                    progress_tracker.set_progress(progress, message)
+
+                # Overlay values captured now, before later frames update the tracker
+                overlay_state = None
+                if out is not None:
+                    overlay_state = {'total_count': self.total_count, 'active_tracks': len(self.track_history)}
+                results.append((self.frame_count, current_counts, detections, overlay_state))
+
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(
+                    self.frame_count, dict(self._checkpoint_state(), elapsed=time.time() - analysis_start), recorder
+                )
+            return results
+
+        def annotate(frame, frame_number, result):
+            frame_count, current_counts, detections, overlay_state = result
+            # Inference is done with this frame, so the overlay is drawn on its full-resolution frame directly
+            return self._annotate_frame(
+                source.full_frame(frame), frame_count, fps, sum(current_counts.values()), detections, overlay_state
             )
-            
-            # Write to output video - LIKE RTXVehicleDetector
-            if out is not None:
-                out.write(annotated_frame)
 
-            # Calculate processing time
-            processing_time = time.time() - frame_start
-            processing_times.append(processing_time)
-            
-            # Update progress
-            if progress_tracker and self.frame_count % 10 == 0:
-                progress = min(90, 20 + int((self.frame_count / total_frames) * 70))
-                message = f"Processing frame {self.frame_count}/{total_frames} - Count: {self.total_count}"
-                progress_tracker.set_progress(progress, message)
+        # Main processing loop - decode, inference, annotation and encoding overlap
+        pipeline = VideoPipeline(
+            infer, annotate=annotate if out is not None else None, writer=out, threaded=pipelined
+        )
+        source.allocate(pipeline.frames_in_flight())
+        pipeline_stats = pipeline.run(source, start_frame)
 
         # Cleanup
-        cap.release()
+        decode_stats = source.describe()
+        source.release()
         if out is not None:
             out.release()
             print(f"✅ Processed video saved: {output_video_path}")
@@ -158,105 +388,155 @@ class BaliwasanYJunctionDetector:
 
         # Generate comprehensive report - RETURN OUTPUT PATH LIKE RTXVehicleDetector
         report = self.generate_comprehensive_report(total_frames, total_processing_time, fps)
+        report['metadata']['analysis_only'] = out is None
+        report['performance'] = {
+            'pipeline': pipeline_stats, 'decode': decode_stats,
+            'inference_backend': {
+                'backend': self.inference_backend, 'int8': self.int8, 'threads': self.inference_threads
+            }
+        }
+        if self.tile_layout is not None:
+            report['performance']['tiling'] = self.tile_layout.describe()
+        report['detections_path'] = recorder.save(detections_output_path(video_path, 'baliwasan_'))
+        if output_video_path and out is None:
+            output_video_path = self.render_from_detections(
+                video_path, DetectionReplay(report['detections_path']), output_video_path
+            )
         if output_video_path:
             report['output_video_path'] = output_video_path
+        if checkpoint is not None:
+            report['performance']['checkpoints'] = checkpoint.describe()
+            checkpoint.clear()
             
         return report
 
+    def render_from_detections(self, video_path, replay, output_path, progress_tracker=None):
+        """Draw the same overlays as analyze_video from a DetectionReplay and encode them"""
+        # Overlays are drawn on full frames, so no decode view here
+        source = FrameSource(video_path, self.hw_decode)
+        if not source.isOpened():
+            raise Exception(f"Could not open video file: {video_path}")
+        width, height = source.width, source.height
+        fps = source.fps
+        total_frames = source.total_frames
+        self._setup_counting_line(width, height)
+
+        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        if not out.isOpened():
+            raise Exception(f"Could not open video writer: {output_path}")
+
+        def infer(frames, first_frame_number):
+            results = []
+            for offset in range(len(frames)):
+                if progress_tracker and total_frames > 0 and (first_frame_number + offset) % 100 == 0:
+                    progress = min(99, int((first_frame_number + offset) / total_frames * 100))
+                    progress_tracker.set_progress(progress, f"Rendering frame {first_frame_number + offset}/{total_frames}")
+                record = replay.frame(first_frame_number + offset)
+                if record is None:
+                    results.append((first_frame_number + offset + 1, 0, DetectionBatch.empty(),
+                                    {'total_count': 0, 'active_tracks': 0}))
+                    continue
+                frame_count, current_total, total_count, active_tracks, detections = record
+                results.append((frame_count, current_total, detections,
+                                {'total_count': total_count, 'active_tracks': active_tracks}))
+            return results
+
+        def annotate(frame, frame_number, result):
+            frame_count, current_total, detections, overlay_state = result
+            return self._annotate_frame(frame, frame_count, fps, current_total, detections, overlay_state)
+
+        pipeline = VideoPipeline(infer, annotate=annotate, writer=out)
+        source.allocate(pipeline.frames_in_flight())
+        stats = pipeline.run(source)
+        source.release()
+        out.release()
+        print(f"🎞️ Rendered {stats['frames_written']} frames from stored detections: {output_path}")
+        return output_path
+
     def process_frame(self, frame, frame_number):
         """Process a single frame for vehicle detection and tracking"""
         current_counts = defaultdict(int)
-        active_detections = []
-
-        # Use YOLO tracking with optimized settings
-        results = self.model.track(
-            frame, 
-            persist=True, 
-            conf=0.4,  # Balanced confidence
-            classes=self.vehicle_classes, 
-            tracker="bytetrack.yaml",
-            verbose=False,
-            imgsz=640  # Smaller image size for speed
-        )
 
-        if results[0].boxes is not None and results[0].boxes.id is not None:
-            boxes = results[0].boxes.xyxy.cpu().numpy()
-            track_ids = results[0].boxes.id.int().cpu().numpy()
-            class_ids = results[0].boxes.cls.int().cpu().numpy()
-            confidences = results[0].boxes.conf.float().cpu().numpy()
-
-            for i, (box, track_id, class_id, conf) in enumerate(zip(boxes, track_ids, class_ids, confidences)):
-                x1, y1, x2, y2 = map(int, box)
-                track_id = int(track_id)
-                class_id = int(class_id)
-                confidence = float(conf)
-
-                # Calculate center point
-                cx = (x1 + x2) // 2
-                cy = (y1 + y2) // 2
-
-                # Get vehicle color and name
-                vehicle_color = self.vehicle_colors.get(class_id, (255, 255, 255))
-                vehicle_name = self.vehicle_names.get(class_id, "Unknown")
-
-                # Initialize tracking for new vehicles
-                if track_id not in self.vehicle_status:
-                    self.vehicle_status[track_id] = {
-                        'class_id': class_id,
-                        'class_name': vehicle_name,
-                        'crossed': False,
-                        'last_y': cy,
-                        'first_seen': frame_number,
-                        'confidence': confidence
-                    }
-
-                # Update track history
-                self.track_history[track_id].append((cx, cy))
-                current_status = self.vehicle_status[track_id]
+        # YOLO detection + this video's ByteTrack (conf=0.4, imgsz=640 for speed, or native-resolution tiles)
+        detections = self.tracker.track_batch([frame])[0]
+        if not detections.has_ids:
+            return current_counts, DetectionBatch.empty(self.vehicle_names)
+
+        centers_x, centers_y = detections.centers()
+        approach_events = {}
+        if self.counting_geometry is not None:
+            # Every configured approach is tested against all centers of the frame at once
+            in_zone_flags, events = self.counting_geometry.update(detections.track_ids.tolist(), centers_x, centers_y)
+            for approach, i in events:
+                approach_events.setdefault(i, []).append(approach)
+        else:
+            # Check if vehicle is in counting zone
+            in_zone_flags = (self.counting_zone_top <= centers_y) & (centers_y <= self.counting_zone_bottom)
+        detections.in_zone[:] = in_zone_flags
+
+        for i, (track_id, class_id, confidence, cx, cy) in enumerate(zip(
+            detections.track_ids.tolist(), detections.class_ids.tolist(), detections.confidences.tolist(),
+            centers_x.tolist(), centers_y.tolist()
+        )):
+            vehicle_name = self.vehicle_names.get(class_id, "Unknown")
+            in_counting_zone = bool(in_zone_flags[i])
 
+            # Initialize tracking for new vehicles
+            if track_id not in self.vehicle_status:
+                self.vehicle_status[track_id] = {
+                    'class_id': class_id,
+                    'class_name': vehicle_name,
+                    'crossed': False,
+                    'last_y': cy,
+                    'first_seen': frame_number,
+                    'confidence': confidence
+                }
+
+            # Update track history
+            self.track_history[track_id].append((cx, cy))
+            current_status = self.vehicle_status[track_id]
+
+            for approach in approach_events.get(i, ()):
+                current_status['crossed'] = True
+                self.vehicle_crossed.add(track_id)
+                self.total_count += 1
+                self.vehicle_type_counts[class_id] += 1
+                self.approach_counts[approach][vehicle_name.lower()] += 1
+                print(f"✅ #{self.total_count:03d} {vehicle_name} ID:{track_id} "
+                      f"counted on {approach} at ({cx},{cy}) - Conf: {confidence:.2f}")
+
+            if self.counting_geometry is None and in_counting_zone and not current_status['crossed']:
                 # Calculate line Y position at current X
                 line_y_at_cx = self.get_line_y_at_x(cx)
+                prev_y = current_status['last_y']
+                current_y = cy
 
-                # Check if vehicle is in counting zone
-                in_counting_zone = self.counting_zone_top <= cy <= self.counting_zone_bottom
-
-                if in_counting_zone and not current_status['crossed']:
-                    prev_y = current_status['last_y']
-                    current_y = cy
-
-                    # Enhanced crossing detection with trajectory validation
-                    if (prev_y < line_y_at_cx and current_y >= line_y_at_cx and 
-                        self.is_valid_trajectory(self.track_history[track_id], current_y, line_y_at_cx)):
-                        
-                        # Vehicle crossed the line top → bottom
-                        current_status['crossed'] = True
-                        self.vehicle_crossed.add(track_id)
-                        self.total_count += 1
-                        self.vehicle_type_counts[class_id] += 1
-
-                        print(f"✅ #{self.total_count:03d} {vehicle_name} ID:{track_id} "
-                              f"crossed at ({cx},{cy}) - Conf: {confidence:.2f}")
+                # Enhanced crossing detection with trajectory validation
+                if (prev_y < line_y_at_cx and current_y >= line_y_at_cx and 
+                    self.is_valid_trajectory(self.track_history[track_id], current_y, line_y_at_cx)):
+                    
+                    # Vehicle crossed the line top → bottom
+                    current_status['crossed'] = True
+                    self.vehicle_crossed.add(track_id)
+                    self.total_count += 1
+                    self.vehicle_type_counts[class_id] += 1
 
-                    # Update last position
-                    current_status['last_y'] = current_y
+                    print(f"✅ #{self.total_count:03d} {vehicle_name} ID:{track_id} "
+                          f"crossed at ({cx},{cy}) - Conf: {confidence:.2f}")
 
-                # Count current vehicles in zone
-                if in_counting_zone:
-                    current_counts[class_id] += 1
+                # Update last position
+                current_status['last_y'] = current_y
 
-                active_detections.append({
-                    'track_id': track_id,
-                    'class_name': vehicle_name,
-                    'bbox': [x1, y1, x2-x1, y2-y1],
-                    'confidence': confidence,
-                    'center': (cx, cy),
-                    'in_zone': in_counting_zone
-                })
+            # Count current vehicles in zone
+            if in_counting_zone:
+                current_counts[class_id] += 1
 
-        return current_counts, active_detections
+        return current_counts, detections
 
     def get_line_y_at_x(self, cx):
         """Calculate line Y position at given X coordinate"""
+        if 0 <= cx < len(self.line_y_lookup):
+            return self.line_y_lookup[cx]
         x1_l, y1_l = self.line_start
         x2_l, y2_l = self.line_end
         if x2_l != x1_l:
@@ -280,41 +560,38 @@ class BaliwasanYJunctionDetector:
         
         return False
 
-    def draw_detection_info(self, frame, detections, frame_number, fps, total_current_vehicles):
+    def draw_detection_info(self, frame, detections, frame_number, fps, total_current_vehicles, overlay_state=None):
         """Draw detection information on frame"""
         height, width = frame.shape[:2]
+        if overlay_state is None:
+            overlay_state = {'total_count': self.total_count, 'active_tracks': len(self.track_history)}
         
-        # Enhanced statistics panel
+        # Enhanced statistics panel (the title line is part of the static layer)
         stats = [
-            f"BALIWASAN Y-JUNCTION ANALYSIS",
-            f"Total Count: {self.total_count}",
+            None,
+            f"Total Count: {overlay_state['total_count']}",
             f"Frame: {frame_number}",
             f"Current in zone: {total_current_vehicles}",
-            f"Active tracks: {len(self.track_history)}"
+            f"Active tracks: {overlay_state['active_tracks']}"
         ]
         
         # Draw statistics
         for i, text in enumerate(stats):
+            if text is None:
+                continue
             color = (255, 255, 255)
-            if "BALIWASAN" in text:
-                color = (0, 255, 255)  # Yellow for title
-            elif "Total Count" in text:
+            if "Total Count" in text:
                 color = (0, 255, 0)    # Green for count
-            cv2.putText(frame, text, (20, 30 + i * 25), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            if i == 2:
+                # A new frame number every frame; not worth caching
+                cv2.putText(frame, text, (20, 30 + i * 25), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            else:
+                self.text_sprites.text(frame, text, (20, 30 + i * 25), 0.6, color, 2)
 
         # Draw detections
-        for detection in detections:
-            x1, y1, w, h = detection['bbox']
-            class_name = detection['class_name']
-            confidence = detection['confidence']
-            track_id = detection['track_id']
-            in_zone = detection['in_zone']
-
-            color = self.vehicle_colors.get(
-                list(self.vehicle_names.keys())[list(self.vehicle_names.values()).index(class_name)], 
-                (255, 255, 255)
-            )
+        for track_id, class_name, (x1, y1, w, h), confidence, in_zone, _ in detections.rows():
+            color = self.name_colors.get(class_name, (255, 255, 255))
 
             # Draw bounding box
             thickness = 3 if in_zone else 2
@@ -324,12 +601,7 @@ class BaliwasanYJunctionDetector:
             label = f"{class_name} {confidence:.2f}"
             if in_zone:
                 label += " ✓IN ZONE"
-            
-            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
-            cv2.rectangle(frame, (x1, y1 - label_size[1] - 10),
-                        (x1 + label_size[0], y1), color, -1)
-            cv2.putText(frame, label, (x1, y1 - 5),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            draw_label(frame, label, (x1, y1), color)
 
         return frame
 
@@ -388,6 +660,12 @@ class BaliwasanYJunctionDetector:
                 'y_junction_optimized': True
             }
         }
+        if self.counting_geometry is not None:
+            report['summary']['approach_counts'] = {
+                approach: dict(self.approach_counts.get(approach, {}))
+                for approach in self.counting_geometry.approaches
+            }
+            report['baliwasan_specific']['counting_geometry'] = self.counting_geometry.describe()
         
         return report
 
@@ -0,0 +1,148 @@
+# ml/batched_inference.py
+import time
+from collections import deque
+from contextlib import nullcontext
+import numpy as np
+import torch
+from ultralytics.engine.results import Boxes
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace, YAML
+from ultralytics.utils.checks import check_yaml
+from .detection_batch import DetectionBatch
+
+# Batch latencies kept for the percentile stats; totals cover every batch
+LATENCY_SAMPLES = 10000
+
+
+class BatchedTracker:
+    """Run YOLO detection on several frames at once, then associate tracks frame by frame.
+
+    ``model.track`` only accepts one frame per forward pass. Here the forward pass
+    runs on a whole batch via ``model.predict`` and the per-frame boxes are fed to
+    our own ByteTrack instance in frame order, exactly like ultralytics' tracking
+    callback does, so track IDs (and therefore counts) match ``model.track``.
+    Unlike ``model.track``, which always assumes 30 fps, the lost-track buffer
+    (``track_buffer`` frames at 30 fps) is scaled to the frame rate the
+    tracker is fed with ``set_frame_rate``.
+
+    Each frame comes back as a ``DetectionBatch`` built from a single host copy
+    of its boxes; ``class_names`` maps class ids to the detector's names.
+
+    Because the tracker lives here rather than on the model's predictor, one
+    YOLO model can be shared by several detectors (see ml.model_registry);
+    ``lock`` serializes their forward passes.
+
+    When frames are cropped / shrunk views (see ml.frame_source), set
+    ``view_scale`` and ``view_offset`` so boxes come back in full-frame pixels.
+
+    With a TileLayout (see ml.tiled_inference) the model runs on every tile of
+    every frame in one forward pass and each frame's tile boxes are merged
+    with NMS before they reach the tracker.
+    """
+
+    def __init__(self, model, conf, classes, device, tracker="bytetrack.yaml", imgsz=None, lock=None,
+                 class_names=None):
+        self.model = model
+        self.class_names = class_names or {}
+        self.lock = lock
+        self.conf = conf
+        self.classes = classes
+        self.device = device
+        self.imgsz = imgsz
+        self.view_scale = 1.0
+        self.view_offset = (0, 0)
+        self.tile_layout = None
+
+        cfg = IterableSimpleNamespace(**YAML.load(check_yaml(tracker)))
+        # Built for 30 fps like ultralytics' own trackers; rescaled by set_frame_rate
+        self.tracker = BYTETracker(args=cfg, frame_rate=30)
+
+        # Bounded, so a tracker on a never-ending stream stays at constant memory
+        self.batch_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.batches = 0
+        self.frames_tracked = 0
+        self.tracking_seconds = 0.0
+
+    def track_batch(self, frames):
+        """Detect on ``frames`` in one forward pass and return a DetectionBatch per frame, in order"""
+        batch_start = time.time()
+
+        layout = self.tile_layout
+        inputs = [crop for frame in frames for crop in layout.crops(frame)] if layout else frames
+        predict_args = dict(conf=self.conf, classes=self.classes, verbose=False, batch=len(inputs))
+        if self.device:
+            predict_args['device'] = self.device
+        if layout:
+            predict_args['imgsz'] = layout.tile_size
+        elif self.imgsz:
+            predict_args['imgsz'] = self.imgsz
+
+        with self.lock or nullcontext(), torch.no_grad():
+            results = self.model.predict(inputs, **predict_args)
+
+        tracked = []
+        for frame, det in zip(frames, self._frame_boxes(frames, results)):
+            tracks = self.tracker.update(det, frame)
+            if len(tracks) == 0:
+                # Same as ultralytics: keep the raw detections (no IDs) when nothing is tracked
+                tracked.append(DetectionBatch.from_boxes(
+                    det.data, self.class_names, has_ids=False,
+                    view_scale=self.view_scale, view_offset=self.view_offset
+                ))
+                continue
+            # Track rows are x1 y1 x2 y2 id score cls idx
+            tracked.append(DetectionBatch.from_boxes(
+                tracks[:, :-1], self.class_names, has_ids=True, frame_shape=frame.shape,
+                view_scale=self.view_scale, view_offset=self.view_offset
+            ))
+
+        latency = time.time() - batch_start
+        self.batch_latencies.append(latency)
+        self.batches += 1
+        self.frames_tracked += len(frames)
+        self.tracking_seconds += latency
+        if len(frames) > 1:
+            batch_fps = len(frames) / latency if latency > 0 else 0
+            print(f"⚡ Batch of {len(frames)} frames: {latency * 1000:.1f} ms ({batch_fps:.1f} FPS)")
+
+        return tracked
+
+    def _frame_boxes(self, frames, results):
+        """Host-side boxes for each frame: straight from its result, or merged from its tiles"""
+        if not self.tile_layout:
+            # The only device-to-host copy for this frame
+            return [result.boxes.cpu().numpy() for result in results]
+        tiles = len(self.tile_layout)
+        frame_boxes = []
+        for i, frame in enumerate(frames):
+            tile_boxes = [result.boxes.data.cpu().numpy() for result in results[i * tiles:(i + 1) * tiles]]
+            frame_boxes.append(Boxes(self.tile_layout.merge(tile_boxes), frame.shape[:2]))
+        return frame_boxes
+
+    def set_view(self, frame_source):
+        """Map boxes from ``frame_source``'s views back to its full frames"""
+        self.view_scale = frame_source.view_scale
+        self.view_offset = frame_source.view_offset
+
+    def set_frame_rate(self, frame_rate):
+        """Frames per second the tracker is fed; sizes ByteTrack's lost-track buffer like its constructor"""
+        self.tracker.max_time_lost = int((frame_rate or 30) / 30.0 * self.tracker.args.track_buffer)
+
+    def get_latency_stats(self):
+        """Summarize per-batch latency so the batch size can be tuned per machine"""
+        if not self.batch_latencies:
+            return {'batches': 0}
+
+        latencies_ms = np.array(self.batch_latencies) * 1000
+        total_frames = self.frames_tracked
+        total_time = self.tracking_seconds
+
+        return {
+            'batches': self.batches,
+            'frames': total_frames,
+            'mean_batch_latency_ms': round(total_time * 1000 / self.batches, 2),
+            'p95_batch_latency_ms': round(float(np.percentile(latencies_ms, 95)), 2),
+            'max_batch_latency_ms': round(float(latencies_ms.max()), 2),
+            'mean_frame_latency_ms': round(total_time * 1000 / total_frames, 2) if total_frames else 0,
+            'inference_fps': round(total_frames / total_time, 2) if total_time > 0 else 0
+        }
@@ -0,0 +1,94 @@
+# ml/checkpoints.py
+import hashlib
+import os
+import pickle
+import shutil
+import time
+from ultralytics.trackers.basetrack import BaseTrack
+
+CHECKPOINT_DIR = 'media/checkpoints'
+
+
+def checkpoint_dir(video_path, key, root=CHECKPOINT_DIR):
+    """Checkpoint directory for one video analysed with the detector settings in ``key``"""
+    stat = os.stat(video_path)
+    identity = repr((os.path.abspath(video_path), stat.st_size, int(stat.st_mtime), key))
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(root, f"{name}_{hashlib.sha1(identity.encode()).hexdigest()[:16]}")
+
+
+def write_pickle(path, value):
+    """Write through a temporary file so a crash mid-write keeps the previous file"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+
+class AnalysisCheckpoint:
+    """Periodic snapshots of an analysis, so a failed job resumes where it stopped.
+
+    ``state.pkl`` holds the next frame to decode, the detector's counting and
+    ByteTrack state and the global track ID counter. Detections recorded for
+    rendering are appended as numbered part files, so each snapshot only
+    writes the frames since the previous one. A snapshot is taken at most
+    every ``interval_seconds`` of wall-clock time; the directory is removed
+    once the analysis completes.
+    """
+
+    def __init__(self, directory, interval_seconds):
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        self.last_saved = time.monotonic()
+        self.resumed_from = None
+        self.saves = 0
+        self.save_seconds = 0.0
+
+    @property
+    def state_path(self):
+        return os.path.join(self.directory, 'state.pkl')
+
+    def due(self):
+        return time.monotonic() - self.last_saved >= self.interval_seconds
+
+    def load(self, recorder=None):
+        """Restore the recorder and track IDs and return (next_frame, detector state), or None"""
+        if not os.path.exists(self.state_path):
+            return None
+        try:
+            with open(self.state_path, 'rb') as f:
+                checkpoint = pickle.load(f)
+            if recorder is not None:
+                recorder.read_parts(self.directory, checkpoint['recorder_parts'])
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            print(f"⚠️  Ignoring unreadable checkpoint {self.directory}: {e}")
+            return None
+        # New tracks must not reuse the IDs of restored ones
+        BaseTrack._count = checkpoint['track_id_counter']
+        self.resumed_from = checkpoint['next_frame']
+        return checkpoint['next_frame'], checkpoint['state']
+
+    def save(self, next_frame, state, recorder=None):
+        start = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        write_pickle(self.state_path, {
+            'next_frame': next_frame,
+            'track_id_counter': BaseTrack._count,
+            'recorder_parts': recorder.write_part(self.directory) if recorder is not None else 0,
+            'state': state
+        })
+        self.last_saved = time.monotonic()
+        self.saves += 1
+        self.save_seconds += self.last_saved - start
+        print(f"💾 Checkpoint at frame {next_frame} ({(self.last_saved - start) * 1000:.0f} ms)")
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def describe(self):
+        return {
+            'interval_seconds': self.interval_seconds,
+            'resumed_from_frame': self.resumed_from,
+            'saves': self.saves,
+            'save_seconds': round(self.save_seconds, 3)
+        }
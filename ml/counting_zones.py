@@ -0,0 +1,278 @@
+# ml/counting_zones.py
+import cv2
+import numpy as np
+
+# Named travel directions, in image coordinates (y grows downward)
+DIRECTIONS = {
+    'down': (0.0, 1.0),
+    'up': (0.0, -1.0),
+    'right': (1.0, 0.0),
+    'left': (-1.0, 0.0)
+}
+
+GEOMETRY_KEYS = ('units', 'zones', 'count_lines')
+
+
+def _direction_vector(direction):
+    """Unit vector for a direction name or [dx, dy]; None means any direction"""
+    if direction in (None, 'any'):
+        return None
+    if isinstance(direction, str) and direction not in DIRECTIONS:
+        raise ValueError(f"unknown direction '{direction}' (use {', '.join(DIRECTIONS)}, 'any' or [dx, dy])")
+    vector = np.asarray(DIRECTIONS[direction] if isinstance(direction, str) else direction, dtype=np.float64)
+    return vector / np.linalg.norm(vector)
+
+
+def _to_pixels(points, width, height, units):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if units == 'fraction':
+        points = points * (width - 1, height - 1)
+    return points
+
+
+class CountingZone:
+    """Polygon approach zone, rasterized once into a boolean lookup mask.
+
+    A track is counted the first time its center is inside the polygon while
+    moving along ``direction`` (any direction when None).
+    """
+
+    def __init__(self, name, polygon, direction=None):
+        self.name = name
+        self.polygon = polygon
+        self.direction = _direction_vector(direction)
+        self.points = None
+        self.mask = None
+
+    def bind(self, width, height, units):
+        self.points = np.round(_to_pixels(self.polygon, width, height, units)).astype(np.int32)
+        mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(mask, [self.points], 1)
+        self.mask = mask.astype(bool)
+
+    def contains(self, xs, ys):
+        height, width = self.mask.shape
+        inside_frame = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        return inside_frame & self.mask[np.clip(ys, 0, height - 1), np.clip(xs, 0, width - 1)]
+
+    def bounds(self):
+        (left, top), (right, bottom) = self.points.min(axis=0), self.points.max(axis=0)
+        return int(left), int(top), int(right), int(bottom)
+
+    def draw(self, frame, color):
+        cv2.polylines(frame, [self.points], True, color, 3)
+
+
+class CountLine:
+    """Polyline count line, stored as half-plane coefficients per segment.
+
+    Each segment keeps a unit normal ``n`` and offset ``c`` so the signed
+    distance of a point is ``n . p + c``. A track is counted when the sign
+    flips towards ``direction`` while the point is within ``band`` pixels.
+    """
+
+    def __init__(self, name, points, direction=None, band=25):
+        self.name = name
+        self.polyline = points
+        self.direction = _direction_vector(direction)
+        self.band = band
+        self.points = None
+
+    def bind(self, width, height, units):
+        self.points = _to_pixels(self.polyline, width, height, units)
+        self.starts = self.points[:-1]
+        self.vectors = self.points[1:] - self.starts
+        self.lengths_sq = np.maximum((self.vectors ** 2).sum(axis=1), 1e-9)
+        lengths = np.sqrt(self.lengths_sq)
+        self.normals = np.stack([-self.vectors[:, 1], self.vectors[:, 0]], axis=1) / lengths[:, None]
+        self.offsets = -(self.normals * self.starts).sum(axis=1)
+        # Which side a track moving along ``direction`` ends up on, per segment
+        if self.direction is not None:
+            self.forward_signs = np.sign(self.normals @ self.direction)
+        else:
+            self.forward_signs = np.zeros(len(self.starts))
+
+    def measure(self, xs, ys):
+        """Side of each point (sign of its half-plane distance), its distance to the polyline, and the nearest segment"""
+        points = np.stack([xs, ys], axis=1).astype(np.float64)
+        relative = points[:, None, :] - self.starts[None, :, :]
+        t = np.clip((relative * self.vectors[None]).sum(axis=2) / self.lengths_sq[None], 0, 1)
+        distances_sq = ((relative - t[:, :, None] * self.vectors[None]) ** 2).sum(axis=2)
+        segment = np.argmin(distances_sq, axis=1)
+        sides = np.sign((self.normals[segment] * points).sum(axis=1) + self.offsets[segment])
+        return sides, np.sqrt(distances_sq[np.arange(len(points)), segment]), segment
+
+    def bounds(self):
+        (left, top), (right, bottom) = self.points.min(axis=0), self.points.max(axis=0)
+        return int(left), int(top - self.band), int(right), int(bottom + self.band)
+
+    def draw(self, frame, color):
+        cv2.polylines(frame, [np.round(self.points).astype(np.int32)], False, color, 4)
+
+
+class CountingGeometry:
+    """All zones and count lines of one camera, counted in a single pass.
+
+    Built from a location's ``detection_config``::
+
+        {
+            "units": "fraction",            # or "pixels"
+            "zones": [{"name": "north", "polygon": [[0.1, 0.3], ...], "direction": "down"}],
+            "count_lines": [{"name": "east", "points": [[0.5, 0.2], [0.6, 0.9]],
+                             "direction": "left", "band": 25}]
+        }
+
+    Each approach counts a track at most once.
+    """
+
+    def __init__(self, zones=(), count_lines=(), units='fraction'):
+        self.units = units
+        self.zones = list(zones)
+        self.count_lines = list(count_lines)
+        self.frame_size = None
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config):
+        """Geometry described by ``config``, or None when it defines no zones or lines"""
+        if not config or not (config.get('zones') or config.get('count_lines')):
+            return None
+        zones = [
+            CountingZone(zone.get('name', f"zone_{i + 1}"), zone['polygon'], zone.get('direction'))
+            for i, zone in enumerate(config.get('zones', []))
+        ]
+        count_lines = [
+            CountLine(line.get('name', f"line_{i + 1}"), line['points'], line.get('direction'), line.get('band', 25))
+            for i, line in enumerate(config.get('count_lines', []))
+        ]
+        return cls(zones, count_lines, config.get('units', 'fraction'))
+
+    @property
+    def approaches(self):
+        return [zone.name for zone in self.zones] + [line.name for line in self.count_lines]
+
+    def bind(self, width, height):
+        """Rasterize masks and line coefficients for this frame size (once per video)"""
+        if self.frame_size != (width, height):
+            for shape in self.zones + self.count_lines:
+                shape.bind(width, height, self.units)
+            self.frame_size = (width, height)
+        self.reset()
+
+    def reset(self):
+        self.last_points = {}
+        self.line_sides = {line.name: {} for line in self.count_lines}
+        self.counted = {name: set() for name in self.approaches}
+
+    def get_state(self):
+        """Per-track state, for analysis checkpoints"""
+        return {'last_points': self.last_points, 'line_sides': self.line_sides, 'counted': self.counted}
+
+    def set_state(self, state):
+        self.last_points = state['last_points']
+        self.line_sides = state['line_sides']
+        self.counted = state['counted']
+
+    def forget(self, track_ids):
+        """Drop the state of tracks that are gone for good (keeps long-running streams bounded)"""
+        for track_id in track_ids:
+            self.last_points.pop(track_id, None)
+            for sides in self.line_sides.values():
+                sides.pop(track_id, None)
+            for counted in self.counted.values():
+                counted.discard(track_id)
+
+    def bounds(self):
+        """Bounding box around every zone and count line band"""
+        boxes = np.array([shape.bounds() for shape in self.zones + self.count_lines])
+        width, height = self.frame_size
+        return {
+            'left': max(0, int(boxes[:, 0].min())), 'top': max(0, int(boxes[:, 1].min())),
+            'right': min(width - 1, int(boxes[:, 2].max())), 'bottom': min(height - 1, int(boxes[:, 3].max()))
+        }
+
+    def contains(self, xs, ys):
+        """Points inside any zone or any count line band (no tracking state involved)"""
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        inside = np.zeros(xs.shape, dtype=bool)
+        for zone in self.zones:
+            inside |= zone.contains(xs, ys)
+        for line in self.count_lines:
+            _, distance, _ = line.measure(np.atleast_1d(xs), np.atleast_1d(ys))
+            inside |= (distance <= line.band).reshape(xs.shape)
+        return inside
+
+    def update(self, track_ids, xs, ys):
+        """Advance every approach by one frame of track centers.
+
+        Returns the per-detection "in any zone" flags and a list of
+        ``(approach_name, detection_index)`` events for newly counted tracks.
+        """
+        inside = np.zeros(len(track_ids), dtype=bool)
+        events = []
+        previous = [self.last_points.get(track_id) for track_id in track_ids]
+        motion = np.array([
+            (x - prev[0], y - prev[1]) if prev is not None else (0.0, 0.0)
+            for x, y, prev in zip(xs, ys, previous)
+        ], dtype=np.float64).reshape(-1, 2)
+
+        for zone in self.zones:
+            in_zone = zone.contains(xs, ys)
+            inside |= in_zone
+            moving_along = motion @ zone.direction > 0 if zone.direction is not None else in_zone
+            counted = self.counted[zone.name]
+            for i in np.flatnonzero(in_zone & moving_along):
+                if track_ids[i] not in counted:
+                    counted.add(track_ids[i])
+                    events.append((zone.name, int(i)))
+
+        for line in self.count_lines:
+            sides, distance, segment = line.measure(xs, ys)
+            near = distance <= line.band
+            inside |= near
+            last_sides = self.line_sides[line.name]
+            counted = self.counted[line.name]
+            for i, track_id in enumerate(track_ids):
+                last_side = last_sides.get(track_id)
+                if sides[i] != 0:
+                    last_sides[track_id] = sides[i]
+                if not near[i] or last_side is None or sides[i] == 0 or sides[i] == last_side:
+                    continue
+                forward = line.forward_signs[segment[i]]
+                if (forward == 0 or sides[i] == forward) and track_id not in counted:
+                    counted.add(track_id)
+                    events.append((line.name, i))
+
+        for track_id, x, y in zip(track_ids, xs, ys):
+            self.last_points[track_id] = (x, y)
+        return inside, events
+
+    def draw(self, frame, color=(0, 255, 255)):
+        for shape in self.zones + self.count_lines:
+            shape.draw(frame, color)
+            x, y = (int(v) for v in shape.points[0])
+            cv2.putText(frame, shape.name.upper(), (x + 5, max(15, y - 8)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+    def describe(self):
+        """Pixel geometry for the analysis report"""
+        return {
+            'zones': [
+                {'name': zone.name, 'polygon': zone.points.tolist(),
+                 'direction': zone.direction.tolist() if zone.direction is not None else None}
+                for zone in self.zones
+            ],
+            'count_lines': [
+                {'name': line.name, 'points': np.round(line.points).astype(int).tolist(), 'band': line.band,
+                 'direction': line.direction.tolist() if line.direction is not None else None}
+                for line in self.count_lines
+            ]
+        }
+
+
+def counting_geometry_config(detection_config):
+    """The zone and count-line part of a location's detection_config, or None"""
+    config = {key: detection_config[key] for key in GEOMETRY_KEYS if key in (detection_config or {})}
+    if not (config.get('zones') or config.get('count_lines')):
+        return None
+    return config
@@ -0,0 +1,110 @@
+# ml/detection_batch.py
+import numpy as np
+
+# One record per detection; bbox is (x1, y1, w, h) and entry is (-1, -1) when unknown
+DETECTION_DTYPE = np.dtype([
+    ('track_id', np.int32),
+    ('class_id', np.int16),
+    ('bbox', np.int32, (4,)),
+    ('confidence', np.float32),
+    ('in_zone', np.bool_),
+    ('entry', np.int32, (2,))
+])
+
+
+class DetectionBatch:
+    """All detections of one frame as a single structured NumPy array.
+
+    Built from one host copy of the tracker's box tensor and handed as-is to
+    counting, zone tests, drawing and persistence, so the per-frame hot path
+    allocates one array instead of a dict per box. ``class_names`` maps COCO
+    class ids to the detector's display names.
+    """
+
+    __slots__ = ('records', 'class_names', 'has_ids')
+
+    def __init__(self, records, class_names, has_ids=True):
+        self.records = records
+        self.class_names = class_names
+        self.has_ids = has_ids
+
+    @classmethod
+    def empty(cls, class_names=None):
+        return cls(np.zeros(0, dtype=DETECTION_DTYPE), class_names or {})
+
+    @classmethod
+    def from_boxes(cls, data, class_names, has_ids, frame_shape=None, view_scale=1.0, view_offset=(0, 0)):
+        """Build from an ultralytics box array: x1 y1 x2 y2 [id] conf cls.
+
+        Boxes found on a cropped / shrunk view (see ml.frame_source) are mapped
+        back to full-frame pixels with ``view_scale`` and ``view_offset``.
+        """
+        data = np.asarray(data)
+        if frame_shape is not None:
+            # Same clipping ultralytics applies when it stores tracked boxes
+            height, width = frame_shape[:2]
+            data = data.copy()
+            data[:, [0, 2]] = data[:, [0, 2]].clip(0, width)
+            data[:, [1, 3]] = data[:, [1, 3]].clip(0, height)
+        if view_scale != 1.0 or tuple(view_offset) != (0, 0):
+            data = data.astype(np.float64)
+            data[:, :4] = data[:, :4] / view_scale + np.tile(view_offset, 2)
+
+        records = np.zeros(len(data), dtype=DETECTION_DTYPE)
+        # int() truncation, exactly like map(int, box)
+        xyxy = data[:, :4].astype(np.int32)
+        records['bbox'][:, :2] = xyxy[:, :2]
+        records['bbox'][:, 2:] = xyxy[:, 2:] - xyxy[:, :2]
+        records['track_id'] = data[:, 4] if has_ids else np.arange(len(data))
+        records['confidence'] = data[:, -2]
+        records['class_id'] = data[:, -1]
+        records['entry'] = -1
+        return cls(records, class_names, has_ids)
+
+    def __len__(self):
+        return len(self.records)
+
+    def select(self, mask):
+        return DetectionBatch(self.records[mask], self.class_names, self.has_ids)
+
+    @property
+    def track_ids(self):
+        return self.records['track_id']
+
+    @property
+    def class_ids(self):
+        return self.records['class_id']
+
+    @property
+    def bboxes(self):
+        return self.records['bbox']
+
+    @property
+    def confidences(self):
+        return self.records['confidence']
+
+    @property
+    def in_zone(self):
+        return self.records['in_zone']
+
+    @property
+    def entries(self):
+        return self.records['entry']
+
+    def centers(self):
+        """Integer box centers, (x1 + w//2, y1 + h//2), as two arrays"""
+        bbox = self.records['bbox']
+        return bbox[:, 0] + bbox[:, 2] // 2, bbox[:, 1] + bbox[:, 3] // 2
+
+    def class_name(self, class_id):
+        return self.class_names.get(int(class_id), "Unknown")
+
+    def rows(self):
+        """Plain Python tuples for drawing loops:
+        (track_id, class_name, (x1, y1, w, h), confidence, in_zone, entry or None)"""
+        for track_id, class_id, bbox, confidence, in_zone, entry in zip(
+            self.records['track_id'].tolist(), self.records['class_id'].tolist(), self.records['bbox'].tolist(),
+            self.records['confidence'].tolist(), self.records['in_zone'].tolist(), self.records['entry'].tolist()
+        ):
+            yield (track_id, self.class_name(class_id), bbox, confidence, in_zone,
+                   tuple(entry) if entry[0] >= 0 else None)
@@ -0,0 +1,195 @@
+# ml/detection_store.py
+import importlib
+import json
+import os
+import pickle
+from array import array
+import numpy as np
+from .detection_batch import DETECTION_DTYPE, DetectionBatch
+from .checkpoints import write_pickle
+
+
+class DetectionRecorder:
+    """Collects per-frame detections as compact typed columns.
+
+    A detection costs ~35 bytes here instead of a dict per box, and the saved
+    ``.npz`` holds everything ``draw_detection_info`` needs to redraw the
+    overlays later without running YOLO again. Frames arrive as
+    ``DetectionBatch`` arrays and are kept as-is until ``save``.
+    """
+
+    # Per-frame columns
+    FRAME_COLUMNS = ('frame_index', 'frame_label', 'current_total', 'total_counted', 'active_tracks', 'first_detection')
+
+    def __init__(self, detector, fps, width, height):
+        self.meta = {
+            'detector': f"{type(detector).__module__}.{type(detector).__name__}",
+            'fps': fps,
+            'width': width,
+            'height': height
+        }
+        # Location zones must be rebuilt to redraw the same overlays
+        if getattr(detector, 'counting_zones', None):
+            self.meta['detector_kwargs'] = {'counting_zones': detector.counting_zones}
+        self.class_names = {}
+
+        # One entry per frame
+        self.frame_index = array('i')
+        self.frame_label = array('i')
+        self.current_total = array('i')
+        self.total_counted = array('i')
+        self.active_tracks = array('i')
+        self.first_detection = array('q')
+        self.detection_count = 0
+
+        # One DetectionBatch record array per frame with detections
+        self.batches = []
+        # Checkpoint part files written so far and the (frames, batches) they cover
+        self.parts = 0
+        self._parted = (0, 0)
+
+    def add_frame(self, frame_index, frame_label, current_total, total_counted, detections, active_tracks=0):
+        self.frame_index.append(frame_index)
+        self.frame_label.append(frame_label)
+        self.current_total.append(int(current_total))
+        self.total_counted.append(int(total_counted))
+        self.active_tracks.append(int(active_tracks))
+        self.first_detection.append(self.detection_count)
+
+        if len(detections):
+            self.class_names.update(detections.class_names)
+            self.batches.append(detections.records)
+            self.detection_count += len(detections)
+
+    def append(self, other, counted_before=0):
+        """Append the frames of ``other``, a recorder of the next segment of the
+        same video (see ml.sharded_analysis).
+
+        Its running totals continue from ``counted_before``, and its track ids
+        are moved past the ones recorded so far, since every segment numbers
+        its tracks from scratch.
+        """
+        track_offset = max((int(records['track_id'].max()) for records in self.batches), default=-1) + 1
+        for column in self.FRAME_COLUMNS:
+            values = getattr(other, column)
+            if column == 'total_counted':
+                values = array('i', (count + counted_before for count in values))
+            elif column == 'first_detection':
+                values = array('q', (first + self.detection_count for first in values))
+            getattr(self, column).extend(values)
+        for records in other.batches:
+            records = records.copy()
+            records['track_id'][records['track_id'] >= 0] += track_offset
+            self.batches.append(records)
+        self.class_names.update(other.class_names)
+        self.detection_count += other.detection_count
+
+    def write_part(self, directory):
+        """Write the frames added since the previous part to ``directory`` and
+        return how many parts there are (see ml.checkpoints)"""
+        frames, batches = self._parted
+        write_pickle(os.path.join(directory, f"detections-{self.parts:05d}.pkl"), {
+            'columns': {column: getattr(self, column)[frames:] for column in self.FRAME_COLUMNS},
+            'batches': self.batches[batches:],
+            'class_names': self.class_names
+        })
+        self.parts += 1
+        self._parted = (len(self.frame_index), len(self.batches))
+        return self.parts
+
+    def read_parts(self, directory, parts):
+        """Append the first ``parts`` part files written by ``write_part``"""
+        for part in range(parts):
+            with open(os.path.join(directory, f"detections-{part:05d}.pkl"), 'rb') as f:
+                data = pickle.load(f)
+            for column in self.FRAME_COLUMNS:
+                getattr(self, column).extend(data['columns'][column])
+            self.batches.extend(data['batches'])
+            self.class_names.update(data['class_names'])
+            self.detection_count += sum(len(records) for records in data['batches'])
+        self.parts = parts
+        self._parted = (len(self.frame_index), len(self.batches))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        records = np.concatenate(self.batches) if self.batches else np.zeros(0, dtype=DETECTION_DTYPE)
+        # class_id indexes this list directly
+        max_class_id = max(self.class_names, default=-1)
+        class_names = [self.class_names.get(class_id, '') for class_id in range(max_class_id + 1)]
+        meta = dict(self.meta, class_names=class_names)
+        np.savez_compressed(
+            path,
+            meta=np.array(json.dumps(meta)),
+            frame_index=np.frombuffer(self.frame_index, dtype=np.int32),
+            frame_label=np.frombuffer(self.frame_label, dtype=np.int32),
+            current_total=np.frombuffer(self.current_total, dtype=np.int32),
+            total_counted=np.frombuffer(self.total_counted, dtype=np.int32),
+            active_tracks=np.frombuffer(self.active_tracks, dtype=np.int32),
+            first_detection=np.frombuffer(self.first_detection, dtype=np.int64),
+            track_id=records['track_id'],
+            class_id=records['class_id'].astype(np.uint8),
+            bbox=records['bbox'],
+            confidence=records['confidence'].astype(np.float16),
+            in_zone=records['in_zone']
+        )
+        print(f"💾 Saved {len(records)} detections for {len(self.frame_index)} frames: {path}")
+        return path
+
+
+class DetectionReplay:
+    """Read-only view of a saved detection file, looked up by frame index"""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.meta = json.loads(str(data['meta']))
+            self.columns = {key: data[key] for key in data.files if key != 'meta'}
+        self.class_names = {i: name for i, name in enumerate(self.meta['class_names'])}
+        self.positions = {int(index): pos for pos, index in enumerate(self.columns['frame_index'])}
+
+    def frame(self, frame_index):
+        """Return (frame_label, current_total, total_counted, active_tracks, DetectionBatch) or None"""
+        pos = self.positions.get(frame_index)
+        if pos is None:
+            return None
+        c = self.columns
+        start = int(c['first_detection'][pos])
+        end = int(c['first_detection'][pos + 1]) if pos + 1 < len(c['first_detection']) else len(c['track_id'])
+
+        records = np.zeros(end - start, dtype=DETECTION_DTYPE)
+        records['track_id'] = c['track_id'][start:end]
+        records['class_id'] = c['class_id'][start:end]
+        records['bbox'] = c['bbox'][start:end]
+        records['confidence'] = c['confidence'][start:end]
+        records['in_zone'] = c['in_zone'][start:end]
+        records['entry'] = -1
+        return (int(c['frame_label'][pos]), int(c['current_total'][pos]), int(c['total_counted'][pos]),
+                int(c['active_tracks'][pos]), DetectionBatch(records, self.class_names))
+
+
+def media_root():
+    """Django's MEDIA_ROOT when running inside the project, else ./media"""
+    try:
+        from django.conf import settings
+    except ImportError:
+        return 'media'
+    return str(settings.MEDIA_ROOT) if settings.configured else 'media'
+
+
+def detections_output_path(video_path, prefix=''):
+    """Where analysis writes the compact detections for ``video_path``"""
+    from datetime import datetime
+
+    name_without_ext = os.path.splitext(os.path.basename(video_path))[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(media_root(), 'detections', f"{prefix}{name_without_ext}_{timestamp}.npz")
+
+
+def render_annotated_video(video_path, detections_path, output_path, progress_tracker=None):
+    """Redraw the analysis overlays from saved detections, without running YOLO"""
+    replay = DetectionReplay(detections_path)
+    module_name, class_name = replay.meta['detector'].rsplit('.', 1)
+    detector_class = getattr(importlib.import_module(module_name), class_name)
+
+    # Detectors load YOLO weights lazily, so this never touches the model
+    detector = detector_class(**replay.meta.get('detector_kwargs', {}))
+    return detector.render_from_detections(video_path, replay, output_path, progress_tracker)
@@ -0,0 +1,87 @@
+# ml/frame_scheduler.py
+import cv2
+
+
+class MotionFrameScheduler:
+    """Decide per frame whether full YOLO inference is needed.
+
+    Each frame is shrunk to a small grayscale thumbnail and compared with the
+    thumbnail of the last frame that was inferred. Inference runs when:
+      - vehicles were visible in the last inferred frame (tracks need dense sampling),
+      - the scene changed enough around the counting zone or across the frame,
+      - or ``max_skip`` frames have passed since the last inference.
+    On an empty, static road this drops to one inference every ``max_skip`` frames.
+    """
+
+    def __init__(self, motion_threshold=2.0, max_skip=15, thumb_width=160, zone_margin=0.25):
+        self.motion_threshold = motion_threshold
+        self.max_skip = max(1, int(max_skip))
+        self.thumb_width = thumb_width
+        self.zone_margin = zone_margin
+
+        self.thumb_size = None
+        self.zone_slice = None
+        self.reference = None
+        self.last_inferred = None
+
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.motion_triggers = 0
+        self.track_triggers = 0
+
+    def set_zone(self, zone, frame_shape):
+        """Map the counting zone (full-res pixels, plus a margin) onto the thumbnail"""
+        height, width = frame_shape[:2]
+        scale = self.thumb_width / width
+        self.thumb_size = (self.thumb_width, max(1, int(height * scale)))
+
+        margin_y = (zone['bottom'] - zone['top']) * self.zone_margin
+        margin_x = (zone['right'] - zone['left']) * self.zone_margin
+        top = max(0, int((zone['top'] - margin_y) * scale))
+        bottom = min(self.thumb_size[1], int((zone['bottom'] + margin_y) * scale) + 1)
+        left = max(0, int((zone['left'] - margin_x) * scale))
+        right = min(self.thumb_size[0], int((zone['right'] + margin_x) * scale) + 1)
+        self.zone_slice = (slice(top, bottom), slice(left, right))
+
+    def should_infer(self, frame, frame_number, vehicles_visible):
+        if self.thumb_size is None:
+            self.set_zone({'top': 0, 'bottom': frame.shape[0], 'left': 0, 'right': frame.shape[1]}, frame.shape)
+
+        thumb = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        thumb = cv2.GaussianBlur(cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        infer = False
+        if self.reference is None or vehicles_visible:
+            infer = True
+            if vehicles_visible:
+                self.track_triggers += 1
+        elif frame_number - self.last_inferred >= self.max_skip:
+            infer = True
+        else:
+            diff = cv2.absdiff(thumb, self.reference)
+            zone_score = float(diff[self.zone_slice].mean())
+            global_score = float(diff.mean())
+            if zone_score > self.motion_threshold or global_score > self.motion_threshold:
+                infer = True
+                self.motion_triggers += 1
+
+        if infer:
+            self.reference = thumb
+            self.last_inferred = frame_number
+            self.frames_inferred += 1
+        else:
+            self.frames_skipped += 1
+        return infer
+
+    def get_stats(self):
+        total = self.frames_inferred + self.frames_skipped
+        return {
+            'mode': 'adaptive',
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_skipped,
+            'skip_ratio': round(self.frames_skipped / total, 3) if total else 0,
+            'motion_triggers': self.motion_triggers,
+            'track_triggers': self.track_triggers,
+            'max_skip': self.max_skip,
+            'motion_threshold': self.motion_threshold
+        }
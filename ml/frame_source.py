@@ -0,0 +1,154 @@
+# ml/frame_source.py
+import cv2
+import numpy as np
+
+
+def roi_around(bounds, frame_size, margin=0.15):
+    """Crop rectangle around ``bounds`` (left, top, right, bottom), grown by
+    ``margin`` of the frame size on every side and clipped to the frame"""
+    width, height = frame_size
+    left, top, right, bottom = bounds
+    margin_x, margin_y = int(width * margin), int(height * margin)
+    return (max(0, left - margin_x), max(0, top - margin_y),
+            min(width, right + 1 + margin_x), min(height, bottom + 1 + margin_y))
+
+
+def roi_from_fractions(fractions, frame_size):
+    """Crop rectangle from [left, top, right, bottom] fractions of the frame"""
+    width, height = frame_size
+    left, top, right, bottom = fractions
+    return (max(0, int(left * width)), max(0, int(top * height)),
+            min(width, int(round(right * width))), min(height, int(round(bottom * height))))
+
+
+class FrameSource:
+    """Video frames for the analysis pipeline, decoded into reused buffers.
+
+    The capture asks OpenCV for any available hardware decoder when
+    ``hw_decode`` is set (VIDEO_ACCELERATION_ANY falls back to software when
+    there is none). Frames land in a ring of preallocated buffers and, when a
+    region of interest or ``target_width`` is configured, are cropped and
+    downscaled into a second ring, so the motion check, YOLO letterboxing and
+    the pipeline queues only ever see the small view.
+
+    Boxes found in a view go back to full-frame pixels through ``view_scale``
+    and ``view_offset``; ``full_frame(view)`` returns the decoded frame a view
+    was cut from, for drawing overlays at full resolution.
+
+    Buffers are reused, so ``allocate`` must be given more buffers than the
+    pipeline holds at once (see VideoPipeline.frames_in_flight).
+    """
+
+    def __init__(self, video_path, hw_decode=False):
+        params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY] if hw_decode else []
+        self.cap = cv2.VideoCapture(video_path, cv2.CAP_ANY, params)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.hw_decode = hw_decode
+
+        self.roi = (0, 0, self.width, self.height)
+        self.view_scale = 1.0
+        self.view_size = (self.width, self.height)
+        self._frames = []
+        self._views = []
+        self._next = 0
+        # Data pointer of each view handed out -> index of the frame it was cut from
+        self._view_sources = {}
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    @property
+    def frame_shape(self):
+        return (self.height, self.width, 3)
+
+    @property
+    def view_shape(self):
+        return (self.view_size[1], self.view_size[0], 3)
+
+    @property
+    def view_offset(self):
+        return self.roi[:2]
+
+    @property
+    def reduced(self):
+        return self.view_size != (self.width, self.height)
+
+    def set_view(self, roi=None, target_width=None):
+        """Crop frames to ``roi`` (left, top, right, bottom; right/bottom exclusive)
+        and shrink the crop to at most ``target_width`` pixels wide"""
+        left, top, right, bottom = roi or (0, 0, self.width, self.height)
+        if right <= left or bottom <= top:
+            raise ValueError(f"empty region of interest: {roi}")
+        self.roi = (left, top, right, bottom)
+        crop_width, crop_height = right - left, bottom - top
+        self.view_scale = min(1.0, target_width / crop_width) if target_width else 1.0
+        self.view_size = (max(1, int(round(crop_width * self.view_scale))),
+                          max(1, int(round(crop_height * self.view_scale))))
+        self._views = []
+
+    def allocate(self, count):
+        """Preallocate ``count`` frame buffers (and view buffers when frames are shrunk)"""
+        count = max(1, int(count))
+        self._frames = [np.empty(self.frame_shape, dtype=np.uint8) for _ in range(count)]
+        if self.view_scale < 1.0:
+            self._views = [np.empty(self.view_shape, dtype=np.uint8) for _ in range(count)]
+        self._next = 0
+        self._view_sources = {}
+
+    def read(self):
+        if not self._frames:
+            self.allocate(1)
+        index = self._next
+        self._next = (index + 1) % len(self._frames)
+
+        ret, frame = self.cap.read(self._frames[index])
+        if not ret:
+            return False, None
+        if frame is not self._frames[index]:
+            # The decoder picked another size or layout; keep its buffer for next time
+            self._frames[index] = frame
+        if not self.reduced:
+            return True, frame
+
+        left, top, right, bottom = self.roi
+        view = frame[top:bottom, left:right]
+        if self.view_scale < 1.0:
+            view = cv2.resize(view, self.view_size, dst=self._views[index], interpolation=cv2.INTER_AREA)
+        self._view_sources[view.ctypes.data] = index
+        return True, view
+
+    def full_frame(self, view):
+        """The full-resolution frame ``view`` was read from"""
+        if not self.reduced:
+            return view
+        return self._frames[self._view_sources[view.ctypes.data]]
+
+    def zone_to_view(self, zone):
+        """Map a zone dict (top / bottom / left / right, full-frame pixels) into view pixels"""
+        left, top = self.view_offset
+        scale = self.view_scale
+        return {
+            'top': int((zone['top'] - top) * scale), 'bottom': int((zone['bottom'] - top) * scale),
+            'left': int((zone['left'] - left) * scale), 'right': int((zone['right'] - left) * scale)
+        }
+
+    def seek(self, frame_number):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+
+    def release(self):
+        self.cap.release()
+        self._frames, self._views, self._view_sources = [], [], {}
+
+    def describe(self):
+        """Decode settings for the report"""
+        return {
+            'hw_decode': self.hw_decode,
+            'hw_acceleration': int(self.cap.get(cv2.CAP_PROP_HW_ACCELERATION)) if self.hw_decode else 0,
+            'frame_size': [self.width, self.height],
+            'roi': list(self.roi),
+            'view_size': list(self.view_size),
+            'view_scale': round(self.view_scale, 4)
+        }
@@ -0,0 +1,138 @@
+# ml/model_registry.py
+import threading
+from collections import OrderedDict
+from ultralytics import YOLO
+from .inference_backend import (
+    check_backend, export_model, export_size_bytes, load_exported_model, set_torch_threads
+)
+
+
+class SharedModel:
+    """A loaded YOLO model shared by every detector that asks for the same weights.
+
+    The model only holds weights. Tracker state lives in each detector's own
+    ``BatchedTracker``, so concurrent videos never see each other's tracks.
+    ``lock`` serializes forward passes, because an ultralytics predictor keeps
+    per-call state and must not be used from two threads at once.
+    """
+
+    def __init__(self, key, model, size_bytes):
+        self.key = key
+        self.model = model
+        self.size_bytes = size_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+
+
+class ModelRegistry:
+    """Process-wide LRU cache of YOLO models keyed by (weights, device, imgsz, backend, int8, threads).
+
+    Non-torch backends (see ml.inference_backend) load a cached ONNX /
+    OpenVINO export of the weights and always run on the CPU.
+    """
+
+    MAX_MODELS = 3
+    MEMORY_BUDGET_MB = 2048
+
+    def __init__(self, max_models=MAX_MODELS, memory_budget_mb=MEMORY_BUDGET_MB):
+        self.max_models = max_models
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, model_path, device='cpu', imgsz=None, backend='torch', int8=False, threads=None):
+        """Return the SharedModel for these weights, loading it on first use"""
+        check_backend(backend)
+        if backend != 'torch':
+            device = 'cpu'
+        key = (str(model_path), str(device), imgsz, backend, bool(int8), threads)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                entry.hits += 1
+                return entry
+            # Only one thread loads a given model; others wait for it
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    entry.hits += 1
+                    return entry
+
+            print(f"📦 Loading YOLO weights into model registry: {model_path} ({device}, {backend})")
+            if backend == 'torch':
+                model = YOLO(model_path)
+                if device == 'cuda':
+                    model.model.to(device)
+                else:
+                    set_torch_threads(threads)
+                size_bytes = self._estimate_size(model)
+            else:
+                export_path = export_model(model_path, backend, imgsz or 640, int8)
+                model = load_exported_model(export_path, backend, imgsz or 640, threads)
+                size_bytes = export_size_bytes(export_path)
+            entry = SharedModel(key, model, size_bytes)
+
+            with self._lock:
+                self._models[key] = entry
+                self._loading.pop(key, None)
+                self._evict(keep=key)
+
+        return entry
+
+    def _evict(self, keep):
+        """Drop least recently used models until both limits are met"""
+        while len(self._models) > 1:
+            total_bytes = sum(entry.size_bytes for entry in self._models.values())
+            if len(self._models) <= self.max_models and total_bytes <= self.memory_budget_bytes:
+                break
+            oldest_key = next(iter(self._models))
+            if oldest_key == keep:
+                break
+            evicted = self._models.pop(oldest_key)
+            # Detectors that still hold the model keep it alive until they finish
+            print(f"♻️ Evicted {evicted.key[0]} ({evicted.size_bytes / 1e6:.0f} MB) from model registry")
+
+    @staticmethod
+    def _estimate_size(model):
+        """Approximate memory held by the model's parameters and buffers"""
+        try:
+            module = model.model
+            tensors = list(module.parameters()) + list(module.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'models': [
+                    {
+                        'weights': entry.key[0],
+                        'device': entry.key[1],
+                        'imgsz': entry.key[2],
+                        'backend': entry.key[3],
+                        'int8': entry.key[4],
+                        'size_mb': round(entry.size_bytes / (1024 * 1024), 1),
+                        'hits': entry.hits
+                    }
+                    for entry in self._models.values()
+                ],
+                'total_mb': round(sum(e.size_bytes for e in self._models.values()) / (1024 * 1024), 1),
+                'max_models': self.max_models,
+                'memory_budget_mb': round(self.memory_budget_bytes / (1024 * 1024), 1)
+            }
+
+
+# Shared by every detector in this process
+model_registry = ModelRegistry()
@@ -0,0 +1,147 @@
+# ml/overlay_renderer.py
+from collections import OrderedDict
+from functools import lru_cache
+import cv2
+import numpy as np
+
+
+@lru_cache(maxsize=4096)
+def text_size(text, font_face, font_scale, thickness):
+    """Cached cv2.getTextSize: ((width, height), baseline)"""
+    return cv2.getTextSize(text, font_face, font_scale, thickness)
+
+
+class OverlaySprite:
+    """The pixels a drawing function sets, captured once and pasted many times.
+
+    ``draw(canvas, origin)`` runs twice, on an all-0 and an all-255 canvas.
+    The dark result is the sprite's premultiplied color and the difference
+    between the two is how much of the background shows through, so
+    anti-aliased text edges blend onto each frame the way OpenCV would have
+    drawn them (to within rounding).
+
+    Sparse sprites (a zone outline across the whole frame) keep only the
+    touched pixels and update just those on paste.
+    """
+
+    __slots__ = ('pixels', 'transmission', 'offset', 'shape', 'points')
+
+    # Above this share of touched pixels the sprite is blended as one dense block
+    SPARSE_FRACTION = 0.25
+
+    def __init__(self, size, draw, origin=(0, 0)):
+        width, height = size
+        dark = np.zeros((height, width, 3), dtype=np.uint8)
+        light = np.full((height, width, 3), 255, dtype=np.uint8)
+        draw(dark, origin)
+        draw(light, origin)
+        transmission = light.astype(np.uint16) - dark
+
+        touched = (transmission < 255).any(axis=2)
+        ys, xs = np.nonzero(touched)
+        self.points = None
+        if len(xs) == 0:
+            self.pixels, self.transmission, self.offset, self.shape = None, None, (0, 0), (0, 0)
+            return
+        top, bottom, left, right = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        # Position of the trimmed sprite relative to ``origin``
+        self.offset = (left - origin[0], top - origin[1])
+        self.shape = (bottom - top, right - left)
+        if len(xs) < self.SPARSE_FRACTION * self.shape[0] * self.shape[1]:
+            self.points = (ys - top, xs - left)
+            self.pixels = dark[ys, xs].astype(np.uint16)
+            self.transmission = transmission[ys, xs]
+        else:
+            self.pixels = dark[top:bottom, left:right].astype(np.uint16)
+            self.transmission = transmission[top:bottom, left:right].copy()
+
+    def paste(self, frame, position=(0, 0)):
+        """Draw the sprite onto ``frame`` with ``origin`` at ``position``, clipped to the frame"""
+        if self.pixels is None:
+            return
+        height, width = frame.shape[:2]
+        x0, y0 = position[0] + self.offset[0], position[1] + self.offset[1]
+        sprite_h, sprite_w = self.shape
+        left, top = max(0, x0), max(0, y0)
+        right, bottom = min(width, x0 + sprite_w), min(height, y0 + sprite_h)
+        if left >= right or top >= bottom:
+            return
+        if self.points is not None:
+            ys, xs = self.points[0] + y0, self.points[1] + x0
+            pixels, transmission = self.pixels, self.transmission
+            if left != x0 or top != y0 or right != x0 + sprite_w or bottom != y0 + sprite_h:
+                inside = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+                ys, xs, pixels, transmission = ys[inside], xs[inside], pixels[inside], transmission[inside]
+            frame[ys, xs] = pixels + (frame[ys, xs] * transmission + 127) // 255
+            return
+        sprite_rows, sprite_cols = slice(top - y0, bottom - y0), slice(left - x0, right - x0)
+        roi = frame[top:bottom, left:right]
+        transmission = self.transmission[sprite_rows, sprite_cols]
+        roi[:] = self.pixels[sprite_rows, sprite_cols] + (roi * transmission + 127) // 255
+
+
+def blend_rect(frame, top_left, bottom_right, color, alpha):
+    """Same as drawing a filled rectangle on a copy and cv2.addWeighted(copy, alpha, frame, 1 - alpha),
+    but only the rectangle's pixels are touched"""
+    height, width = frame.shape[:2]
+    left, top = max(0, top_left[0]), max(0, top_left[1])
+    right, bottom = min(width, bottom_right[0] + 1), min(height, bottom_right[1] + 1)
+    if left >= right or top >= bottom:
+        return
+    roi = frame[top:bottom, left:right]
+    # ``roi`` is a view, so OpenCV writes the blend straight into the frame
+    cv2.addWeighted(_solid_fill(bottom - top, right - left, tuple(color)), alpha, roi, 1 - alpha, 0, dst=roi)
+
+
+@lru_cache(maxsize=16)
+def _solid_fill(height, width, color):
+    fill = np.empty((height, width, 3), dtype=np.uint8)
+    fill[:] = color
+    return fill
+
+
+def draw_label(frame, text, anchor, background, font_scale=0.5, text_color=(255, 255, 255),
+               text_thickness=1, size_thickness=1, font_face=cv2.FONT_HERSHEY_SIMPLEX):
+    """Filled label box sitting on ``anchor`` (a box's top-left corner) with the text inside it.
+
+    Drawn directly rather than from a sprite: a label carries the box's
+    confidence and track ID, so its text is new on almost every frame.
+    """
+    label_w, label_h = text_size(text, font_face, font_scale, size_thickness)[0]
+    x, y = anchor
+    cv2.rectangle(frame, (x, y - label_h - 10), (x + label_w, y), background, -1)
+    cv2.putText(frame, text, (x, y - 5), font_face, font_scale, text_color, text_thickness)
+
+
+class TextSprites:
+    """LRU cache of rendered text sprites, keyed by their text and style.
+
+    Meant for text that repeats across frames (panel lines, totals); text
+    that changes every frame is cheaper to draw with cv2.putText.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._sprites = OrderedDict()
+
+    def _get(self, key, build):
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = self._sprites[key] = build()
+            if len(self._sprites) > self.max_entries:
+                self._sprites.popitem(last=False)
+        else:
+            self._sprites.move_to_end(key)
+        return sprite
+
+    def text(self, frame, text, org, font_scale, color, thickness, font_face=cv2.FONT_HERSHEY_SIMPLEX):
+        """cv2.putText(frame, text, org, ...) from a cached sprite"""
+        def build():
+            (text_w, text_h), baseline = text_size(text, font_face, font_scale, thickness)
+            pad = 2 * thickness + 4
+            origin = (pad, text_h + pad)
+            size = (text_w + 2 * pad, text_h + baseline + 2 * pad)
+            return OverlaySprite(size, lambda canvas, o: cv2.putText(
+                canvas, text, o, font_face, font_scale, color, thickness), origin)
+
+        self._get(('text', text, font_face, font_scale, color, thickness), build).paste(frame, org)
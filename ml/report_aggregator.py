@@ -0,0 +1,167 @@
+# ml/report_aggregator.py
+import os
+from array import array
+
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+
+class StreamingReportAggregator:
+    """Running statistics for the analysis report without a record per frame.
+
+    Peak and mean vehicles per frame and mean detection confidence are
+    updated as frames arrive. The traffic pattern compares the first and
+    second half of the frames actually processed, a split only known at the
+    end (the container's frame count is often 0 or wrong), so vehicles per
+    frame are summed into at most ``BUCKETS`` buckets of consecutive frames:
+    16 KB however long the video. Buckets hold one frame each until they run
+    out, then neighbours are paired up, doubling the frames per bucket. The
+    halves are exact up to ``BUCKETS`` frames; past that, the bucket holding
+    the split is divided in proportion to its frames. Aggregators of
+    consecutive segments merge like a single pass.
+    """
+
+    BUCKETS = 1024
+
+    def __init__(self):
+        self.frames = 0
+        self.peak = 0
+        self.total_sum = 0
+        self.confidence_sum = 0.0
+        self.confidence_count = 0
+        # Frames and vehicles per bucket; a new bucket starts once the last one holds ``bucket_size`` frames
+        self.bucket_frames = array('Q')
+        self.bucket_sums = array('Q')
+        self.bucket_size = 1
+
+    def __setstate__(self, state):
+        # Checkpoints written before bucketing kept (value, run) pairs; a run is a bucket of equal frames
+        if 'run_values' in state:
+            values, lengths = state.pop('run_values'), state.pop('run_lengths')
+            state.update(bucket_frames=array('Q', lengths), bucket_size=1,
+                         bucket_sums=array('Q', (value * length for value, length in zip(values, lengths))))
+        self.__dict__.update(state)
+        self._coarsen()
+
+    def add(self, frame_number, total_vehicles, detections):
+        self.frames += 1
+        self.total_sum += total_vehicles
+        if total_vehicles > self.peak:
+            self.peak = total_vehicles
+        # ``detections`` is a DetectionBatch
+        self.confidence_sum += float(detections.confidences.sum(dtype='float64'))
+        self.confidence_count += len(detections)
+
+        if self.bucket_frames and self.bucket_frames[-1] < self.bucket_size:
+            self.bucket_frames[-1] += 1
+            self.bucket_sums[-1] += total_vehicles
+        else:
+            self.bucket_frames.append(1)
+            self.bucket_sums.append(total_vehicles)
+            if len(self.bucket_frames) > self.BUCKETS:
+                self._coarsen()
+
+    def _coarsen(self):
+        """Pair up neighbouring buckets until they fit in ``BUCKETS``"""
+        while len(self.bucket_frames) > self.BUCKETS:
+            frames, sums = self.bucket_frames, self.bucket_sums
+            self.bucket_frames = array('Q', (sum(frames[i:i + 2]) for i in range(0, len(frames), 2)))
+            self.bucket_sums = array('Q', (sum(sums[i:i + 2]) for i in range(0, len(sums), 2)))
+            self.bucket_size *= 2
+
+    def merge(self, other):
+        """Fold in an aggregator of the segment that follows this one"""
+        self.frames += other.frames
+        self.peak = max(self.peak, other.peak)
+        self.total_sum += other.total_sum
+        self.confidence_sum += other.confidence_sum
+        self.confidence_count += other.confidence_count
+        self.bucket_frames.extend(other.bucket_frames)
+        self.bucket_sums.extend(other.bucket_sums)
+        self.bucket_size = max(self.bucket_size, other.bucket_size)
+        self._coarsen()
+        return self
+
+    def _first_half_sum(self):
+        """Vehicles summed over the first ``frames // 2`` frames"""
+        remaining = self.frames // 2
+        total = 0
+        for frames, vehicles in zip(self.bucket_frames, self.bucket_sums):
+            if remaining <= 0:
+                break
+            if frames <= remaining:
+                total += vehicles
+            else:
+                total += vehicles * remaining / frames
+            remaining -= frames
+        return total
+
+    @property
+    def mean_vehicles(self):
+        return self.total_sum / self.frames if self.frames else 0
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.confidence_count if self.confidence_count else 0
+
+    @property
+    def first_half_mean(self):
+        half = self.frames // 2
+        return self._first_half_sum() / half if half else 0
+
+    @property
+    def second_half_mean(self):
+        half = self.frames - self.frames // 2
+        return (self.total_sum - self._first_half_sum()) / half if half else 0
+
+
+class FrameRecordSpill:
+    """Streams per-frame records to Parquet part files under ``directory``.
+
+    Rows are buffered ``chunk_rows`` at a time, so memory stays bounded no
+    matter how long the video is. Read the result back with
+    ``polars.scan_parquet(f"{directory}/*.parquet")``.
+    """
+
+    COLUMNS = ('frame_number', 'timestamp', 'total_vehicles', 'detections', 'mean_confidence')
+
+    def __init__(self, directory, class_names, prefix='part', chunk_rows=10000):
+        self.directory = directory
+        self.class_names = list(class_names)
+        self.prefix = prefix
+        self.chunk_rows = chunk_rows
+        self.parts = 0
+        self.rows = 0
+        self._buffer = {column: [] for column in self.COLUMNS + tuple(self.class_names)}
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, frame_number, timestamp, current_counts, detections):
+        buffer = self._buffer
+        buffer['frame_number'].append(frame_number)
+        buffer['timestamp'].append(timestamp)
+        buffer['total_vehicles'].append(sum(current_counts.values()))
+        buffer['detections'].append(len(detections))
+        buffer['mean_confidence'].append(
+            float(detections.confidences.mean(dtype='float64')) if len(detections) else None
+        )
+        for class_name in self.class_names:
+            buffer[class_name].append(current_counts.get(class_name, 0))
+
+        if len(buffer['frame_number']) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer['frame_number']:
+            return
+        self.parts += 1
+        self.rows += len(self._buffer['frame_number'])
+        part_path = os.path.join(self.directory, f"{self.prefix}-{self.parts:05d}.parquet")
+        pl.DataFrame(self._buffer).write_parquet(part_path)
+        self._buffer = {column: [] for column in self._buffer}
+
+    def close(self):
+        self.flush()
+        return self.directory
@@ -0,0 +1,108 @@
+# ml/sharded_analysis.py
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .report_aggregator import StreamingReportAggregator
+
+
+def plan_segments(total_frames, fps, segment_seconds, overlap_seconds):
+    """Split a video into consecutive segments, each with a warm-up overlap.
+
+    Every frame is owned by exactly one segment ([start, end)). A segment starts
+    decoding at ``warmup_start`` so its tracker already knows the vehicles that
+    are crossing the seam; those vehicles were counted by the previous segment.
+    """
+    segment_frames = max(1, int(segment_seconds * fps))
+    overlap_frames = max(0, int(overlap_seconds * fps))
+
+    segments = []
+    start = 0
+    while start < total_frames:
+        end = min(total_frames, start + segment_frames)
+        segments.append({
+            'index': len(segments),
+            'warmup_start': max(0, start - overlap_frames),
+            'start': start,
+            'end': end
+        })
+        start = end
+    return segments
+
+
+def analyze_segment(video_path, segment, detector_kwargs):
+    """Process-pool entry point: analyse one segment with a fresh detector"""
+    from .vehicle_detector import RTXVehicleDetector
+
+    detector = RTXVehicleDetector(**detector_kwargs)
+    return detector.analyze_segment(video_path, segment)
+
+
+def merge_segment_results(results):
+    """Combine per-segment outputs, in order, into one set of counts, report statistics and detections"""
+    vehicle_counts = defaultdict(int)
+    approach_counts = defaultdict(lambda: defaultdict(int))
+    report_stats = None
+    detections = None
+    seam_suppressed = 0
+    frame_skipping = {'frames_inferred': 0, 'frames_skipped': 0}
+
+    for result in sorted(results, key=lambda r: r['segment']['index']):
+        if detections is None:
+            detections = result['detections']
+        else:
+            detections.append(result['detections'], counted_before=sum(vehicle_counts.values()))
+        for class_name, count in result['vehicle_counts'].items():
+            vehicle_counts[class_name] += count
+        for approach, counts in result.get('approach_counts', {}).items():
+            for class_name, count in counts.items():
+                approach_counts[approach][class_name] += count
+        if report_stats is None:
+            report_stats = StreamingReportAggregator()
+        report_stats.merge(result['report_stats'])
+        seam_suppressed += result['seam_suppressed']
+        frame_skipping['mode'] = result['frame_skipping']['mode']
+        frame_skipping['frames_inferred'] += result['frame_skipping']['frames_inferred']
+        frame_skipping['frames_skipped'] += result['frame_skipping']['frames_skipped']
+
+    return (vehicle_counts, approach_counts, report_stats or StreamingReportAggregator(), detections,
+            seam_suppressed, frame_skipping)
+
+
+def run_sharded_analysis(video_path, segments, detector_kwargs, workers, progress_tracker=None):
+    """Analyse ``segments`` in a process pool and merge them back in video order.
+
+    Returns the merged counts, report statistics, a DetectionRecorder of the
+    whole video and the sharding stats.
+    """
+    print(f"🧩 Sharded analysis: {len(segments)} segments on {workers} processes")
+    start = time.time()
+    # spawn keeps CUDA and Django state out of the children
+    context = multiprocessing.get_context('spawn')
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(analyze_segment, video_path, segment, detector_kwargs) for segment in segments]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results.append(result)
+            segment = result['segment']
+            print(f"✓ Segment {segment['index'] + 1}/{len(segments)} done "
+                  f"(frames {segment['start']}-{segment['end']}, {result['processing_time']:.1f}s)")
+            if progress_tracker:
+                progress = min(95, 5 + int(90 * done / len(segments)))
+                progress_tracker.set_progress(progress, f"Analysed segment {done}/{len(segments)}")
+
+    vehicle_counts, approach_counts, report_stats, detections, seam_suppressed, frame_skipping = \
+        merge_segment_results(results)
+    stats = {
+        'workers': workers,
+        'segments': len(segments),
+        'seam_duplicates_suppressed': seam_suppressed,
+        'frame_skipping': frame_skipping,
+        'wall_time_seconds': round(time.time() - start, 3),
+        'segment_times_seconds': [
+            round(r['processing_time'], 3) for r in sorted(results, key=lambda r: r['segment']['index'])
+        ]
+    }
+    return vehicle_counts, approach_counts, report_stats, detections, stats
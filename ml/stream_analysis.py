@@ -0,0 +1,256 @@
+# ml/stream_analysis.py
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+import cv2
+from .frame_source import FrameSource
+from .report_aggregator import StreamingReportAggregator
+from .video_pipeline import VideoPipeline
+
+# Stream metadata often carries no frame rate (or a 90 kHz clock rate)
+DEFAULT_STREAM_FPS = 30
+# Seconds between reconnect attempts to a dropped stream; the last delay repeats
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+# Tracks unseen for this long are gone for good (ByteTrack drops lost tracks after ~1 s)
+STALE_TRACK_SECONDS = 10
+WINDOW_SECONDS = 60
+ROLLING_SECONDS = 300
+
+
+def is_live_source(url):
+    """rtsp://, http(s)://, udp://... streams, as opposed to local files and named pipes"""
+    return '://' in str(url)
+
+
+class StreamSource(FrameSource):
+    """FrameSource over a camera stream, or a local file / pipe standing in for one.
+
+    Live streams are reopened with backoff whenever they drop. Local files can
+    be paced to their frame rate (``realtime``) and ``loop`` forever, so a
+    recorded clip behaves like a camera. Reading ends once ``stop_event`` is
+    set, or at the end of a local file that is not looped.
+    """
+
+    def __init__(self, url, hw_decode=False, realtime=False, loop=False, stop_event=None):
+        super().__init__(url, hw_decode)
+        self.url = url
+        self.live = is_live_source(url)
+        self.realtime = realtime
+        self.loop = loop
+        self.stop_event = stop_event or threading.Event()
+        if not 0 < self.fps <= 240:
+            self.fps = DEFAULT_STREAM_FPS
+        self.reconnects = 0
+        self._paced_from = None
+        self._paced_frames = 0
+
+    def read(self):
+        while not self.stop_event.is_set():
+            ret, frame = super().read()
+            if ret:
+                if self.realtime:
+                    self._pace()
+                return True, frame
+            if self.live:
+                self._reconnect()
+            elif self.loop and self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                continue
+            else:
+                break
+        return False, None
+
+    def _pace(self):
+        """Hold each frame back until its presentation time, like a camera delivering it"""
+        now = time.monotonic()
+        if self._paced_from is None:
+            self._paced_from = now
+        self._paced_frames += 1
+        delay = self._paced_from + self._paced_frames / self.fps - now
+        if delay > 0:
+            self.stop_event.wait(delay)
+
+    def _reconnect(self):
+        self.cap.release()
+        attempt = 0
+        while not self.stop_event.is_set():
+            delay = RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+            print(f"📡 Stream dropped - reconnecting to {self.url} in {delay}s")
+            if self.stop_event.wait(delay):
+                return
+            params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY] if self.hw_decode else []
+            self.cap = cv2.VideoCapture(self.url, cv2.CAP_ANY, params)
+            if self.cap.isOpened():
+                if not self.width:
+                    self._probe()
+                self.reconnects += 1
+                self._paced_from = None
+                self._paced_frames = 0
+                print(f"✓ Reconnected to {self.url}")
+                return
+            attempt += 1
+
+    def _probe(self):
+        """Take frame rate and size from a stream that could not be opened at startup"""
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if not 0 < self.fps <= 240:
+            self.fps = DEFAULT_STREAM_FPS
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.roi = (0, 0, self.width, self.height)
+        self.view_size = (self.width, self.height)
+
+    def wait_until_open(self):
+        """Keep reconnecting to a live stream that is down at startup; False if stopped first"""
+        if not self.cap.isOpened() and self.live:
+            print(f"📡 {self.url} is not reachable yet - waiting for it")
+            self._reconnect()
+            self.reconnects = 0
+        return self.cap.isOpened()
+
+    def describe(self):
+        stats = super().describe()
+        stats.update(live=self.live, realtime=self.realtime, reconnects=self.reconnects)
+        return stats
+
+
+def _difference(totals, baseline):
+    return {key: count - baseline.get(key, 0) for key, count in totals.items() if count != baseline.get(key, 0)}
+
+
+class StreamWindows:
+    """Vehicle counts of a stream in fixed wall-clock windows.
+
+    Windows are aligned to multiples of ``window_seconds`` (per-minute windows
+    start on the minute). Counts are the difference of the detector's running
+    totals between two window edges, so nothing per vehicle is kept; a window
+    is handed to ``on_window`` as soon as the first frame of the next one
+    arrives. ``rolling_counts`` sums the last ``rolling_seconds`` of windows.
+    """
+
+    def __init__(self, on_window, window_seconds=WINDOW_SECONDS, rolling_seconds=ROLLING_SECONDS):
+        self.on_window = on_window
+        self.window_seconds = window_seconds
+        self.recent = deque(maxlen=max(1, int(rolling_seconds // window_seconds)))
+        self.rolling_seconds = self.recent.maxlen * window_seconds
+        self.index = None
+        self.windows = 0
+        self._reset({}, {})
+
+    def _reset(self, totals, approach_totals):
+        self.baseline = dict(totals)
+        self.approach_baseline = {approach: dict(counts) for approach, counts in approach_totals.items()}
+        self.stats = StreamingReportAggregator()
+        self.started = time.monotonic()
+
+    def advance(self, timestamp, totals, approach_totals, active_tracks):
+        """Call before each frame with the detector's running totals; flushes a finished window"""
+        index = int(timestamp // self.window_seconds)
+        if self.index is None:
+            self.index = index
+        elif index != self.index:
+            self.flush(totals, approach_totals, active_tracks)
+            self.index = index
+
+    def add_frame(self, frame_number, current_total, detections):
+        self.stats.add(frame_number, current_total, detections)
+
+    def flush(self, totals, approach_totals, active_tracks, partial=False):
+        if self.index is None or not self.stats.frames:
+            return None
+        counts = _difference(totals, self.baseline)
+        self.recent.append(counts)
+        rolling = {}
+        for window_counts in self.recent:
+            for vehicle, count in window_counts.items():
+                rolling[vehicle] = rolling.get(vehicle, 0) + count
+        elapsed = time.monotonic() - self.started
+        start = self.index * self.window_seconds
+
+        window = {
+            'start': datetime.fromtimestamp(start, tz=timezone.utc),
+            'end': datetime.fromtimestamp(start + self.window_seconds, tz=timezone.utc),
+            'window_seconds': self.window_seconds,
+            'partial': partial,
+            'vehicle_counts': counts,
+            'total_vehicles': sum(counts.values()),
+            'approach_counts': {
+                approach: difference for approach, approach_counts in approach_totals.items()
+                if (difference := _difference(approach_counts, self.approach_baseline.get(approach, {})))
+            },
+            'rolling_counts': rolling,
+            'rolling_seconds': self.rolling_seconds,
+            'frames': self.stats.frames,
+            'mean_vehicles': round(self.stats.mean_vehicles, 2),
+            'peak_vehicles': self.stats.peak,
+            'mean_confidence': round(self.stats.mean_confidence, 3),
+            'active_tracks': active_tracks,
+            'processing_fps': round(self.stats.frames / elapsed, 2) if elapsed > 0 else 0
+        }
+        self.windows += 1
+        self._reset(totals, approach_totals)
+        self.on_window(window)
+        return window
+
+
+def analyze_stream(detector, url, on_window, window_seconds=WINDOW_SECONDS, realtime=False, loop=False,
+                   stop_event=None, clock=time.time):
+    """Count vehicles on a stream until it is stopped, reporting every window to ``on_window``.
+
+    ``detector`` provides the stream hooks of RTXVehicleDetector and
+    BaliwasanYJunctionDetector (start_stream, process_stream_frame,
+    counted_totals, forget_tracks). Frames go through the tracker one at a
+    time, and tracks unseen for STALE_TRACK_SECONDS are dropped from the
+    detector, so memory stays flat however long the stream runs.
+    """
+    source = StreamSource(url, detector.hw_decode, realtime, loop, stop_event)
+    if not source.wait_until_open():
+        source.release()
+        if source.live:
+            print(f"📡 Stopped before {url} came up")
+            return {'frames': 0, 'windows': 0, 'vehicle_counts': {}, 'pipeline': None, 'decode': None}
+        raise Exception(f"Cannot open stream: {url}")
+    print(f"📡 Streaming {url}: {source.width}x{source.height} at {source.fps:.1f} FPS "
+          f"({'live' if source.live else 'replayed in real time' if realtime else 'replayed'})")
+    detector.start_stream(source)
+
+    stale_frames = max(1, int(STALE_TRACK_SECONDS * source.fps))
+    last_seen = {}
+    windows = StreamWindows(on_window, window_seconds)
+
+    def approach_totals():
+        return {approach: dict(counts) for approach, counts in detector.approach_counts.items()}
+
+    def infer(frames, first_frame_number):
+        for offset, frame in enumerate(frames):
+            frame_number = first_frame_number + offset
+            windows.advance(clock(), detector.counted_totals(), approach_totals(), len(last_seen))
+            current_total, detections = detector.process_stream_frame(frame, frame_number)
+            windows.add_frame(frame_number, current_total, detections)
+            if detections.has_ids:
+                last_seen.update(dict.fromkeys(detections.track_ids.tolist(), frame_number))
+            if frame_number % stale_frames == 0:
+                stale = [track_id for track_id, seen in last_seen.items() if frame_number - seen > stale_frames]
+                for track_id in stale:
+                    del last_seen[track_id]
+                detector.forget_tracks(stale)
+        return [None] * len(frames)
+
+    pipeline = VideoPipeline(infer, threaded=detector.pipelined)
+    source.allocate(pipeline.frames_in_flight())
+    try:
+        pipeline_stats = pipeline.run(source)
+    finally:
+        # Whatever was counted since the last window edge
+        windows.flush(detector.counted_totals(), approach_totals(), len(last_seen), partial=True)
+        decode_stats = source.describe()
+        source.release()
+
+    print(f"📡 Stream ended after {pipeline_stats['frames_decoded']} frames and {windows.windows} windows")
+    return {
+        'frames': pipeline_stats['frames_decoded'],
+        'windows': windows.windows,
+        'vehicle_counts': detector.counted_totals(),
+        'pipeline': pipeline_stats,
+        'decode': decode_stats
+    }
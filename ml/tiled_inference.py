@@ -0,0 +1,127 @@
+# ml/tiled_inference.py
+import math
+import numpy as np
+
+
+def _axis_starts(low, high, tile, size, overlap):
+    """Tile start positions covering [low, high) on one axis, kept inside [0, size)"""
+    if tile >= size:
+        return [0]
+    span = high - low
+    stride = max(1, int(tile * (1 - overlap)))
+    count = max(1, math.ceil((span - tile) / stride) + 1) if span > tile else 1
+    last = min(max(0, high - tile), size - tile)
+    first = min(max(0, low), last)
+    if count == 1:
+        # Centre a single tile on the span
+        return [min(max(0, (low + high - tile) // 2), size - tile)]
+    return sorted({int(round(first + i * (last - first) / (count - 1))) for i in range(count)})
+
+
+class TileLayout:
+    """Fixed grid of model-sized tiles over the counting zone of one video.
+
+    Tiles are ``tile_size`` pixels at the frame's own resolution, overlap by
+    ``overlap`` and cover the zone grown by ``margin`` of the frame on each
+    side, so tracks are picked up before they reach the zone. Only tiles
+    that intersect the zone itself are kept. The layout depends only on the
+    frame size and zone, so it is built once per video.
+    """
+
+    def __init__(self, frame_size, zone, tile_size=640, overlap=0.2, margin=0.1):
+        width, height = frame_size
+        self.frame_size = frame_size
+        self.tile_size = int(tile_size)
+        self.overlap = overlap
+
+        margin_x, margin_y = int(width * margin), int(height * margin)
+        left, right = max(0, zone['left'] - margin_x), min(width, zone['right'] + 1 + margin_x)
+        top, bottom = max(0, zone['top'] - margin_y), min(height, zone['bottom'] + 1 + margin_y)
+        tile_w, tile_h = min(self.tile_size, width), min(self.tile_size, height)
+
+        self.tiles = [
+            (x, y, x + tile_w, y + tile_h)
+            for y in _axis_starts(top, bottom, tile_h, height, overlap)
+            for x in _axis_starts(left, right, tile_w, width, overlap)
+            if x < zone['right'] and x + tile_w > zone['left'] and y < zone['bottom'] and y + tile_h > zone['top']
+        ]
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def crops(self, frame):
+        return [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.tiles]
+
+    def merge(self, tile_boxes, iou_threshold=0.5, fragment_threshold=0.1):
+        """One box set (x1 y1 x2 y2 conf cls rows, frame pixels) from per-tile boxes.
+
+        Same-class boxes are merged greedily, boxes seen whole first and then
+        highest confidence first:
+          - boxes seen whole by two tiles overlap with IoU >= ``iou_threshold``
+            and the weaker one is dropped, as in NMS;
+          - a box cut off by an inner tile edge is only part of a vehicle, so
+            it joins a box from another tile covering at least
+            ``fragment_threshold`` of the smaller of the two, and the kept box
+            grows to their union. Boxes of the same tile are never joined, and
+            a grown box only takes further fragments, so two whole vehicles
+            that touch stay apart.
+        """
+        shifted, clipped, sources = [], [], []
+        width, height = self.frame_size
+        for tile_index, (boxes, (x1, y1, x2, y2)) in enumerate(zip(tile_boxes, self.tiles)):
+            if not len(boxes):
+                continue
+            boxes = boxes[:, :6].astype(np.float32)
+            # Sides of the box lying on a tile edge that is not also the frame edge
+            clipped.append(
+                ((boxes[:, 0] <= 1) & (x1 > 0)) | ((boxes[:, 2] >= x2 - x1 - 1) & (x2 < width)) |
+                ((boxes[:, 1] <= 1) & (y1 > 0)) | ((boxes[:, 3] >= y2 - y1 - 1) & (y2 < height))
+            )
+            boxes[:, :4] += (x1, y1, x1, y1)
+            shifted.append(boxes)
+            sources.append(np.full(len(boxes), tile_index))
+        if not shifted:
+            return np.zeros((0, 6), dtype=np.float32)
+        data, clipped, sources = np.concatenate(shifted), np.concatenate(clipped), np.concatenate(sources)
+        if len(shifted) == 1:
+            return data
+
+        used = np.zeros(len(data), dtype=bool)
+        merged = []
+        for i in np.lexsort((-data[:, 4], clipped)):
+            if used[i]:
+                continue
+            used[i] = True
+            box = data[i].copy()
+            while True:
+                candidates = np.flatnonzero(~used & (data[:, 5] == box[5]))
+                if not len(candidates):
+                    break
+                others = data[candidates]
+                inter_w = np.minimum(box[2], others[:, 2]) - np.maximum(box[0], others[:, 0])
+                inter_h = np.minimum(box[3], others[:, 3]) - np.maximum(box[1], others[:, 1])
+                inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+                area = (box[2] - box[0]) * (box[3] - box[1])
+                other_areas = (others[:, 2] - others[:, 0]) * (others[:, 3] - others[:, 1])
+                iou = inter / np.maximum(area + other_areas - inter, 1e-9)
+                smaller_share = inter / np.maximum(np.minimum(area, other_areas), 1e-9)
+                fragments = (clipped[candidates] & (sources[candidates] != sources[i]) &
+                             (smaller_share >= fragment_threshold))
+                matched = (iou >= iou_threshold) | fragments
+                if not matched.any():
+                    break
+                used[candidates[matched]] = True
+                if fragments.any():
+                    # Fragments of one vehicle: grow the box to cover all of them
+                    parts = others[fragments]
+                    box[:2] = np.minimum(box[:2], parts[:, :2].min(axis=0))
+                    box[2:4] = np.maximum(box[2:4], parts[:, 2:4].max(axis=0))
+            merged.append(box)
+        return np.array(merged, dtype=np.float32)
+
+    def describe(self):
+        return {
+            'tile_size': self.tile_size,
+            'overlap': self.overlap,
+            'tiles': [list(tile) for tile in self.tiles]
+        }
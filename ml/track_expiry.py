@@ -0,0 +1,38 @@
+# ml/track_expiry.py
+import heapq
+
+
+class ExpiringTrackSet:
+    """Set of track IDs whose membership ends at a given frame number.
+
+    Expiry times sit in a min-heap, so adding a track and expiring the due
+    ones costs O(log n) with no timers or threads. Because it runs on video
+    frames rather than wall-clock time, the same video gives the same result
+    at any processing speed.
+    """
+
+    def __init__(self):
+        self._expires_at = {}
+        self._heap = []
+
+    def add(self, track_id, expires_at_frame):
+        self._expires_at[track_id] = expires_at_frame
+        heapq.heappush(self._heap, (expires_at_frame, track_id))
+
+    def expire(self, frame_number):
+        """Drop every track whose expiry frame is at or before ``frame_number``"""
+        heap = self._heap
+        while heap and heap[0][0] <= frame_number:
+            expires_at_frame, track_id = heapq.heappop(heap)
+            # Skip stale heap entries left behind when a track was re-added
+            if self._expires_at.get(track_id) == expires_at_frame:
+                del self._expires_at[track_id]
+
+    def discard(self, track_id):
+        self._expires_at.pop(track_id, None)
+
+    def __contains__(self, track_id):
+        return track_id in self._expires_at
+
+    def __len__(self):
+        return len(self._expires_at)
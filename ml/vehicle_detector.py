@@ -1,12 +1,25 @@
-import threading
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import torch
 from collections import defaultdict, deque
 import time
 from datetime import datetime
 import os
+from .batched_inference import BatchedTracker
+from .video_pipeline import VideoPipeline
+from .model_registry import model_registry
+from .sharded_analysis import plan_segments, run_sharded_analysis
+from .frame_scheduler import MotionFrameScheduler
+from .detection_store import DetectionRecorder, DetectionReplay, detections_output_path
+from .report_aggregator import StreamingReportAggregator, FrameRecordSpill, POLARS_AVAILABLE
+from .track_expiry import ExpiringTrackSet
+from .counting_zones import CountingGeometry
+from .detection_batch import DetectionBatch
+from .overlay_renderer import OverlaySprite, TextSprites, blend_rect, draw_label, text_size
+from .frame_source import FrameSource, roi_around, roi_from_fractions
+from .tiled_inference import TileLayout
+from .inference_backend import backend_available
+from .checkpoints import AnalysisCheckpoint, checkpoint_dir
 
 class Config:
     DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
@@ -19,25 +32,110 @@ class Config:
         1: 'bicycle'
     }
     CONFIDENCE_THRESHOLD = 0.3  # Lower threshold for better detection
+    IMAGE_SIZE = 640  # YOLO input size; also part of the shared model's registry key
     PROCESS_EVERY_N_FRAMES = 1  # Process every frame for better counting accuracy
+    ADAPTIVE_FRAME_SKIP = False  # Let scene motion decide which frames get inference (replaces the fixed skip)
+    ADAPTIVE_MAX_SKIP = 15  # Longest run of skipped frames on a static scene
+    MOTION_THRESHOLD = 2.0  # Mean grayscale difference (0-255) that counts as motion
+    RECOUNT_WINDOW_SECONDS = 2.0  # Video time before a counted track may be counted again
+    SPILL_FRAME_RECORDS = False  # Also write per-frame counts to Parquet under media/frame_records
+    INFERENCE_BATCH_SIZE = 1  # Frames per YOLO forward pass (1 = per-frame model.track)
+    PIPELINED_PROCESSING = True  # Overlap decode / inference / annotation / encoding in worker threads
+    PIPELINE_QUEUE_SIZE = 8  # Max frames buffered between two pipeline stages
+    SHARD_WORKERS = 1  # >1 splits long videos into segments analysed in parallel processes
+    SHARD_SEGMENT_SECONDS = 900  # Length of one segment in sharded mode
+    SHARD_OVERLAP_SECONDS = 3  # Warm-up before each segment so seam-crossing tracks are known
+    HW_DECODE = False  # Ask OpenCV for any hardware video decoder (falls back to software)
+    FRAME_ROI = None  # None = whole frame, 'zone' = around the counting zone, or [left, top, right, bottom] fractions
+    FRAME_ROI_MARGIN = 0.15  # Share of the frame kept on each side of the counting zone when FRAME_ROI is 'zone'
+    DECODE_WIDTH = None  # Shrink decoded frames (after cropping) to at most this width, e.g. the model's 640
+    TILE_SIZE = None  # Run the model on tiles of this many native pixels over the counting zone (None = whole frame)
+    TILE_OVERLAP = 0.2  # Overlap between neighbouring tiles; duplicates are merged with NMS
+    INFERENCE_BACKEND = 'torch'  # 'torch', or a cached CPU export: 'onnx' (ONNX Runtime) / 'openvino'
+    INT8_INFERENCE = False  # Quantize the exported model to INT8 (onnx / openvino backends)
+    INFERENCE_THREADS = None  # CPU threads for inference (None = the runtime's default)
+    CHECKPOINT_INTERVAL_SECONDS = 60  # Wall-clock seconds between resumable analysis checkpoints (0 = off)
     
     # Counting zone settings (will be set dynamically)
     ZONE_HEIGHT_RATIO = (0.60, 0.85)  # 60% to 85% of frame height
     ZONE_WIDTH_RATIO = (0.05, 0.95)   # 5% to 95% of frame width
 
+# Centers kept per track for trails and zone entry points
+TRACK_HISTORY_LENGTH = 30
+
 class RTXVehicleDetector:
-    def __init__(self, model_path=Config.MODEL_PATH):
-        print("Initializing YOLO model with GPU support...")
-        self.model = YOLO(model_path)
-        if Config.DEVICE == 'cuda':
-            self.model.model.to(Config.DEVICE)
+    def __init__(self, model_path=Config.MODEL_PATH, batch_size=Config.INFERENCE_BATCH_SIZE,
+                 pipelined=Config.PIPELINED_PROCESSING, shard_workers=Config.SHARD_WORKERS,
+                 shard_segment_seconds=Config.SHARD_SEGMENT_SECONDS, adaptive_skip=Config.ADAPTIVE_FRAME_SKIP,
+                 max_skip=Config.ADAPTIVE_MAX_SKIP, motion_threshold=Config.MOTION_THRESHOLD,
+                 analysis_only=False, spill_frame_records=Config.SPILL_FRAME_RECORDS, counting_zones=None,
+                 hw_decode=Config.HW_DECODE, frame_roi=Config.FRAME_ROI, decode_width=Config.DECODE_WIDTH,
+                 tile_size=Config.TILE_SIZE, tile_overlap=Config.TILE_OVERLAP,
+                 inference_backend=Config.INFERENCE_BACKEND, int8=Config.INT8_INFERENCE,
+                 inference_threads=Config.INFERENCE_THREADS,
+                 checkpoint_interval=Config.CHECKPOINT_INTERVAL_SECONDS):
+        self.model_path = model_path
+        # Weights are shared process-wide and loaded on first inference; tracker state stays per detector
+        self._shared_model = None
+        # Exported CPU backends (see ml.inference_backend) always run on the CPU
+        if not backend_available(inference_backend):
+            print(f"⚠️  {inference_backend} runtime is not installed - using PyTorch inference")
+            inference_backend = 'torch'
+        self.inference_backend = inference_backend
+        self.int8 = int8
+        self.inference_threads = inference_threads
+        self.device = Config.DEVICE if inference_backend == 'torch' else 'cpu'
         
         self.vehicle_classes = Config.VEHICLE_CLASSES
         self.conf_threshold = Config.CONFIDENCE_THRESHOLD
-        self.track_history = defaultdict(lambda: deque(maxlen=30))
+        self.track_history = defaultdict(lambda: deque(maxlen=TRACK_HISTORY_LENGTH))
+        # Per track: points appended so far and the latest in-zone point (for zone entry lookups)
+        self.track_point_counts = {}
+        self.last_zone_points = {}
         self.vehicle_counts = defaultdict(int)
-        self.crossed_objects = set()
-        self.frame_analyses = []
+        # Recently counted tracks, expiring by frame number (see RECOUNT_WINDOW_SECONDS)
+        self.crossed_objects = ExpiringTrackSet()
+        self.recount_window_frames = int(round(Config.RECOUNT_WINDOW_SECONDS * 30))
+        self.last_frame_number = -1
+        # Report statistics are aggregated as frames arrive instead of kept per frame
+        self.report_stats = StreamingReportAggregator()
+        self.last_counts = defaultdict(int)
+        self.spill_frame_records = spill_frame_records
+        self.frame_spill = None
+        self.batch_size = max(1, int(batch_size))
+        self.batched_tracker = None
+        self.pipelined = pipelined
+        self.shard_workers = max(1, int(shard_workers))
+        self.shard_segment_seconds = shard_segment_seconds
+        # Frames before this only warm up the tracker (see analyze_segment)
+        self.count_from_frame = 0
+        self.seam_suppressed = 0
+        self.adaptive_skip = adaptive_skip
+        self.max_skip = max_skip
+        self.motion_threshold = motion_threshold
+        self.frame_scheduler = None
+        self.vehicles_visible = False
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        # Counts only: never annotate or encode a processed video
+        self.analysis_only = analysis_only
+        # Location zones / count lines (see ml.counting_zones); None keeps the default rectangle
+        self.counting_zones = counting_zones
+        self.counting_geometry = CountingGeometry.from_config(counting_zones)
+        self.approach_counts = defaultdict(lambda: defaultdict(int))
+        # Static overlay layers are built once per video; repeating panel text is cached as sprites
+        self.overlay_layers = None
+        self.text_sprites = TextSprites()
+        # Decode settings: inference can run on a cropped / shrunk view of each frame
+        self.hw_decode = hw_decode
+        self.frame_roi = frame_roi
+        self.decode_width = decode_width
+        # Tiled inference for small, distant vehicles (see ml.tiled_inference)
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_layout = None
+        # A failed analysis resumes from its last checkpoint (see ml.checkpoints)
+        self.checkpoint_interval = checkpoint_interval
         
         # Colors for different vehicle types
         self.colors = {
@@ -51,9 +149,23 @@ class RTXVehicleDetector:
         
         print("✓ RTXVehicleDetector initialized successfully")
 
-    def setup_counting_zone(self, frame):
-        """Setup higher counting zone to capture vehicles earlier"""
-        height, width = frame.shape[:2]
+    @property
+    def shared_model(self):
+        if self._shared_model is None:
+            print("Initializing YOLO model with GPU support...")
+            self._shared_model = model_registry.get(
+                self.model_path, self.device, Config.IMAGE_SIZE, backend=self.inference_backend, int8=self.int8,
+                threads=self.inference_threads
+            )
+        return self._shared_model
+
+    @property
+    def model(self):
+        return self.shared_model.model
+
+    def setup_counting_zone(self, frame_shape):
+        """Setup higher counting zone to capture vehicles earlier (sized from the frame's shape)"""
+        height, width = frame_shape[:2]
         
         # HIGHER COUNTING ZONE: Positioned in the upper part of the frame
         # Use 30% to 60% of frame height (moved much higher)
@@ -67,115 +179,182 @@ class RTXVehicleDetector:
         # Visual settings
         self.zone_color = (0, 255, 255)  # Bright yellow
         self.zone_thickness = 3
+        self.overlay_layers = None
+
+        if self.counting_geometry is not None:
+            # Configured zones and lines are rasterized once; the rectangle becomes their bounds
+            self.counting_geometry.bind(width, height)
+            bounds = self.counting_geometry.bounds()
+            self.zone_top, self.zone_bottom = bounds['top'], bounds['bottom']
+            self.zone_left, self.zone_right = bounds['left'], bounds['right']
+            print(f"✓ Counting approaches configured: {', '.join(self.counting_geometry.approaches)}")
         
         print(f"✓ HIGHER Counting zone configured: {self.zone_top}-{self.zone_bottom}px height")
         print(f"  Covers {self.zone_bottom - self.zone_top}px tall area")
         print(f"  Position: Top {int((self.zone_top/height)*100)}% to {int((self.zone_bottom/height)*100)}% of frame")
         
-        return {
+        zone = {
             'top': self.zone_top, 'bottom': self.zone_bottom,
             'left': self.zone_left, 'right': self.zone_right
         }
+        if self.adaptive_skip:
+            self.frame_scheduler = MotionFrameScheduler(self.motion_threshold, self.max_skip)
+            self.frame_scheduler.set_zone(zone, frame_shape)
+        return zone
+
+    def _open_frame_source(self, video_path):
+        """Open ``video_path`` and configure it for analysis"""
+        source = FrameSource(video_path, self.hw_decode)
+        if not source.isOpened():
+            raise Exception(f"Cannot open video file: {video_path}")
+        self._configure_frame_source(source)
+        return source
+
+    def _configure_frame_source(self, source):
+        """Size the counting zone from the source's properties and set up its decode view"""
+        zone = self.setup_counting_zone(source.frame_shape)
+
+        frame_size = (source.width, source.height)
+        roi = None
+        if self.frame_roi == 'zone':
+            roi = roi_around((self.zone_left, self.zone_top, self.zone_right, self.zone_bottom),
+                             frame_size, Config.FRAME_ROI_MARGIN)
+        elif self.frame_roi:
+            roi = roi_from_fractions(self.frame_roi, frame_size)
+        source.set_view(roi, self.decode_width)
+        tracker = self._get_tracker()
+        tracker.set_view(source)
+        # With a fixed skip the tracker only sees every Nth frame
+        tracker.set_frame_rate(source.fps if self.adaptive_skip else source.fps / Config.PROCESS_EVERY_N_FRAMES)
+        if self.frame_scheduler is not None:
+            self.frame_scheduler.set_zone(source.zone_to_view(zone), source.view_shape)
+        if source.reduced:
+            print(f"✂️  Inference view: {source.view_size[0]}x{source.view_size[1]} "
+                  f"from region {source.roi} of {source.width}x{source.height}")
+
+        # Tiles are laid out once per video, over the zone as it appears in the inference view
+        self.tile_layout = None
+        if self.tile_size:
+            self.tile_layout = TileLayout(source.view_size, source.zone_to_view(zone), self.tile_size, self.tile_overlap)
+            print(f"🧩 Tiled inference: {len(self.tile_layout)} tiles of {self.tile_layout.tile_size}px over the counting zone")
+        tracker.tile_layout = self.tile_layout
 
     def is_in_counting_zone(self, x, y, w, h):
-        """Enhanced detection for higher counting zone position"""
+        """Enhanced detection for higher counting zone position.
+
+        Works on scalars or on NumPy arrays of boxes (one test for every box in the frame).
+        """
+        left, right, top, bottom = self.zone_left, self.zone_right, self.zone_top, self.zone_bottom
         center_x, center_y = x + w/2, y + h/2
+        center_x_in_zone = (left <= center_x) & (center_x <= right)
         
         # For higher zone, be more sensitive to vehicles entering from top
         # Option 1: Center point in zone (standard)
-        center_in_zone = (self.zone_left <= center_x <= self.zone_right and 
-                        self.zone_top <= center_y <= self.zone_bottom)
-        
-        # Option 2: Any corner in zone
-        corners = [
-            (x, y),           # top-left
-            (x + w, y),       # top-right  
-            (x, y + h),       # bottom-left
-            (x + w, y + h)    # bottom-right
-        ]
+        center_in_zone = center_x_in_zone & (top <= center_y) & (center_y <= bottom)
         
-        any_corner_in_zone = any(
-            self.zone_left <= corner_x <= self.zone_right and 
-            self.zone_top <= corner_y <= self.zone_bottom
-            for corner_x, corner_y in corners
+        # Option 2: Any corner in zone (corners are every pairing of the x and y edges)
+        any_corner_in_zone = (
+            (((left <= x) & (x <= right)) | ((left <= x + w) & (x + w <= right))) &
+            (((top <= y) & (y <= bottom)) | ((top <= y + h) & (y + h <= bottom)))
         )
         
         # Option 3: Significant overlap with zone
-        bbox_in_zone = (
-            x < self.zone_right and x + w > self.zone_left and
-            y < self.zone_bottom and y + h > self.zone_top
-        )
+        bbox_in_zone = (x < right) & (x + w > left) & (y < bottom) & (y + h > top)
         
         # Option 4: For higher zone, also count if bottom of vehicle enters zone
         # This helps catch vehicles as they first appear
-        bottom_center_in_zone = (
-            self.zone_left <= center_x <= self.zone_right and
-            self.zone_top <= (y + h) <= self.zone_bottom
-        )
+        bottom_center_in_zone = center_x_in_zone & (top <= y + h) & (y + h <= bottom)
         
         # Use multiple conditions for better detection in higher position
-        return center_in_zone or any_corner_in_zone or bbox_in_zone or bottom_center_in_zone
+        return center_in_zone | any_corner_in_zone | bbox_in_zone | bottom_center_in_zone
 
-    def draw_detection_info(self, frame, detections, frame_number, fps, total_vehicles):
-        """Draw detection information with clear higher counting zone visualization"""
-        height, width = frame.shape[:2]
-        
-        # Draw the higher counting zone with enhanced visibility
-        # Main counting zone rectangle
-        cv2.rectangle(frame, 
-                    (self.zone_left, self.zone_top), 
-                    (self.zone_right, self.zone_bottom), 
-                    self.zone_color, self.zone_thickness)
-        
-        # Add semi-transparent fill with different color for higher zone
-        overlay = frame.copy()
-        cv2.rectangle(overlay,
-                    (self.zone_left, self.zone_top),
-                    (self.zone_right, self.zone_bottom),
-                    (255, 255, 0), -1)  # Cyan fill for higher zone
-        cv2.addWeighted(overlay, 0.08, frame, 0.92, 0, frame)
-        
-        # Draw zone boundary again
-        cv2.rectangle(frame, 
+    def _points_in_counting_zone(self, px, py):
+        if self.counting_geometry is not None:
+            return self.counting_geometry.contains(px, py)
+        return (self.zone_left <= px) & (px <= self.zone_right) & (self.zone_top <= py) & (py <= self.zone_bottom)
+
+    def _draw_zone_layer(self, canvas):
+        """Everything about the counting zone that stays the same for the whole video"""
+        height, width = canvas.shape[:2]
+        if self.counting_geometry is not None:
+            self.counting_geometry.draw(canvas, self.zone_color)
+            return
+
+        # Zone boundary (drawn over the semi-transparent fill)
+        cv2.rectangle(canvas, 
                     (self.zone_left, self.zone_top), 
                     (self.zone_right, self.zone_bottom), 
                     self.zone_color, self.zone_thickness)
         
         # Draw zone label with "HIGHER ZONE" indication
         zone_label = "HIGHER COUNTING ZONE"
-        label_bg_size = cv2.getTextSize(zone_label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
+        label_bg_size = text_size(zone_label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
         
         # Label background
-        cv2.rectangle(frame,
+        cv2.rectangle(canvas,
                     (self.zone_left, self.zone_top - label_bg_size[1] - 10),
                     (self.zone_left + label_bg_size[0] + 10, self.zone_top),
                     (0, 0, 0), -1)
         
         # Zone label text
-        cv2.putText(frame, zone_label, (self.zone_left + 5, self.zone_top - 5),
+        cv2.putText(canvas, zone_label, (self.zone_left + 5, self.zone_top - 5),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         
         # Draw zone position indicator
         position_text = f"Position: Top {int((self.zone_top/height)*100)}%-{int((self.zone_bottom/height)*100)}%"
-        cv2.putText(frame, position_text, (self.zone_left, self.zone_bottom + 25),
+        cv2.putText(canvas, position_text, (self.zone_left, self.zone_bottom + 25),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.zone_color, 1)
         
         # Draw entry direction indicator (since zone is higher)
         direction_text = "↑ Vehicles counted as they enter frame ↑"
-        text_size = cv2.getTextSize(direction_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
-        text_x = (width - text_size[0]) // 2
-        cv2.putText(frame, direction_text, (text_x, self.zone_top - 30),
+        text_width = text_size(direction_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0][0]
+        text_x = (width - text_width) // 2
+        cv2.putText(canvas, direction_text, (text_x, self.zone_top - 30),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+    def _draw_panel_layer(self, canvas):
+        """Statistics panel lines that do not change during the video"""
+        height = canvas.shape[0]
+        fps = self.overlay_fps
+        static_lines = {
+            2: (f"FPS: {fps:.1f}", (255, 255, 255)),
+            5: (f"Zone Position: Top {int((self.zone_top/height)*100)}%-{int((self.zone_bottom/height)*100)}%",
+                (255, 255, 0)),
+            6: (f"Zone Size: {self.zone_bottom - self.zone_top}h x {self.zone_right - self.zone_left}w",
+                (255, 255, 255)),
+            7: ("CURRENT IN ZONE:", (255, 255, 255))
+        }
+        for i, (text, color) in static_lines.items():
+            cv2.putText(canvas, text, (20, 40 + i * 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+    def _get_overlay_layers(self, frame, fps):
+        """Zone and panel layers for this video, rendered on first use"""
+        if self.overlay_layers is None or self.overlay_layers[0] != (frame.shape, fps):
+            self.overlay_fps = fps
+            size = (frame.shape[1], frame.shape[0])
+            self.overlay_layers = (
+                (frame.shape, fps),
+                OverlaySprite(size, lambda canvas, _: self._draw_zone_layer(canvas)),
+                OverlaySprite(size, lambda canvas, _: self._draw_panel_layer(canvas))
+            )
+        return self.overlay_layers[1], self.overlay_layers[2]
+
+    def draw_detection_info(self, frame, detections, frame_number, fps, total_vehicles, overlay_state=None):
+        """Draw detection information with clear higher counting zone visualization"""
+        height, width = frame.shape[:2]
+        # When annotating in a pipeline worker, use the state captured right after inference
+        track_history = overlay_state['track_points'] if overlay_state else self.track_history
+        total_counted = overlay_state['total_counted'] if overlay_state else None
+        
+        zone_layer, _ = self._get_overlay_layers(frame, fps)
+        if self.counting_geometry is None:
+            # Semi-transparent zone fill, blended over the zone only
+            blend_rect(frame, (self.zone_left, self.zone_top), (self.zone_right, self.zone_bottom),
+                       (255, 255, 0), 0.08)
+        zone_layer.paste(frame)
         
         # Draw detections with enhanced visualization for higher zone
-        for detection in detections:
-            x1, y1, w, h = detection['bbox']
-            class_name = detection['class_name']
-            confidence = detection['confidence']
-            track_id = detection.get('track_id', 0)
-            in_zone = detection.get('in_zone', False)
-            zone_entry = detection.get('zone_entry')
-            
+        for track_id, class_name, (x1, y1, w, h), confidence, in_zone, zone_entry in detections.rows():
             color = self.colors.get(class_name, self.colors['other'])
             
             # Thicker bounding box and different color for vehicles in counting zone
@@ -188,17 +367,8 @@ class RTXVehicleDetector:
             label = f"{class_name} {confidence:.2f} ID:{track_id}"
             if in_zone:
                 label += " ✓IN ZONE"
-            
-            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-            
-            # Label background
             label_bg_color = (0, 100, 0) if in_zone else color
-            cv2.rectangle(frame, (x1, y1 - label_size[1] - 10),
-                        (x1 + label_size[0], y1), label_bg_color, -1)
-            
-            # Label text
-            cv2.putText(frame, label, (x1, y1 - 5),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            draw_label(frame, label, (x1, y1), label_bg_color, size_thickness=2)
             
             # Draw center point
             center_x, center_y = x1 + w//2, y1 + h//2
@@ -211,8 +381,8 @@ class RTXVehicleDetector:
                 cv2.circle(frame, (int(zone_entry[0]), int(zone_entry[1])), 8, (0, 0, 0), 2)
             
             # Draw track history (emphasized for vehicles that entered zone)
-            if track_id in self.track_history and in_zone:
-                points = list(self.track_history[track_id])
+            if track_id in track_history and in_zone:
+                points = list(track_history[track_id])
                 for i in range(1, len(points)):
                     # Use gradient color - darker for older points
                     alpha = i / len(points)
@@ -224,18 +394,20 @@ class RTXVehicleDetector:
                     cv2.line(frame, points[i-1], points[i], line_color, 2)
         
         # Draw statistics overlay
-        self.draw_statistics_overlay(frame, frame_number, fps, total_vehicles, detections)
+        self.draw_statistics_overlay(frame, frame_number, fps, total_vehicles, detections, total_counted)
         
         return frame
 
-    def draw_statistics_overlay(self, frame, frame_number, fps, total_vehicles, detections):
+    def draw_statistics_overlay(self, frame, frame_number, fps, total_vehicles, detections, total_counted=None):
         """Draw enhanced statistics overlay for higher counting zone"""
         height, width = frame.shape[:2]
+        if total_counted is None:
+            total_counted = sum(self.vehicle_counts.values())
         
-        # Create semi-transparent overlay
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (380, 240), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+        # Semi-transparent panel, blended over the panel area only
+        blend_rect(frame, (10, 10), (380, 240), (0, 0, 0), 0.7)
+        _, panel_layer = self._get_overlay_layers(frame, fps)
+        panel_layer.paste(frame)
         
         # Current time in video
         current_time = frame_number / fps if fps > 0 else 0
@@ -243,26 +415,25 @@ class RTXVehicleDetector:
         seconds = int(current_time % 60)
         
         # Count vehicles currently in zone
-        vehicles_in_zone = sum(1 for d in detections if d.get('in_zone', False))
+        vehicles_in_zone = int(detections.in_zone.sum())
         
-        # Enhanced statistics with higher zone info
+        # Enhanced statistics with higher zone info (None: drawn by the static panel layer)
         stats = [
             f"Time: {minutes:02d}:{seconds:02d}",
             f"Frame: {frame_number}",
-            f"FPS: {fps:.1f}",
-            f"TOTAL COUNTED: {sum(self.vehicle_counts.values())}",
+            None,
+            f"TOTAL COUNTED: {total_counted}",
             f"IN HIGHER ZONE NOW: {vehicles_in_zone}",
-            f"Zone Position: Top {int((self.zone_top/height)*100)}%-{int((self.zone_bottom/height)*100)}%",
-            f"Zone Size: {self.zone_bottom - self.zone_top}h x {self.zone_right - self.zone_left}w",
-            "CURRENT IN ZONE:"
+            None,
+            None,
+            None
         ]
         
         # Add vehicle counts currently in zone
         current_counts = {}
-        for detection in detections:
-            if detection.get('in_zone', False):
-                class_name = detection['class_name']
-                current_counts[class_name] = current_counts.get(class_name, 0) + 1
+        for class_id in detections.class_ids[detections.in_zone].tolist():
+            class_name = detections.class_name(class_id)
+            current_counts[class_name] = current_counts.get(class_name, 0) + 1
         
         for class_name in sorted(current_counts.keys()):
             stats.append(f"  {class_name}: {current_counts[class_name]}")
@@ -270,144 +441,479 @@ class RTXVehicleDetector:
         # Draw statistics with color coding
         y_offset = 40
         for i, text in enumerate(stats):
+            if text is None:
+                continue
             color = (255, 255, 255)  # White default
             
             if i == 3:  # Total counted line
                 color = (0, 255, 255)  # Yellow
             elif i == 4:  # In zone now line
                 color = (0, 255, 0)    # Green
-            elif i == 5:  # Zone position
-                color = (255, 255, 0)  # Cyan
             elif i >= 7:  # Vehicle counts
                 class_name = text.split(':')[0].strip()
                 color = self.colors.get(class_name, (255, 255, 255))
             
-            cv2.putText(frame, text, (20, y_offset + i * 20),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            if i == 1:
+                # The frame number changes every frame, so caching it would only churn the cache
+                cv2.putText(frame, text, (20, y_offset + i * 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            else:
+                self.text_sprites.text(frame, text, (20, y_offset + i * 20), 0.5, color, 1)
             
     def detect_and_track(self, frame, frame_number):
         """Perform detection and tracking with enhanced logic for higher counting zone"""
-        if frame_number % Config.PROCESS_EVERY_N_FRAMES != 0 and frame_number > 0:
-            return self.get_previous_counts(), []
-
-        with torch.no_grad():
-            results = self.model.track(
-                frame, persist=True, conf=self.conf_threshold,
-                classes=list(self.vehicle_classes.keys()), verbose=False,
-                device=Config.DEVICE, tracker="bytetrack.yaml"
+        if not self._should_infer(frame, frame_number):
+            return self.get_previous_counts(), DetectionBatch.empty(self.vehicle_classes)
+
+        batch = self._get_tracker().track_batch([frame])[0]
+        return self._process_tracking_result(batch, frame_number)
+
+    def detect_and_track_batch(self, frames, first_frame_number):
+        """Batched variant of detect_and_track for consecutive frames.
+
+        Frames that need inference go through the model as one batch, then each
+        frame's tracked boxes run through the same counting logic in order.
+        """
+        frame_numbers = [first_frame_number + i for i in range(len(frames))]
+        # In adaptive mode "vehicles visible" comes from the previous batch
+        infer_indices = [
+            i for i, frame_number in enumerate(frame_numbers)
+            if self._should_infer(frames[i], frame_number)
+        ]
+        tracked = self._get_tracker().track_batch([frames[i] for i in infer_indices]) if infer_indices else []
+        tracked_by_index = dict(zip(infer_indices, tracked))
+
+        outputs = []
+        last_counts = self.get_previous_counts()
+        for i in range(len(frames)):
+            if i in tracked_by_index:
+                current_counts, detections = self._process_tracking_result(tracked_by_index[i], frame_numbers[i])
+                last_counts = current_counts
+                outputs.append((current_counts, detections))
+            else:
+                outputs.append((defaultdict(int, last_counts), DetectionBatch.empty(self.vehicle_classes)))
+
+        return outputs
+
+    def _should_infer(self, frame, frame_number):
+        """Fixed PROCESS_EVERY_N_FRAMES skip, or the motion scheduler when adaptive"""
+        if self.frame_scheduler is not None:
+            infer = self.frame_scheduler.should_infer(frame, frame_number, self.vehicles_visible)
+        else:
+            infer = frame_number % Config.PROCESS_EVERY_N_FRAMES == 0 or frame_number == 0
+
+        if infer:
+            self.frames_inferred += 1
+        else:
+            self.frames_skipped += 1
+        return infer
+
+    def get_frame_skip_stats(self):
+        """How many frames went through YOLO and how many reused the previous counts"""
+        if self.frame_scheduler is not None:
+            return self.frame_scheduler.get_stats()
+        total = self.frames_inferred + self.frames_skipped
+        return {
+            'mode': 'fixed',
+            'process_every_n_frames': Config.PROCESS_EVERY_N_FRAMES,
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_skipped,
+            'skip_ratio': round(self.frames_skipped / total, 3) if total else 0
+        }
+
+    def _get_tracker(self):
+        """ByteTrack state for this detector, kept off the shared model"""
+        if self.batched_tracker is None:
+            self.batched_tracker = BatchedTracker(
+                self.model, self.conf_threshold, list(self.vehicle_classes.keys()),
+                self.device, tracker="bytetrack.yaml", imgsz=Config.IMAGE_SIZE, lock=self.shared_model.lock,
+                class_names=self.vehicle_classes
             )
+        return self.batched_tracker
 
+    def _process_tracking_result(self, batch, frame_number=None):
+        """Apply zone counting to one frame's tracked boxes (a DetectionBatch)"""
+        if frame_number is None:
+            frame_number = self.last_frame_number + 1
+        self.last_frame_number = frame_number
+        warming_up = frame_number < self.count_from_frame
+        # Tracks counted more than RECOUNT_WINDOW_SECONDS of video ago may count again
+        self.crossed_objects.expire(frame_number)
+        expires_at = frame_number + self.recount_window_frames
         current_counts = defaultdict(int)
-        active_detections = []
-
-        if results[0].boxes is not None:
-            boxes = results[0].boxes.xyxy.cpu().numpy()
-            track_ids = results[0].boxes.id.int().cpu().numpy() if results[0].boxes.id is not None else np.arange(len(boxes))
-            class_ids = results[0].boxes.cls.int().cpu().numpy()
-            confidences = results[0].boxes.conf.float().cpu().numpy()
-
-            for i, (box, track_id, class_id, conf) in enumerate(zip(boxes, track_ids, class_ids, confidences)):
-                if class_id in self.vehicle_classes:
-                    x1, y1, x2, y2 = map(int, box)
-                    w, h = x2 - x1, y2 - y1
-                    class_name = self.vehicle_classes[class_id]
-
-                    # Update track history
-                    center_x, center_y = x1 + w//2, y1 + h//2
-                    self.track_history[track_id].append((center_x, center_y))
-
-                    # Enhanced counting logic for higher zone
-                    in_zone = self.is_in_counting_zone(x1, y1, w, h)
-                    
-                    if in_zone:
-                        current_counts[class_name] += 1
-                        
-                        # Only count if this track_id hasn't been counted recently
-                        # For higher zone, we might see vehicles for longer, so track carefully
-                        if track_id not in self.crossed_objects:
-                            self.vehicle_counts[class_name] += 1
-                            self.crossed_objects.add(track_id)
-                            print(f"✓ Counted {class_name} (ID: {track_id}) in HIGHER zone")
-                            
-                            # Optional: Add small delay before allowing re-count (for vehicles that linger)
-                            # This prevents double-counting in higher zones where vehicles stay visible longer
-                            threading.Timer(2.0, self._remove_from_crossed, [track_id]).start()
-
-                        active_detections.append({
-                            'track_id': int(track_id), 
-                            'class_name': class_name,
-                            'bbox': [x1, y1, w, h], 
-                            'confidence': float(conf),
-                            'center': (center_x, center_y),
-                            'in_zone': True,
-                            'zone_entry': self._get_zone_entry_point(track_id)
-                        })
-                    else:
-                        active_detections.append({
-                            'track_id': int(track_id), 
-                            'class_name': class_name,
-                            'bbox': [x1, y1, w, h], 
-                            'confidence': float(conf),
-                            'center': (center_x, center_y),
-                            'in_zone': False
-                        })
-
-        return current_counts, active_detections
-
-    def _remove_from_crossed(self, track_id):
-        """Remove track_id from crossed objects after delay to prevent double-counting"""
-        if track_id in self.crossed_objects:
-            self.crossed_objects.remove(track_id)
+
+        # Geometry for every vehicle box at once; the loop below only does bookkeeping
+        detections = batch.select(np.isin(batch.class_ids, list(self.vehicle_classes)))
+        bboxes = detections.bboxes
+        centers_x, centers_y = detections.centers()
+        approach_events = {}
+        if self.counting_geometry is not None:
+            # Configured approaches test the track center against their masks and half-planes
+            in_zone_flags, events = self.counting_geometry.update(detections.track_ids.tolist(), centers_x, centers_y)
+            center_in_zone_flags = in_zone_flags
+            for approach, i in events:
+                approach_events.setdefault(i, []).append(approach)
+        else:
+            in_zone_flags = self.is_in_counting_zone(bboxes[:, 0], bboxes[:, 1], bboxes[:, 2], bboxes[:, 3])
+            center_in_zone_flags = self._points_in_counting_zone(centers_x, centers_y)
+        detections.in_zone[:] = in_zone_flags
+        entries = detections.entries
+
+        for i, (track_id, class_id, center_x, center_y) in enumerate(zip(
+            detections.track_ids.tolist(), detections.class_ids.tolist(), centers_x.tolist(), centers_y.tolist()
+        )):
+            class_name = self.vehicle_classes[class_id]
+
+            # Update track history
+            self._append_track_point(track_id, (center_x, center_y), center_in_zone_flags[i])
+
+            # Enhanced counting logic for higher zone
+            if in_zone_flags[i]:
+                current_counts[class_name] += 1
+                
+                # Only count if this track_id hasn't been counted recently
+                # For higher zone, we might see vehicles for longer, so track carefully
+                if self.counting_geometry is not None:
+                    self._count_approaches(track_id, class_name, approach_events.get(i, ()), warming_up)
+                elif track_id not in self.crossed_objects and warming_up:
+                    # Already counted by the previous segment; just remember the track
+                    self.crossed_objects.add(track_id, expires_at)
+                    self.seam_suppressed += 1
+                elif track_id not in self.crossed_objects:
+                    # Suppressing re-counts for a short window prevents double-counting in
+                    # higher zones where vehicles stay visible longer
+                    self.vehicle_counts[class_name] += 1
+                    self.crossed_objects.add(track_id, expires_at)
+                    print(f"✓ Counted {class_name} (ID: {track_id}) in HIGHER zone")
+
+                zone_entry = self._get_zone_entry_point(track_id)
+                if zone_entry is not None:
+                    entries[i] = zone_entry
+
+        self.vehicles_visible = len(detections) > 0
+        return current_counts, detections
+
+    def _count_approaches(self, track_id, class_name, approaches, warming_up):
+        """Count a track once for every configured approach it just entered or crossed"""
+        for approach in approaches:
+            if warming_up:
+                # Already counted by the previous segment
+                self.seam_suppressed += 1
+                continue
+            self.vehicle_counts[class_name] += 1
+            self.approach_counts[approach][class_name] += 1
+            print(f"✓ Counted {class_name} (ID: {track_id}) on approach {approach}")
+
+    def _set_recount_window(self, fps):
+        """Express RECOUNT_WINDOW_SECONDS in frames of this video"""
+        self.recount_window_frames = max(1, int(round(Config.RECOUNT_WINDOW_SECONDS * (fps or 30))))
+
+    def _append_track_point(self, track_id, point, point_in_zone):
+        """Add a center to the track history, remembering the latest one inside the zone"""
+        self.track_history[track_id].append(point)
+        appended = self.track_point_counts[track_id] = self.track_point_counts.get(track_id, 0) + 1
+        if point_in_zone:
+            self.last_zone_points[track_id] = (point, appended)
 
     def _get_zone_entry_point(self, track_id):
-        """Get the point where vehicle entered the counting zone"""
-        if track_id in self.track_history:
-            points = list(self.track_history[track_id])
-            for point in reversed(points):  # Check from most recent backwards
-                if (self.zone_left <= point[0] <= self.zone_right and 
-                    self.zone_top <= point[1] <= self.zone_bottom):
-                    return point
+        """Get the point where vehicle entered the counting zone (latest in-zone point still in the history)"""
+        entry = self.last_zone_points.get(track_id)
+        if entry is None:
+            return None
+        point, appended_at = entry
+        # Only points still inside the bounded track history count, as before
+        if self.track_point_counts[track_id] - appended_at < TRACK_HISTORY_LENGTH:
+            return point
         return None
 
     def get_previous_counts(self):
         """Get counts from previous frame for tracking continuity"""
-        if not self.frame_analyses:
-            return defaultdict(int)
-        return defaultdict(int, self.frame_analyses[-1]['current_counts'])
+        return defaultdict(int, self.last_counts)
+
+    def _record_frame_analysis(self, frame_number, fps, current_counts, detections):
+        """Fold per-frame counts into the report statistics (and the optional spill file)"""
+        self.last_counts = dict(current_counts)
+        self.report_stats.add(frame_number, sum(current_counts.values()), detections)
+        if self.frame_spill is not None:
+            self.frame_spill.add(frame_number, frame_number / fps, current_counts, detections)
+
+    def _start_frame_spill(self, directory, prefix='part'):
+        if not self.spill_frame_records:
+            return None
+        if not POLARS_AVAILABLE:
+            print("⚠️  polars is not installed - per-frame records will not be written")
+            return None
+        self.frame_spill = FrameRecordSpill(directory, self.vehicle_classes.values(), prefix=prefix)
+        return directory
+
+    def _close_frame_spill(self):
+        if self.frame_spill is None:
+            return None
+        directory = self.frame_spill.close()
+        print(f"💾 Wrote {self.frame_spill.rows} per-frame records to {directory}")
+        self.frame_spill = None
+        return directory
+
+    def _checkpoint_key(self):
+        """Settings a checkpoint is only valid for"""
+        return ('RTXVehicleDetector', self.model_path, repr(self.counting_zones), self.frame_roi, self.decode_width,
+                self.tile_size, self.tile_overlap, self.inference_backend, self.int8, self.adaptive_skip,
+                self.max_skip, self.motion_threshold, self.spill_frame_records)
+
+    def _checkpoint_state(self):
+        """Counting, tracking and report state, pickled by ml.checkpoints"""
+        return {
+            'vehicle_counts': dict(self.vehicle_counts),
+            'approach_counts': {approach: dict(counts) for approach, counts in self.approach_counts.items()},
+            'crossed_objects': self.crossed_objects,
+            'track_history': dict(self.track_history),
+            'track_point_counts': self.track_point_counts,
+            'last_zone_points': self.last_zone_points,
+            'last_counts': self.last_counts,
+            'last_frame_number': self.last_frame_number,
+            'vehicles_visible': self.vehicles_visible,
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_skipped,
+            'frame_scheduler': self.frame_scheduler,
+            'report_stats': self.report_stats,
+            'frame_spill': self.frame_spill,
+            'geometry': self.counting_geometry.get_state() if self.counting_geometry is not None else None,
+            'tracker': self._get_tracker().tracker
+        }
+
+    def _restore_checkpoint_state(self, state):
+        self.vehicle_counts = defaultdict(int, state['vehicle_counts'])
+        self.approach_counts = defaultdict(lambda: defaultdict(int), {
+            approach: defaultdict(int, counts) for approach, counts in state['approach_counts'].items()
+        })
+        self.crossed_objects = state['crossed_objects']
+        self.track_history = defaultdict(lambda: deque(maxlen=TRACK_HISTORY_LENGTH), state['track_history'])
+        self.track_point_counts = state['track_point_counts']
+        self.last_zone_points = state['last_zone_points']
+        self.last_counts = state['last_counts']
+        self.last_frame_number = state['last_frame_number']
+        self.vehicles_visible = state['vehicles_visible']
+        self.frames_inferred = state['frames_inferred']
+        self.frames_skipped = state['frames_skipped']
+        self.frame_scheduler = state['frame_scheduler']
+        self.report_stats = state['report_stats']
+        self.frame_spill = state['frame_spill']
+        if self.counting_geometry is not None:
+            self.counting_geometry.set_state(state['geometry'])
+        self._get_tracker().tracker = state['tracker']
+
+    def _save_checkpoint(self, checkpoint, next_frame, recorder, elapsed):
+        if self.frame_spill is not None:
+            # Rows up to the checkpoint go to disk; the spill resumes with the next part file
+            self.frame_spill.flush()
+        checkpoint.save(next_frame, dict(self._checkpoint_state(), elapsed=elapsed), recorder)
 
-    def analyze_video(self, video_path, progress_tracker=None, save_output=True):
+    def _capture_overlay_state(self, detections):
+        """Snapshot the tracker state the overlay needs, before the next frame changes it"""
+        track_points = {
+            track_id: list(self.track_history[track_id])
+            for track_id in detections.track_ids[detections.in_zone].tolist()
+            if track_id in self.track_history
+        }
+        return {
+            'total_counted': sum(self.vehicle_counts.values()),
+            'track_points': track_points
+        }
+
+    def start_stream(self, source):
+        """Set up zone, decode view and recount window for a stream (see ml.stream_analysis)"""
+        self._configure_frame_source(source)
+        self._set_recount_window(source.fps)
+
+    def process_stream_frame(self, frame, frame_number):
+        """Count one stream frame; returns vehicles in the zone and the frame's detections"""
+        current_counts, detections = self.detect_and_track(frame, frame_number)
+        self.last_counts = dict(current_counts)
+        return sum(current_counts.values()), detections
+
+    def counted_totals(self):
+        return dict(self.vehicle_counts)
+
+    def forget_tracks(self, track_ids):
+        """Drop the history of tracks that left the stream for good"""
+        for track_id in track_ids:
+            self.track_history.pop(track_id, None)
+            self.track_point_counts.pop(track_id, None)
+            self.last_zone_points.pop(track_id, None)
+        if self.counting_geometry is not None:
+            self.counting_geometry.forget(track_ids)
+
+    def analyze_segment(self, video_path, segment):
+        """Count vehicles in one segment of a video (runs inside a shard process).
+
+        Frames from ``warmup_start`` to ``start`` only feed the tracker, so
+        vehicles already in the zone at the seam are tracked but not counted twice.
+        """
+        segment_start = time.time()
+        source = self._open_frame_source(video_path)
+        fps = source.fps
+        self._set_recount_window(fps)
+        source.seek(segment['warmup_start'])
+        self.count_from_frame = segment['start']
+        self.report_stats = StreamingReportAggregator()
+        # Merged with the other segments' so the whole video can be rendered from detections
+        recorder = DetectionRecorder(self, fps, source.width, source.height)
+        if segment.get('frame_records_dir'):
+            self._start_frame_spill(segment['frame_records_dir'], prefix=f"segment{segment['index']:04d}")
+
+        def infer(frames, first_frame_number):
+            if self.batch_size > 1:
+                outputs = self.detect_and_track_batch(frames, first_frame_number)
+            else:
+                outputs = [self.detect_and_track(frames[0], first_frame_number)]
+            for offset, (current_counts, detections) in enumerate(outputs):
+                frame_number = first_frame_number + offset
+                if frame_number >= segment['start']:
+                    self._record_frame_analysis(frame_number, fps, current_counts, detections)
+                    recorder.add_frame(
+                        frame_number, frame_number, sum(current_counts.values()),
+                        sum(self.vehicle_counts.values()), detections
+                    )
+            return outputs
+
+        frames = _FrameRange(source, segment['end'] - segment['warmup_start'])
+        pipeline = VideoPipeline(infer, batch_size=self.batch_size, threaded=False)
+        source.allocate(pipeline.frames_in_flight())
+        pipeline.run(frames, segment['warmup_start'])
+        source.release()
+        self._close_frame_spill()
+
+        return {
+            'segment': segment,
+            'vehicle_counts': dict(self.vehicle_counts),
+            'approach_counts': {approach: dict(counts) for approach, counts in self.approach_counts.items()},
+            'report_stats': self.report_stats,
+            'detections': recorder,
+            'seam_suppressed': self.seam_suppressed,
+            'frame_skipping': self.get_frame_skip_stats(),
+            'processing_time': time.time() - segment_start
+        }
+
+    def _analyze_video_sharded(self, video_path, progress_tracker, fps, total_frames, duration, workers,
+                               output_path=None):
+        """Split a long video into segments, analyse them in parallel, and merge one report.
+
+        Segments are not encoded; with ``output_path`` the annotated video is
+        rendered afterwards from the merged detections.
+        """
+        segments = plan_segments(total_frames, fps, self.shard_segment_seconds, Config.SHARD_OVERLAP_SECONDS)
+        detector_kwargs = {
+            'model_path': self.model_path, 'batch_size': self.batch_size, 'pipelined': False,
+            'adaptive_skip': self.adaptive_skip, 'max_skip': self.max_skip, 'motion_threshold': self.motion_threshold,
+            'spill_frame_records': self.spill_frame_records, 'counting_zones': self.counting_zones,
+            'hw_decode': self.hw_decode, 'frame_roi': self.frame_roi, 'decode_width': self.decode_width,
+            'tile_size': self.tile_size, 'tile_overlap': self.tile_overlap,
+            'inference_backend': self.inference_backend, 'int8': self.int8,
+            'inference_threads': self.inference_threads
+        }
+        frame_records_dir = frame_records_output_dir(video_path) if self.spill_frame_records else None
+        for segment in segments:
+            segment['frame_records_dir'] = frame_records_dir
+
+        analysis_start = time.time()
+        vehicle_counts, approach_counts, report_stats, recorder, shard_stats = run_sharded_analysis(
+            video_path, segments, detector_kwargs, workers, progress_tracker
+        )
+        total_processing_time = time.time() - analysis_start
+
+        self.vehicle_counts = vehicle_counts
+        self.approach_counts = approach_counts
+        self.report_stats = report_stats
+
+        if progress_tracker:
+            progress_tracker.set_progress(100, "Analysis completed! Generating report...")
+        print(f"Sharded analysis completed in {total_processing_time:.2f} seconds")
+
+        report = self.generate_comprehensive_report(duration, total_processing_time)
+        report['performance']['sharding'] = shard_stats
+        report['performance']['frame_skipping'] = shard_stats['frame_skipping']
+        if frame_records_dir and POLARS_AVAILABLE:
+            report['frame_records_path'] = frame_records_dir
+        report['detections_path'] = recorder.save(detections_output_path(video_path))
+        if output_path:
+            print("ℹ️  Sharded analysis: the processed video will be rendered from stored detections")
+            output_path = self.render_from_detections(video_path, DetectionReplay(report['detections_path']), output_path)
+        if output_path:
+            report['output_video_path'] = output_path
+        report['metadata']['analysis_only'] = not output_path
+        return report
+
+    def _processed_output_path(self, video_path):
+        """Path of a new annotated video for ``video_path`` under media/processed_videos"""
+        os.makedirs('media/processed_videos', exist_ok=True)
+        name_without_ext = os.path.splitext(os.path.basename(video_path))[0]
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join('media/processed_videos', f"processed_{name_without_ext}_{timestamp}.mp4")
+
+    def analyze_video(self, video_path, progress_tracker=None, save_output=True, batch_size=None, pipelined=None,
+                      shard_workers=None):
         """Main function to analyze entire video with optional video output"""
         print(f"Starting video analysis: {video_path}")
+        if self.analysis_only and save_output:
+            print("ℹ️  Analysis-only profile: skipping annotation and video encoding")
+            save_output = False
+        batch_size = max(1, int(batch_size or self.batch_size))
+        if batch_size > 1:
+            print(f"Batched inference enabled: {batch_size} frames per forward pass")
+        pipelined = self.pipelined if pipelined is None else pipelined
         
         if progress_tracker:
             progress_tracker.set_progress(0, "Initializing video analysis...")
         
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise Exception(f"Cannot open video file: {video_path}")
-
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Capture properties size the counting zone; no frame has to be read and seeked back
+        source = self._open_frame_source(video_path)
+        fps = source.fps
+        total_frames = source.total_frames
         duration = total_frames / fps if fps > 0 else 0
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        width, height = source.width, source.height
 
         print(f"Video info: {width}x{height}, {fps} FPS, {total_frames} frames")
 
+        shard_workers = max(1, int(shard_workers or self.shard_workers))
+        if shard_workers > 1 and duration > self.shard_segment_seconds:
+            source.release()
+            return self._analyze_video_sharded(
+                video_path, progress_tracker, fps, total_frames, duration, shard_workers,
+                output_path=self._processed_output_path(video_path) if save_output else None
+            )
+
+        self._set_recount_window(fps)
+        self.report_stats = StreamingReportAggregator()
+        # Compact detections so the annotated video can be rendered later, on demand
+        recorder = DetectionRecorder(self, fps, width, height)
+
+        # A previous run of this video that failed resumes from its last checkpoint
+        checkpoint, start_frame, resumed_elapsed = None, 0, 0.0
+        if self.checkpoint_interval:
+            checkpoint = AnalysisCheckpoint(checkpoint_dir(video_path, self._checkpoint_key()), self.checkpoint_interval)
+            restored = checkpoint.load(recorder)
+            if restored is not None:
+                start_frame, state = restored
+                resumed_elapsed = state['elapsed']
+                self._restore_checkpoint_state(state)
+                source.seek(start_frame)
+                print(f"♻️  Resuming analysis from checkpoint at frame {start_frame}/{total_frames}")
+                if progress_tracker:
+                    progress_tracker.set_progress(
+                        min(95, int(start_frame / total_frames * 100)), f"Resuming from frame {start_frame}"
+                    )
+
         # Setup video writer for output - FIXED PATH HANDLING
         output_path = None
         out = None
         if save_output:
-            # Create output directory if it doesn't exist
-            os.makedirs('media/processed_videos', exist_ok=True)
-            original_filename = os.path.basename(video_path)
-            name_without_ext = os.path.splitext(original_filename)[0]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"processed_{name_without_ext}_{timestamp}.mp4"
-            output_path = os.path.join('media/processed_videos', output_filename)
-            
+            output_path = self._processed_output_path(video_path)
             print(f"Output video will be saved to: {output_path}")
             
+        if output_path and start_frame:
+            # Frames before the checkpoint were never encoded; the whole video is drawn from detections at the end
+            print("ℹ️  Resumed analysis: the processed video will be rendered from stored detections")
+        elif output_path:
             # Use same codec and FPS as input
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
             out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
@@ -418,58 +924,61 @@ class RTXVehicleDetector:
             else:
                 print("✓ Video writer initialized successfully")
 
-        if progress_tracker:
+        if progress_tracker and not start_frame:
             progress_tracker.set_progress(5, f"Video info: {total_frames} frames, {fps:.2f} FPS")
 
-        # Setup counting zone
-        ret, frame = cap.read()
-        if not ret:
-            raise Exception("Cannot read video frame")
-        self.setup_counting_zone(frame)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        analysis_start = time.time() - resumed_elapsed
+        capture_overlay = out is not None
+        if self.frame_spill is not None:
+            # Restored from the checkpoint
+            frame_records_path = self.frame_spill.directory
+        else:
+            frame_records_path = self._start_frame_spill(frame_records_output_dir(video_path))
 
-        frame_number = 0
-        analysis_start = time.time()
-        frames_written = 0
+        def infer(frames, first_frame_number):
+            if batch_size > 1:
+                outputs = self.detect_and_track_batch(frames, first_frame_number)
+            else:
+                outputs = [self.detect_and_track(frames[0], first_frame_number)]
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+            results = []
+            for offset, (current_counts, detections) in enumerate(outputs):
+                frame_number = first_frame_number + offset
+                self._record_frame_analysis(frame_number, fps, current_counts, detections)
+                recorder.add_frame(
+                    frame_number, frame_number, sum(current_counts.values()),
+                    sum(self.vehicle_counts.values()), detections
+                )
+                if progress_tracker and frame_number % 50 == 0:
+                    progress = min(95, int((frame_number / total_frames) * 100))
+                    message = f"Processing frame {frame_number}/{total_frames} ({progress}%)"
+                    progress_tracker.set_progress(progress, message)
 
-            current_counts, detections = self.detect_and_track(frame, frame_number)
-            total_current_vehicles = sum(current_counts.values())
-            
-            # Draw detection information on frame
-            annotated_frame = self.draw_detection_info(
-                frame.copy(), detections, frame_number, fps, total_current_vehicles
-            )
-            
-            # Write to output video
-            if out is not None:
-                out.write(annotated_frame)
-                frames_written += 1
-            
-            timestamp = frame_number / fps
-            frame_analysis = {
-                'frame_number': frame_number, 
-                'timestamp': timestamp,
-                'current_counts': dict(current_counts), 
-                'detections': detections,
-                'total_vehicles': total_current_vehicles
-            }
-            self.frame_analyses.append(frame_analysis)
+                overlay_state = self._capture_overlay_state(detections) if capture_overlay else None
+                results.append((current_counts, detections, overlay_state))
 
-            # Update progress
-            if progress_tracker and frame_number % 50 == 0:
-                progress = min(95, int((frame_number / total_frames) * 100))
-                message = f"Processing frame {frame_number}/{total_frames} ({progress}%)"
-                progress_tracker.set_progress(progress, message)
+            if checkpoint is not None and checkpoint.due():
+                self._save_checkpoint(checkpoint, first_frame_number + len(frames), recorder, time.time() - analysis_start)
+            return results
 
-            frame_number += 1
+        def annotate(frame, frame_number, result):
+            current_counts, detections, overlay_state = result
+            # Draw in place on the full-resolution frame this view was decoded from
+            return self.draw_detection_info(
+                source.full_frame(frame), detections, frame_number, fps, sum(current_counts.values()), overlay_state
+            )
+
+        pipeline = VideoPipeline(
+            infer, annotate=annotate if out is not None else None, writer=out,
+            batch_size=batch_size, queue_size=Config.PIPELINE_QUEUE_SIZE, threaded=pipelined
+        )
+        source.allocate(pipeline.frames_in_flight())
+        pipeline_stats = pipeline.run(source, start_frame)
+        frames_written = pipeline_stats['frames_written']
 
         total_processing_time = time.time() - analysis_start
-        cap.release()
+        decode_stats = source.describe()
+        source.release()
         
         if out is not None:
             out.release()
@@ -482,33 +991,105 @@ class RTXVehicleDetector:
         print(f"Analysis completed in {total_processing_time:.2f} seconds")
         
         report = self.generate_comprehensive_report(duration, total_processing_time)
+        report['metadata']['analysis_only'] = out is None
+        report['performance']['pipeline'] = pipeline_stats
+        report['performance']['decode'] = decode_stats
+        if self.tile_layout is not None:
+            report['performance']['tiling'] = self.tile_layout.describe()
+        report['performance']['frame_skipping'] = self.get_frame_skip_stats()
+        skip_stats = report['performance']['frame_skipping']
+        print(f"⏩ Skipped {skip_stats['frames_skipped']} of {skip_stats['frames_inferred'] + skip_stats['frames_skipped']} frames ({skip_stats['mode']})")
+        if batch_size > 1 and self.batched_tracker is not None:
+            report['performance']['batch_inference'] = dict(
+                batch_size=batch_size, **self.batched_tracker.get_latency_stats()
+            )
+        report['detections_path'] = recorder.save(detections_output_path(video_path))
+        if output_path and out is None:
+            output_path = self.render_from_detections(video_path, DetectionReplay(report['detections_path']), output_path)
         if output_path:
             report['output_video_path'] = output_path
+        if frame_records_path:
+            report['frame_records_path'] = self._close_frame_spill()
+        if checkpoint is not None:
+            report['performance']['checkpoints'] = checkpoint.describe()
+            checkpoint.clear()
             
         return report
 
+    def render_from_detections(self, video_path, replay, output_path, progress_tracker=None):
+        """Draw the same overlays as analyze_video from a DetectionReplay and encode them"""
+        # Overlays are drawn on full frames, so no decode view here
+        source = FrameSource(video_path, self.hw_decode)
+        if not source.isOpened():
+            raise Exception(f"Cannot open video file: {video_path}")
+        fps, width, height = source.fps, source.width, source.height
+        total_frames = source.total_frames
+        self.setup_counting_zone(source.frame_shape)
+        self.track_history = defaultdict(lambda: deque(maxlen=TRACK_HISTORY_LENGTH))
+        self.track_point_counts = {}
+        self.last_zone_points = {}
+
+        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        if not out.isOpened():
+            raise Exception(f"Cannot open video writer: {output_path}")
+
+        def infer(frames, first_frame_number):
+            results = []
+            for offset in range(len(frames)):
+                if progress_tracker and total_frames > 0 and (first_frame_number + offset) % 100 == 0:
+                    progress = min(99, int((first_frame_number + offset) / total_frames * 100))
+                    progress_tracker.set_progress(progress, f"Rendering frame {first_frame_number + offset}/{total_frames}")
+                record = replay.frame(first_frame_number + offset)
+                if record is None:
+                    results.append((0, DetectionBatch.empty(), {'total_counted': 0, 'track_points': {}}))
+                    continue
+                _, current_total, total_counted, _, detections = record
+                # Rebuild the track trails exactly as _process_tracking_result did
+                centers_x, centers_y = detections.centers()
+                center_in_zone_flags = self._points_in_counting_zone(centers_x, centers_y)
+                for i, (track_id, center_x, center_y) in enumerate(zip(
+                    detections.track_ids.tolist(), centers_x.tolist(), centers_y.tolist()
+                )):
+                    self._append_track_point(track_id, (center_x, center_y), center_in_zone_flags[i])
+                    if detections.in_zone[i]:
+                        zone_entry = self._get_zone_entry_point(track_id)
+                        if zone_entry is not None:
+                            detections.entries[i] = zone_entry
+                overlay_state = self._capture_overlay_state(detections)
+                overlay_state['total_counted'] = total_counted
+                results.append((current_total, detections, overlay_state))
+            return results
+
+        def annotate(frame, frame_number, result):
+            current_total, detections, overlay_state = result
+            return self.draw_detection_info(frame, detections, frame_number, fps, current_total, overlay_state)
+
+        pipeline = VideoPipeline(infer, annotate=annotate, writer=out, queue_size=Config.PIPELINE_QUEUE_SIZE)
+        source.allocate(pipeline.frames_in_flight())
+        stats = pipeline.run(source)
+        source.release()
+        out.release()
+        print(f"🎞️ Rendered {stats['frames_written']} frames from stored detections: {output_path}")
+        return output_path
+
     def generate_comprehensive_report(self, video_duration, processing_time):
         """Generate detailed analysis report"""
         total_vehicles = sum(self.vehicle_counts.values())
         avg_vehicles_per_minute = (total_vehicles / video_duration) * 60 if video_duration > 0 else 0
         
-        frame_totals = [frame['total_vehicles'] for frame in self.frame_analyses]
-        peak_traffic = max(frame_totals) if frame_totals else 0
-        avg_traffic = np.mean(frame_totals) if frame_totals else 0
+        stats = self.report_stats
+        frames_processed = stats.frames
+        peak_traffic = stats.peak
+        avg_traffic = stats.mean_vehicles
 
         # Calculate accuracy metrics
-        detection_confidence = []
-        for frame in self.frame_analyses:
-            for detection in frame['detections']:
-                detection_confidence.append(detection['confidence'])
-        
-        avg_confidence = np.mean(detection_confidence) if detection_confidence else 0
+        avg_confidence = stats.mean_confidence
 
         report = {
             'metadata': {
                 'video_duration': video_duration, 
                 'processing_time': processing_time,
-                'total_frames_processed': len(self.frame_analyses),
+                'total_frames_processed': frames_processed,
                 'analysis_date': datetime.now().isoformat(),
                 'model_confidence_threshold': self.conf_threshold,
                 'average_detection_confidence': round(avg_confidence, 3)
@@ -523,11 +1104,14 @@ class RTXVehicleDetector:
                 'vehicles_per_minute': round(avg_vehicles_per_minute, 2),
                 'congestion_level': self.assess_congestion_level(avg_traffic),
                 'traffic_pattern': self.identify_traffic_pattern(),
-                'processing_efficiency': round(len(self.frame_analyses) / processing_time, 2) if processing_time > 0 else 0
+                'processing_efficiency': round(frames_processed / processing_time, 2) if processing_time > 0 else 0
             },
             'performance': {
-                'hardware_used': 'GPU' if Config.DEVICE == 'cuda' else 'CPU',
-                'frames_per_second': len(self.frame_analyses) / processing_time if processing_time > 0 else 0,
+                'hardware_used': 'GPU' if self.device == 'cuda' else 'CPU',
+                'inference_backend': {
+                    'backend': self.inference_backend, 'int8': self.int8, 'threads': self.inference_threads
+                },
+                'frames_per_second': frames_processed / processing_time if processing_time > 0 else 0,
                 'real_time_factor': processing_time / video_duration if video_duration > 0 else 0
             },
             'visualization': {
@@ -540,6 +1124,12 @@ class RTXVehicleDetector:
                 'colors_used': self.colors
             }
         }
+        if self.counting_geometry is not None:
+            report['summary']['approach_counts'] = {
+                approach: dict(self.approach_counts.get(approach, {}))
+                for approach in self.counting_geometry.approaches
+            }
+            report['visualization']['counting_geometry'] = self.counting_geometry.describe()
         
         return report
 
@@ -549,9 +1139,30 @@ class RTXVehicleDetector:
         else: return 'Light Traffic'
 
     def identify_traffic_pattern(self):
-        if len(self.frame_analyses) < 10: return 'Insufficient Data'
-        first_half = np.mean([f['total_vehicles'] for f in self.frame_analyses[:len(self.frame_analyses)//2]])
-        second_half = np.mean([f['total_vehicles'] for f in self.frame_analyses[len(self.frame_analyses)//2:]])
+        if self.report_stats.frames < 10: return 'Insufficient Data'
+        first_half = self.report_stats.first_half_mean
+        second_half = self.report_stats.second_half_mean
         if second_half > first_half * 1.2: return 'Increasing'
         elif second_half < first_half * 0.8: return 'Decreasing'
-        else: return 'Stable'
\ No newline at end of file
+        else: return 'Stable'
+
+
+def frame_records_output_dir(video_path):
+    """Directory that receives the Parquet per-frame records for ``video_path``"""
+    name_without_ext = os.path.splitext(os.path.basename(video_path))[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join('media/frame_records', f"{name_without_ext}_{timestamp}")
+
+
+class _FrameRange:
+    """Wraps a frame source so reading stops after ``count`` frames"""
+
+    def __init__(self, source, count):
+        self.source = source
+        self.remaining = count
+
+    def read(self):
+        if self.remaining <= 0:
+            return False, None
+        self.remaining -= 1
+        return self.source.read()
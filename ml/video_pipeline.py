@@ -0,0 +1,231 @@
+# ml/video_pipeline.py
+import queue
+import threading
+import time
+from collections import defaultdict
+
+# Marks the end of the stream as it travels through the queues
+_END_OF_STREAM = object()
+
+
+class VideoPipeline:
+    """Decode → infer → annotate → encode, each stage in its own worker thread.
+
+    Stages are linked by bounded queues, so a slow stage applies backpressure
+    upstream instead of letting decoded frames pile up in memory. Inference runs
+    in a single worker and sees frames strictly in order, so tracker state and
+    counts are identical to the sequential loop.
+
+    Callbacks:
+        infer(frames, first_frame_number) -> list of per-frame results
+        annotate(frame, frame_number, result) -> annotated frame
+        writer: anything with a ``write(frame)`` method (cv2.VideoWriter)
+
+    ``annotate`` and ``writer`` are optional; without them the pipeline ends
+    after inference. With ``threaded=False`` the same stages run inline.
+    """
+
+    def __init__(self, infer, annotate=None, writer=None, batch_size=1, queue_size=8, threaded=True):
+        self.infer = infer
+        self.annotate = annotate
+        self.writer = writer
+        self.batch_size = max(1, int(batch_size))
+        self.queue_size = max(1, int(queue_size))
+        self.threaded = threaded
+
+        self.frames_decoded = 0
+        self.frames_written = 0
+        self.stage_busy = defaultdict(float)
+
+        self._stop = threading.Event()
+        self._error = None
+
+    def run(self, cap, start_frame=0):
+        """Consume ``cap`` until it runs out of frames and return pipeline stats"""
+        start = time.time()
+        if self.threaded:
+            self._run_threaded(cap, start_frame)
+        else:
+            self._run_inline(cap, start_frame)
+
+        stats = self.get_stats()
+        stats['wall_time_seconds'] = round(time.time() - start, 3)
+        return stats
+
+    def frames_in_flight(self):
+        """Most decoded frames alive at once, counting the one being decoded (for buffer reuse)"""
+        if not self.threaded:
+            return self.batch_size + 1
+        # Decode worker, decoded queue, the inference batch
+        frames = 1 + self.queue_size + self.batch_size
+        if self.annotate is not None:
+            # Inferred queue and the frame being annotated
+            frames += self.queue_size + 1
+            if self.writer is not None:
+                # Annotated queue and the frame being encoded
+                frames += self.queue_size + 1
+        return frames
+
+    def get_stats(self):
+        return {
+            'threaded': self.threaded,
+            'frames_decoded': self.frames_decoded,
+            'frames_written': self.frames_written,
+            'stage_busy_seconds': {stage: round(busy, 3) for stage, busy in self.stage_busy.items()}
+        }
+
+    # ------------------------------------------------------------------ inline
+
+    def _run_inline(self, cap, frame_number):
+        while True:
+            frames = []
+            while len(frames) < self.batch_size:
+                frame = self._timed('decode', self._read, cap)
+                if frame is None:
+                    break
+                frames.append(frame)
+            if not frames:
+                break
+
+            results = self._timed('infer', self.infer, frames, frame_number)
+            for frame, result in zip(frames, results):
+                self._finish_frame(frame, frame_number, result)
+                frame_number += 1
+
+    def _finish_frame(self, frame, frame_number, result):
+        if self.annotate is None:
+            return
+        annotated = self._timed('annotate', self.annotate, frame, frame_number, result)
+        if self.writer is not None:
+            self._timed('encode', self.writer.write, annotated)
+            self.frames_written += 1
+
+    # ---------------------------------------------------------------- threaded
+
+    def _run_threaded(self, cap, start_frame):
+        decoded = queue.Queue(maxsize=self.queue_size)
+        inferred = queue.Queue(maxsize=self.queue_size) if self.annotate is not None else None
+        annotated = queue.Queue(maxsize=self.queue_size) if self.annotate is not None and self.writer is not None else None
+
+        workers = [
+            threading.Thread(target=self._guard, args=(self._decode_worker, cap, start_frame, decoded), name='pipeline-decode'),
+            threading.Thread(target=self._guard, args=(self._infer_worker, decoded, inferred), name='pipeline-infer'),
+        ]
+        if inferred is not None:
+            workers.append(threading.Thread(target=self._guard, args=(self._annotate_worker, inferred, annotated), name='pipeline-annotate'))
+        if annotated is not None:
+            workers.append(threading.Thread(target=self._guard, args=(self._encode_worker, annotated), name='pipeline-encode'))
+
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        if self._error is not None:
+            raise self._error
+
+    def _guard(self, target, *args):
+        """Run a stage; on failure remember the error and stop every other stage"""
+        try:
+            target(*args)
+        except Exception as e:
+            if self._error is None:
+                self._error = e
+            self._stop.set()
+
+    def _decode_worker(self, cap, frame_number, out_queue):
+        try:
+            while not self._stop.is_set():
+                frame = self._timed('decode', self._read, cap)
+                if frame is None:
+                    break
+                if not self._put(out_queue, (frame_number, frame)):
+                    return
+                frame_number += 1
+        finally:
+            self._put(out_queue, _END_OF_STREAM)
+
+    def _infer_worker(self, in_queue, out_queue):
+        finished = False
+        while not finished:
+            item = self._get(in_queue)
+            if item is None or item is _END_OF_STREAM:
+                break
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                item = self._get(in_queue)
+                if item is None or item is _END_OF_STREAM:
+                    finished = True
+                    break
+                batch.append(item)
+
+            first_frame_number = batch[0][0]
+            frames = [frame for _, frame in batch]
+            results = self._timed('infer', self.infer, frames, first_frame_number)
+
+            if out_queue is None:
+                continue
+            for (frame_number, frame), result in zip(batch, results):
+                if not self._put(out_queue, (frame_number, frame, result)):
+                    return
+
+        if out_queue is not None:
+            self._put(out_queue, _END_OF_STREAM)
+
+    def _annotate_worker(self, in_queue, out_queue):
+        while True:
+            item = self._get(in_queue)
+            if item is None or item is _END_OF_STREAM:
+                break
+            frame_number, frame, result = item
+            annotated = self._timed('annotate', self.annotate, frame, frame_number, result)
+            if out_queue is not None and not self._put(out_queue, annotated):
+                return
+
+        if out_queue is not None:
+            self._put(out_queue, _END_OF_STREAM)
+
+    def _encode_worker(self, in_queue):
+        while True:
+            item = self._get(in_queue)
+            if item is None or item is _END_OF_STREAM:
+                break
+            self._timed('encode', self.writer.write, item)
+            self.frames_written += 1
+
+    # ----------------------------------------------------------------- helpers
+
+    def _read(self, cap):
+        ret, frame = cap.read()
+        if not ret:
+            return None
+        self.frames_decoded += 1
+        return frame
+
+    def _timed(self, stage, func, *args):
+        stage_start = time.time()
+        try:
+            return func(*args)
+        finally:
+            self.stage_busy[stage] += time.time() - stage_start
+
+    def _put(self, q, item):
+        """Blocking put that gives up once the pipeline has been stopped"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        """Blocking get that returns None once the pipeline has been stopped"""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
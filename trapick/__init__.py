@@ -0,0 +1,6 @@
+# Celery is only needed when TRAPICK_JOB_QUEUE uses the 'celery' backend
+try:
+    from .celery import app as celery_app
+    __all__ = ('celery_app',)
+except ImportError:
+    celery_app = None
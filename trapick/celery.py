@@ -0,0 +1,9 @@
+# trapick/celery.py
+import os
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trapick.settings')
+
+app = Celery('trapick')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -168,4 +168,53 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ],
-}
\ No newline at end of file
+}
+# Video processing queue: 'local' runs WORKERS threads inside Django,
+# 'celery' hands jobs to Celery workers via CELERY_BROKER_URL
+TRAPICK_JOB_QUEUE = {
+    'BACKEND': 'local',
+    'WORKERS': 1,  # per web process with the local backend (each gunicorn/daphne process runs its own pool)
+    'ORDERING': 'fifo',  # or 'priority'
+    'HEARTBEAT_SECONDS': 30,
+    'STALE_AFTER_SECONDS': 120,  # running jobs without a heartbeat this long are requeued
+}
+
+CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Annotated videos are rendered from stored detections by a queue worker the
+# first time they are viewed (the view answers 202 meanwhile), and kept in an
+# LRU cache capped at CACHE_MAX_MB
+TRAPICK_RENDER = {
+    'ON_DEMAND': True,
+    'CACHE_DIR': 'rendered_videos',
+    'CACHE_MAX_MB': 2048,
+}
+
+# Resumable uploads (api/upload/sessions/) send the video in checksummed
+# chunks that are written straight into the final file
+TRAPICK_UPLOAD = {
+    'CHUNK_SIZE_MB': 8,
+    'MAX_CHUNK_SIZE_MB': 64,
+    'SESSION_TTL_HOURS': 48,
+}
+
+# Processed videos are served with byte ranges and ETags. Behind nginx set
+# SENDFILE to 'x-accel-redirect' (with an internal location aliased to
+# MEDIA_ROOT at ACCEL_REDIRECT_PREFIX), behind Apache to 'x-sendfile'
+TRAPICK_VIDEO_SERVING = {
+    'SENDFILE': None,
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',
+    'CACHE_MAX_AGE': 0,
+}
+
+# Adaptive-bitrate H.264 renditions (api/video/<id>/stream/), built with
+# ffmpeg by a queue worker after analysis or on first request. Needs ffmpeg
+# on PATH or the imageio-ffmpeg package
+TRAPICK_RENDITIONS = {
+    'FORMATS': ['hls'],  # add 'dash' for an MPEG-DASH manifest as well
+    'HEIGHTS': [360, 720, 1080],
+    'SEGMENT_SECONDS': 4,
+    'AFTER_ANALYSIS': True,
+}
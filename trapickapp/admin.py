@@ -39,4 +39,22 @@ admin.site.register(FrameAnalysis)
 admin.site.register(HourlyTrafficSummary)
 admin.site.register(DailyTrafficSummary)
 admin.site.register(TrafficPrediction)
-admin.site.register(SystemConfig)
\ No newline at end of file
+admin.site.register(SystemConfig)
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ['video_file', 'kind', 'status', 'priority', 'attempts', 'worker', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['created_at', 'started_at', 'heartbeat_at', 'finished_at']
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'status', 'size', 'location', 'created_at', 'completed_at']
+    list_filter = ['status']
+    readonly_fields = ['created_at', 'updated_at', 'completed_at']
+
+@admin.register(VideoArtifact)
+class VideoArtifactAdmin(admin.ModelAdmin):
+    list_display = ['video_file', 'rendition', 'path', 'size', 'codec', 'updated_at']
+    list_filter = ['rendition', 'codec']
+    search_fields = ['path']
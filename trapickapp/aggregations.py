@@ -0,0 +1,119 @@
+# trapickapp/aggregations.py
+# Grouped queries behind the dashboard services: each returns only aggregated
+# rows, using ORM functions that behave the same on SQLite and PostgreSQL
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import ExtractHour, TruncDate, TruncHour
+from .models import Detection, TrafficAnalysis, VideoFile
+
+# Dashboard keys of the per-class counters on TrafficAnalysis
+VEHICLE_COUNT_FIELDS = {
+    'cars': 'car_count',
+    'trucks': 'truck_count',
+    'buses': 'bus_count',
+    'motorcycles': 'motorcycle_count',
+    'bicycles': 'bicycle_count',
+    'others': 'other_count',
+}
+
+# Dashboard keys of the VehicleType names used by Detection
+VEHICLE_TYPE_NAMES = {
+    'cars': 'car',
+    'trucks': 'truck',
+    'buses': 'bus',
+    'motorcycles': 'motorcycle',
+    'bicycles': 'bicycle',
+    'others': 'other',
+}
+
+
+def empty_vehicle_counts():
+    return {key: 0 for key in VEHICLE_COUNT_FIELDS}
+
+
+def daily_vehicle_totals(since):
+    """{date: summed total_vehicles} of analyses made since ``since``"""
+    rows = (
+        TrafficAnalysis.objects.filter(analyzed_at__gte=since)
+        .annotate(day=TruncDate('analyzed_at'))
+        .values('day')
+        .annotate(total=Sum('total_vehicles'))
+    )
+    return {row['day']: row['total'] or 0 for row in rows}
+
+
+def daily_vehicle_counts(dates):
+    """{date: per-class counts} summed over the analyses of each date; dates without analyses are absent"""
+    rows = (
+        TrafficAnalysis.objects.filter(analyzed_at__date__in=dates)
+        .annotate(day=TruncDate('analyzed_at'))
+        .values('day')
+        .annotate(**{key: Sum(field) for key, field in VEHICLE_COUNT_FIELDS.items()})
+    )
+    return {row.pop('day'): {key: value or 0 for key, value in row.items()} for row in rows}
+
+
+def daily_detection_counts(dates):
+    """{date: per-class counts} of Detection rows, for dates that have no analyses"""
+    rows = (
+        Detection.objects.filter(timestamp__date__in=dates, vehicle_type__name__in=VEHICLE_TYPE_NAMES.values())
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'vehicle_type__name')
+        .annotate(count=Count('id'))
+    )
+    keys = {name: key for key, name in VEHICLE_TYPE_NAMES.items()}
+    counts = {}
+    for row in rows:
+        counts.setdefault(row['day'], empty_vehicle_counts())[keys[row['vehicle_type__name']]] = row['count']
+    return counts
+
+
+def detections_per_hour(start, end):
+    """[(hour start, detections)] for each clock hour in [start, end) that has detections"""
+    rows = (
+        Detection.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .annotate(hour=TruncHour('timestamp'))
+        .values('hour')
+        .annotate(count=Count('id'))
+        .order_by('hour')
+    )
+    return [(row['hour'], row['count']) for row in rows]
+
+
+def busiest_hour_of_day(detections=None):
+    """Hour of day (0-23) with the most detections as {'hour', 'count', 'average_confidence'}, or None.
+
+    Of hours with equally many detections the earliest one wins.
+    """
+    detections = Detection.objects.all() if detections is None else detections
+    return (
+        detections.annotate(hour=ExtractHour('timestamp'))
+        .values('hour')
+        .annotate(count=Count('id'), average_confidence=Avg('confidence'))
+        .order_by('-count', 'hour')
+        .first()
+    )
+
+
+def detections_per_day_and_hour(detections):
+    """[(date, hour of day, detections)] of a Detection queryset"""
+    rows = (
+        detections.annotate(day=TruncDate('timestamp'), hour=ExtractHour('timestamp'))
+        .values('day', 'hour')
+        .annotate(count=Count('id'))
+    )
+    return [(row['day'], row['hour'], row['count']) for row in rows]
+
+
+def system_counts(since):
+    """Totals for the overview, three queries for three tables"""
+    videos = VideoFile.objects.aggregate(total=Count('id'), processed=Count('id', filter=Q(processed=True)))
+    analyses = TrafficAnalysis.objects.aggregate(total=Count('id'), recent=Count('id', filter=Q(analyzed_at__gte=since)))
+    detections = Detection.objects.aggregate(total=Count('id'), recent=Count('id', filter=Q(timestamp__gte=since)))
+    return {
+        'total_videos': videos['total'],
+        'processed_videos': videos['processed'],
+        'total_analyses': analyses['total'],
+        'total_detections': detections['total'],
+        'recent_analyses_count': analyses['recent'],
+        'recent_detections_count': detections['recent'],
+    }
@@ -2,18 +2,30 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse, JsonResponse, FileResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.static import serve
 from django.conf import settings
 from .models import VideoFile, TrafficAnalysis, Location
 from .serializers import *
-import threading
 from ml.vehicle_detector import RTXVehicleDetector
 from django.core.files.storage import FileSystemStorage
 import os
+import shutil
 from django.utils import timezone
 from datetime import timedelta
 from .progress import ProgressTracker
+from .jobs import get_job_status
+from .rendering import get_rendered_video_path, get_render_cache, media_path, queue_render
+from .video_serving import serve_video_file
+from .artifacts import find_processed_video, artifact_path
+from . import renditions
+from .renditions import renditions_ready
+from django.urls import reverse
+from .uploads import (
+    save_upload, analysis_fingerprint, queue_or_reuse, file_in_use,
+    create_upload_session, receive_chunk, missing_chunks, finish_upload, abort_upload
+)
+from .models import UploadSession
 from .models import Detection
 import csv
 import json
@@ -234,6 +246,12 @@ class VideoUploadAPI(APIView):
             
             title = request.POST.get('title', video_file.name)
             location_id = request.POST.get('location_id')
+            try:
+                priority = int(request.POST.get('priority', 0))
+            except (TypeError, ValueError):
+                priority = 0
+            # Counts only: skip annotation and encoding of a processed video
+            analysis_only = str(request.POST.get('analysis_only', '')).lower() in ('1', 'true', 'yes', 'on')
             
             # Get video metadata
             video_date = request.POST.get('video_date')
@@ -266,12 +284,13 @@ class VideoUploadAPI(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Save video file
+            # Save video file, hashing it on the way; identical content is stored once
             fs = FileSystemStorage()
-            filename = fs.save(f'videos/{video_file.name}', video_file)
+            filename, content_hash = save_upload(video_file, fs)
             video_path = fs.path(filename)
+            fingerprint = analysis_fingerprint(location)
             
-            print(f"💾 Video saved to: {video_path}")
+            print(f"💾 Video saved to: {video_path} (sha256 {content_hash[:12]})")
             
             # Create VideoFile record with metadata
             video_obj = VideoFile.objects.create(
@@ -282,36 +301,19 @@ class VideoUploadAPI(APIView):
                 video_start_time=video_start_time,
                 video_end_time=video_end_time,
                 processing_status='uploaded',
-                uploaded_at=timezone.now()
+                uploaded_at=timezone.now(),
+                content_hash=content_hash,
+                analysis_fingerprint=fingerprint
             )
             
             print(f"📄 Video record created: {video_obj.id}")
             
-            # ✅ CRITICAL FIX: Initialize progress tracker IMMEDIATELY
-            progress_tracker = ProgressTracker(str(video_obj.id))
-            progress_tracker.set_progress(10, "Video uploaded, starting processing...")
-            
-            # Start background processing
-            profile_display = location.processing_profile.display_name
-            print(f"🎯 Starting {profile_display} processing...")
-            
-            # Use location-based processing
-            thread = threading.Thread(
-                target=self.process_video_with_location_profile,
-                args=(video_obj.id, video_path, location_id, progress_tracker)
-            )
-            thread.daemon = True
-            thread.start()
-            
-            print("✅ Background processing started successfully")
+            # Reuse a finished analysis of identical content, or hand the video to the processing queue
+            print(f"🎯 Queueing {location.processing_profile.display_name} processing...")
+            job, source = queue_or_reuse(video_obj, video_path, location, priority=priority, analysis_only=analysis_only)
+            print("✅ Video queued for processing" if job else "♻️ Analysis reused")
             
-            return Response({
-                'status': 'success',
-                'message': f'Video uploaded and {profile_display} started',
-                'upload_id': str(video_obj.id),
-                'processing_profile': location.processing_profile.name,
-                'processing_profile_display': profile_display
-            })
+            return Response(upload_response(video_obj, job, source, location, analysis_only))
             
         except Exception as e:
             print(f"💥 UPLOAD ERROR: {str(e)}")
@@ -321,187 +323,155 @@ class VideoUploadAPI(APIView):
                 {'error': str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-    
-    def process_video_with_location_profile(self, video_id, video_path, location_id, progress_tracker):
-        """Process video using location-specific detector"""
-        from ml.detector_factory import DetectorFactory
-        
-        print("🔄 STARTING BACKGROUND PROCESSING")
-        print(f"   - Video ID: {video_id}")
-        print(f"   - Video Path: {video_path}")
-        print(f"   - Location ID: {location_id}")
-        
+
+def upload_response(video_obj, job, source, location, analysis_only):
+    """Response body of a finished upload, queued or answered from a reused analysis"""
+    profile_display = location.processing_profile.display_name
+    data = {
+        'status': 'success',
+        'message': f'Video uploaded and queued for {profile_display}',
+        'upload_id': str(video_obj.id),
+        'job_id': str(job.id) if job else None,
+        'reused_analysis': source is not None,
+        'analysis_only': analysis_only,
+        'processing_profile': location.processing_profile.name,
+        'processing_profile_display': profile_display
+    }
+    if source is not None:
+        data['message'] = f'Identical video already analysed with {profile_display}; results reused'
+        data['reused_from'] = str(source.id)
+    return data
+
+def render_pending_response(job):
+    """202 for a processed video that is still being rendered by a worker; clients retry"""
+    progress = ProgressTracker(f"render_{job.video_file_id}").get_progress()
+    response = Response({
+        'status': 'rendering',
+        'message': 'The annotated video is being rendered; try again shortly',
+        'progress': progress['progress'] if progress else 0,
+        'job': get_job_status(job.video_file_id, kind='render')
+    }, status=status.HTTP_202_ACCEPTED)
+    response['Retry-After'] = '5'
+    return response
+
+def upload_session_status(session):
+    missing = missing_chunks(session) if session.status == 'uploading' else []
+    return {
+        'session_id': str(session.id),
+        'filename': session.filename,
+        'status': session.status,
+        'size': session.size,
+        'chunk_size': session.chunk_size,
+        'total_chunks': session.total_chunks,
+        'received_chunks': session.chunks.count(),
+        'missing_chunks': missing,
+        'upload_id': str(session.video_file_id) if session.video_file_id else None
+    }
+
+class UploadSessionCreateAPI(APIView):
+    """Start a resumable upload: the video is then sent chunk by chunk with PUT"""
+    def post(self, request):
+        data = request.data
         try:
-            video_obj = VideoFile.objects.get(id=video_id)
-            location = Location.objects.get(id=location_id)
-            
-            print(f"📍 LOCATION DETAILS:")
-            print(f"   - Name: {location.display_name}")
-            print(f"   - Profile: {location.processing_profile.display_name}")
-            
-            video_obj.processing_status = 'processing'
-            video_obj.save()
-            
-            print("🔧 TESTING DETECTOR CREATION...")
-            detector = DetectorFactory.get_detector(location.processing_profile)
-            print(f"✅ DETECTOR CREATED: {type(detector).__name__}")
-            
-            progress_tracker.set_progress(20, f"Starting {location.processing_profile.display_name}...")
-            
-            # Analyze video with progress tracking and save_output=True
-            print(f"🎯 Starting video analysis with {type(detector).__name__}...")
-            report = detector.analyze_video(video_path, progress_tracker, save_output=True)
-            
-            # Check if this is Baliwasan report
-            if 'baliwasan_specific' in report:
-                print("✅ BALIWASAN Y-JUNCTION ANALYSIS COMPLETED!")
-                print(f"   - Total vehicles: {report['summary']['total_vehicles_counted']}")
-            else:
-                print("ℹ️  Generic analysis completed")
-            
-            progress_tracker.set_progress(95, "Saving location-optimized results...")
-            
-            # Create TrafficAnalysis record
-            analysis = TrafficAnalysis.objects.create(
-                video_file=video_obj,
-                location=location,
-                total_vehicles=report['summary']['total_vehicles_counted'],
-                processing_time_seconds=report['metadata']['processing_time'],
-                car_count=report['summary']['vehicle_breakdown'].get('car', 0),
-                truck_count=report['summary']['vehicle_breakdown'].get('truck', 0),
-                motorcycle_count=report['summary']['vehicle_breakdown'].get('motorcycle', 0),
-                bus_count=report['summary']['vehicle_breakdown'].get('bus', 0),
-                bicycle_count=report['summary']['vehicle_breakdown'].get('bicycle', 0),
-                peak_traffic=report['summary']['peak_traffic'],
-                average_traffic=report['summary']['average_traffic_density'],
-                congestion_level=report['metrics']['congestion_level'],
-                traffic_pattern=report['metrics']['traffic_pattern'],
-                analysis_data=report,
-                metrics_summary={
-                    'processing_profile': location.processing_profile.name,
-                    'location_name': location.display_name,
-                    'detector_type': location.processing_profile.display_name,
-                    'detector_class': type(detector).__name__
-                }
+            size = int(data.get('size'))
+            chunk_size = int(data['chunk_size']) if data.get('chunk_size') else None
+            priority = int(data.get('priority', 0) or 0)
+        except (TypeError, ValueError):
+            return Response({'error': 'size (and chunk_size, priority) must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        filename = data.get('filename')
+        if not filename:
+            return Response({'error': 'filename is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            location = Location.objects.get(id=data.get('location_id'))
+        except (Location.DoesNotExist, ValueError, TypeError):
+            return Response({'error': 'Selected location not found'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = create_upload_session(
+                filename, size, location, chunk_size=chunk_size,
+                title=data.get('title') or filename,
+                video_date=data.get('video_date') or None,
+                video_start_time=data.get('start_time') or None,
+                video_end_time=data.get('end_time') or None,
+                priority=priority,
+                analysis_only=str(data.get('analysis_only', '')).lower() in ('1', 'true', 'yes', 'on')
             )
-            
-            # ✅ CRITICAL: Save processed video path to database
-            if 'output_video_path' in report and report['output_video_path']:
-                # Convert absolute path to relative path for Django
-                relative_path = report['output_video_path'].replace('media/', '')
-                video_obj.processed_video_path = relative_path
-                video_obj.save()
-                print(f"✅ Saved processed video path to database: {relative_path}")
-            else:
-                print("⚠️  No output_video_path in report - video may not be saved")
-            
-            # Update video status
-            video_obj.processing_status = 'completed'
-            video_obj.processed = True
-            video_obj.processed_at = timezone.now()
-            video_obj.save()
-            
-            progress_tracker.set_progress(100, f"{location.processing_profile.display_name} completed successfully!")
-            progress_tracker.complete_processing("Video analysis completed!")
-            
-            print(f"✅ Location-based processing completed for {video_obj.filename}")
-            print(f"✅ Detector used: {type(detector).__name__}")
-            print(f"✅ Total vehicles counted: {analysis.total_vehicles}")
-            
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(upload_session_status(session), status=status.HTTP_201_CREATED)
+
+class UploadSessionAPI(APIView):
+    """Status of a resumable upload (which chunks are still missing), or DELETE to abort it"""
+    def get(self, request, session_id):
+        try:
+            session = UploadSession.objects.get(id=session_id)
+        except UploadSession.DoesNotExist:
+            return Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(upload_session_status(session))
+
+    def delete(self, request, session_id):
+        try:
+            session = UploadSession.objects.get(id=session_id)
+        except UploadSession.DoesNotExist:
+            return Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not abort_upload(session):
+            return Response({'error': f'Upload is already {session.status}'}, status=status.HTTP_409_CONFLICT)
+        return Response(upload_session_status(session))
+
+class UploadChunkAPI(APIView):
+    """PUT one chunk as the raw request body with its SHA-256 in the X-Chunk-SHA256 header.
+
+    The chunk that completes the file also queues the analysis and returns the
+    same body as a regular upload.
+    """
+    def put(self, request, session_id, index):
+        try:
+            session = UploadSession.objects.select_related('location__processing_profile').get(id=session_id)
+        except UploadSession.DoesNotExist:
+            return Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+        if session.status != 'uploading':
+            return Response({'error': f'Upload is already {session.status}', **upload_session_status(session)},
+                            status=status.HTTP_409_CONFLICT)
+
+        expected = request.META.get('HTTP_X_CHUNK_SHA256', '').strip()
+        if len(expected) != 64:
+            return Response({'error': 'X-Chunk-SHA256 header with the chunk\'s hex SHA-256 is required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= index < session.total_chunks:
+            return Response({'error': f'Chunk index must be between 0 and {session.total_chunks - 1}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        _, length = session.chunk_range(index)
+        if request.META.get('CONTENT_LENGTH') != str(length):
+            return Response({'error': f'Chunk {index} must be exactly {length} bytes'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Read the body as a stream; it is verified in a spooled buffer before it reaches the file
+            actual = receive_chunk(session, index, request.stream, expected)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if actual != expected.lower():
+            print(f"❌ Chunk {index} of upload {session.id} failed its checksum")
+            return Response({'error': f'Checksum mismatch for chunk {index}', 'expected': expected.lower(), 'received': actual},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        if session.chunks.count() < session.total_chunks:
+            return Response(upload_session_status(session))
+
+        try:
+            finished = finish_upload(session)
         except Exception as e:
-            print(f"❌ Location-based processing failed: {e}")
+            print(f"💥 UPLOAD ERROR: {str(e)}")
             import traceback
             traceback.print_exc()
-            
-            # Update progress with error
-            try:
-                progress_tracker.set_progress(0, f"Processing failed: {str(e)}")
-                video_obj = VideoFile.objects.get(id=video_id)
-                video_obj.processing_status = 'failed'
-                video_obj.save()
-            except:
-                pass
-    
-    def process_video_background(self, video_id, video_path, location_id=None):
-        """Process video in background thread with progress tracking"""
-        from .progress import ProgressTracker
-        
-        progress_tracker = ProgressTracker(video_id)
-        output_video_path = None
-        
-        try:
-            video_obj = VideoFile.objects.get(id=video_id)
-            video_obj.processing_status = 'processing'
-            video_obj.save()
-            
-            progress_tracker.set_progress(0, "Starting video analysis...")
-            
-            # Analyze video with progress tracking
-            detector = RTXVehicleDetector()
-            report = detector.analyze_video(video_path, progress_tracker, save_output=True)
-            
-            progress_tracker.set_progress(95, "Saving results to database...")
-            
-            # Get location if provided
-            location = None
-            if location_id:
-                try:
-                    location = Location.objects.get(id=location_id)
-                except Location.DoesNotExist:
-                    pass
-            
-            # Create TrafficAnalysis record
-            analysis = TrafficAnalysis.objects.create(
-                video_file=video_obj,
-                location=location,
-                total_vehicles=report['summary']['total_vehicles_counted'],
-                processing_time_seconds=report['metadata']['processing_time'],
-                car_count=report['summary']['vehicle_breakdown'].get('car', 0),
-                truck_count=report['summary']['vehicle_breakdown'].get('truck', 0),
-                motorcycle_count=report['summary']['vehicle_breakdown'].get('motorcycle', 0),
-                bus_count=report['summary']['vehicle_breakdown'].get('bus', 0),
-                bicycle_count=report['summary']['vehicle_breakdown'].get('bicycle', 0),
-                peak_traffic=report['summary']['peak_traffic'],
-                average_traffic=report['summary']['average_traffic_density'],
-                congestion_level=report['metrics']['congestion_level'],
-                traffic_pattern=report['metrics']['traffic_pattern'],
-                analysis_data=report
-            )
-            
-            # Save processed video path if available
-            if 'output_video_path' in report and report['output_video_path']:
-                # Convert absolute path to relative path for Django
-                relative_path = report['output_video_path'].replace('media/', '')
-                video_obj.processed_video_path = relative_path
-                output_video_path = report['output_video_path']
-                print(f"✓ Saved processed video path: {relative_path}")
-            
-            # Update video status
-            video_obj.processing_status = 'completed'
-            video_obj.processed = True
-            video_obj.save()
-            
-            progress_tracker.set_progress(100, "Analysis completed successfully!")
-            
-            print(f"✓ Video processing completed: {video_obj.filename}")
-            if output_video_path:
-                print(f"✓ Processed video available at: {output_video_path}")
-            
-        except Exception as e:
-            print(f"✗ Video processing failed: {e}")
-            progress_tracker.set_progress(0, f"Processing failed: {str(e)}")
-            video_obj = VideoFile.objects.get(id=video_id)
-            video_obj.processing_status = 'failed'
-            video_obj.save()
-        finally:
-            # Clear progress after 5 minutes
-            import threading
-            def clear_progress():
-                import time
-                time.sleep(300)
-                progress_tracker.clear_progress()
-            
-            threading.Thread(target=clear_progress).start()
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        session.refresh_from_db()
+        if finished is None:
+            # A concurrent request delivered the last chunk first
+            return Response(upload_session_status(session))
+        video_obj, job, source = finished
+        return Response(dict(upload_session_status(session), **upload_response(
+            video_obj, job, source, session.location, session.analysis_only
+        )))
 
 class VideoProgressAPI(APIView):
     def get(self, request, video_id):
@@ -509,13 +479,14 @@ class VideoProgressAPI(APIView):
         try:
             progress_tracker = ProgressTracker(str(video_id))
             progress_data = progress_tracker.get_progress()
+            job_data = get_job_status(video_id)
             
             if progress_data:
                 print(f"📊 Progress API: {video_id} - {progress_data['progress']}% - {progress_data['message']}")
-                return Response(progress_data)
+                return Response({**progress_data, 'job': job_data})
             else:
                 print(f"📊 Progress API: {video_id} - No progress data")
-                return Response({'progress': 0, 'message': 'No progress data available'})
+                return Response({'progress': 0, 'message': 'No progress data available', 'job': job_data})
         except Exception as e:
             print(f"❌ Progress API Error: {e}")
             return Response({'progress': 0, 'message': 'Error fetching progress'})
@@ -698,11 +669,14 @@ class ProcessingProfileDetailAPI(APIView):
 
 class HealthCheckAPI(APIView):
     def get(self, request):
+        from ml.model_registry import model_registry
+        
         return Response({
             'status': 'healthy',
             'ml_available': True,
             'video_count': VideoFile.objects.count(),
-            'analysis_count': TrafficAnalysis.objects.count()
+            'analysis_count': TrafficAnalysis.objects.count(),
+            'loaded_models': model_registry.stats()
         })
 
 class VideoDeleteAPI(APIView):
@@ -717,17 +691,35 @@ class VideoDeleteAPI(APIView):
             # Store filename for success message
             filename = video_obj.filename
             
-            # Delete associated files from filesystem
-            if video_obj.file_path:
+            # Delete associated files from filesystem (unless a duplicate upload still shares them)
+            if video_obj.file_path and not file_in_use(video_obj, 'file_path', video_obj.file_path.name):
                 if os.path.isfile(video_obj.file_path.path):
                     os.remove(video_obj.file_path.path)
                     print(f"✓ Deleted original video: {video_obj.file_path.path}")
             
-            if video_obj.processed_video_path:
+            if video_obj.processed_video_path and not file_in_use(
+                video_obj, 'processed_video_path', video_obj.processed_video_path.name
+            ):
                 if os.path.isfile(video_obj.processed_video_path.path):
                     os.remove(video_obj.processed_video_path.path)
                     print(f"✓ Deleted processed video: {video_obj.processed_video_path.path}")
             
+            if video_obj.detections_path and not file_in_use(video_obj, 'detections_path', video_obj.detections_path):
+                detections_file = media_path(video_obj.detections_path)
+                if os.path.isfile(detections_file):
+                    os.remove(detections_file)
+                    print(f"✓ Deleted stored detections: {detections_file}")
+            
+            # A duplicate's cached render and streaming renditions belong to the upload it reuses
+            rendered_path = get_render_cache().get(video_obj) if not video_obj.duplicate_of_id else None
+            if rendered_path:
+                os.remove(rendered_path)
+                print(f"✓ Deleted rendered video: {rendered_path}")
+            stream_dir = renditions.stream_dir(video_obj) if not video_obj.duplicate_of_id else None
+            if stream_dir and os.path.isdir(stream_dir):
+                shutil.rmtree(stream_dir, ignore_errors=True)
+                print(f"✓ Deleted streaming renditions: {stream_dir}")
+            
             # Delete database record (this will cascade to related records)
             video_obj.delete()
             
@@ -770,33 +762,24 @@ class ProcessedVideoViewAPI(APIView):
                 print(f"✓ Serving processed video from database path: {file_path}")
                 
                 # Serve the file with inline content disposition for viewing
-                response = FileResponse(open(file_path, 'rb'), content_type='video/mp4')
-                response['Content-Disposition'] = f'inline; filename="processed_{video_obj.filename}"'
-                return response
-            
-            # Priority 2: Look in processed_videos directory
-            processed_videos_dir = 'media/processed_videos'
-            if os.path.exists(processed_videos_dir):
-                # Try to find by video ID or filename
-                video_base_name = os.path.splitext(video_obj.filename)[0]
-                
-                for filename in os.listdir(processed_videos_dir):
-                    if (video_base_name in filename or 
-                        str(video_obj.id) in filename or 
-                        'processed' in filename.lower()):
-                        
-                        file_path = os.path.join(processed_videos_dir, filename)
-                        if os.path.exists(file_path):
-                            print(f"✓ Found processed video in directory: {file_path}")
-                            
-                            # Update database with found path for future reference
-                            relative_path = file_path.replace('media/', '')
-                            video_obj.processed_video_path = relative_path
-                            video_obj.save()
-                            
-                            response = FileResponse(open(file_path, 'rb'), content_type='video/mp4')
-                            response['Content-Disposition'] = f'inline; filename="processed_{video_obj.filename}"'
-                            return response
+                return serve_video_file(request, file_path, f"processed_{video_obj.filename}")
+            
+            # Priority 2: Rendered earlier from stored detections
+            rendered_path = get_rendered_video_path(video_obj)
+            if rendered_path:
+                print(f"✓ Serving rendered video: {rendered_path}")
+                return serve_video_file(request, rendered_path, f"processed_{video_obj.filename}")
+            
+            # Priority 3: Any other indexed rendition of the annotated video
+            file_path = find_processed_video(video_obj)
+            if file_path:
+                print(f"✓ Serving indexed processed video: {file_path}")
+                return serve_video_file(request, file_path, f"processed_{video_obj.filename}")
+            
+            # Priority 4: Have a worker render it from stored detections
+            render_job = queue_render(video_obj)
+            if render_job:
+                return render_pending_response(render_job)
             
             # No processed video found
             return Response(
@@ -825,28 +808,25 @@ class ProcessedVideoDownloadAPI(APIView):
             # Check if we have a processed video path
             if video_obj.processed_video_path and os.path.exists(video_obj.processed_video_path.path):
                 print(f"Serving processed video for download: {video_obj.processed_video_path.path}")
-                response = FileResponse(open(video_obj.processed_video_path.path, 'rb'), content_type='video/mp4')
-                response['Content-Disposition'] = f'attachment; filename="processed_{video_obj.filename}"'
-                return response
-            
-            # Fallback: look for processed video files
-            processed_videos_dir = 'media/processed_videos'
-            if os.path.exists(processed_videos_dir):
-                matching_files = []
-                video_base_name = os.path.splitext(video_obj.filename)[0]
-                
-                for filename in os.listdir(processed_videos_dir):
-                    if video_base_name in filename or str(video_obj.id) in filename:
-                        matching_files.append(filename)
-                
-                if matching_files:
-                    latest_file = max(matching_files, key=lambda x: os.path.getctime(os.path.join(processed_videos_dir, x)))
-                    file_path = os.path.join(processed_videos_dir, latest_file)
-                    print(f"Found matching processed video for download: {file_path}")
-                    
-                    response = FileResponse(open(file_path, 'rb'), content_type='video/mp4')
-                    response['Content-Disposition'] = f'attachment; filename="processed_{video_obj.filename}"'
-                    return response
+                return serve_video_file(request, video_obj.processed_video_path.path,
+                                        f"processed_{video_obj.filename}", disposition='attachment')
+            
+            # Rendered earlier from stored detections
+            rendered_path = get_rendered_video_path(video_obj)
+            if rendered_path:
+                print(f"Serving rendered video for download: {rendered_path}")
+                return serve_video_file(request, rendered_path, f"processed_{video_obj.filename}", disposition='attachment')
+            
+            # Fallback: any other indexed rendition of the annotated video
+            file_path = find_processed_video(video_obj)
+            if file_path:
+                print(f"Found indexed processed video for download: {file_path}")
+                return serve_video_file(request, file_path, f"processed_{video_obj.filename}", disposition='attachment')
+            
+            # Have a worker render it from stored detections
+            render_job = queue_render(video_obj)
+            if render_job:
+                return render_pending_response(render_job)
             
             return Response({'error': 'No processed video available for download'}, status=404)
             
@@ -856,6 +836,70 @@ class ProcessedVideoDownloadAPI(APIView):
             print(f"Error serving video download: {e}")
             return Response({'error': 'Error serving video file'}, status=500)
 
+class ProcessedVideoStreamAPI(APIView):
+    def get(self, request, video_id):
+        """
+        Adaptive-bitrate renditions of the processed video (HLS/DASH, poster, thumbnail strip)
+        Frontend calls: GET /api/video/{video_id}/stream/ and polls while it returns 202
+        """
+        try:
+            video_obj = VideoFile.objects.get(id=video_id)
+        except VideoFile.DoesNotExist:
+            return Response({'error': 'Video not found'}, status=status.HTTP_404_NOT_FOUND)
+        if video_obj.processing_status != 'completed':
+            return Response({'error': 'Video processing not completed yet'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if renditions_ready(video_obj):
+            def url(rendition, name):
+                if not artifact_path(video_obj, rendition):
+                    return None
+                return request.build_absolute_uri(reverse('processed_video_stream_file', args=[video_id, name]))
+
+            return Response({
+                'status': 'ready',
+                'hls': url(renditions.HLS, 'hls/master.m3u8'),
+                'dash': url(renditions.DASH, 'dash/manifest.mpd'),
+                'poster': url(renditions.POSTER, 'poster.jpg'),
+                'thumbnails': url(renditions.THUMBNAILS, 'thumbnails.jpg'),
+                'thumbnails_vtt': url(renditions.THUMBNAILS, 'thumbnails.vtt')
+            })
+
+        if renditions.find_ffmpeg() is None:
+            return Response({'error': 'Streaming renditions need ffmpeg, which is not installed on the server'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        owner_id = video_obj.duplicate_of_id or video_obj.id
+        job_data = get_job_status(owner_id, kind='renditions')
+        if job_data and job_data['status'] == 'failed' and not request.query_params.get('retry'):
+            # Reported until the client asks for another attempt with ?retry=1
+            return Response({'status': 'failed', 'error': job_data['error_message'], 'job': job_data},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if not job_data or job_data['status'] not in ('queued', 'running'):
+            renditions.queue_renditions(video_obj)
+            job_data = get_job_status(owner_id, kind='renditions')
+        progress = ProgressTracker(f"renditions_{owner_id}").get_progress()
+        response = Response({
+            'status': 'building',
+            'message': 'Preparing streaming renditions',
+            'progress': progress['progress'] if progress else 0,
+            'job': job_data
+        }, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = '5'
+        return response
+
+class ProcessedVideoStreamFileAPI(APIView):
+    def get(self, request, video_id, name):
+        """Playlists, segments and thumbnails of a video's streaming renditions"""
+        try:
+            video_obj = VideoFile.objects.get(id=video_id)
+        except VideoFile.DoesNotExist:
+            return Response({'error': 'Video not found'}, status=status.HTTP_404_NOT_FOUND)
+        file_path = renditions.stream_file_path(video_obj, name)
+        if file_path is None:
+            return Response({'error': 'Stream file not found'}, status=status.HTTP_404_NOT_FOUND)
+        content_type = renditions.CONTENT_TYPES.get(os.path.splitext(file_path)[1], 'application/octet-stream')
+        return serve_video_file(request, file_path, os.path.basename(file_path), content_type=content_type)
+
 # Simple direct file serving endpoint for development
 class ProcessedVideoDirectAPI(APIView):
     def get(self, request, video_id):
@@ -879,20 +923,26 @@ class ProcessedVideoDirectAPI(APIView):
             if video_obj.processed_video_path:
                 possible_locations.append(video_obj.processed_video_path.path)
             
-            # 2. Processed videos directory
-            processed_videos_dir = 'media/processed_videos'
-            if os.path.exists(processed_videos_dir):
-                for filename in os.listdir(processed_videos_dir):
-                    if any(keyword in filename.lower() for keyword in ['processed', str(video_obj.id), os.path.splitext(video_obj.filename)[0]]):
-                        possible_locations.append(os.path.join(processed_videos_dir, filename))
+            # 1b. Rendered earlier from stored detections
+            rendered_path = get_rendered_video_path(video_obj)
+            if rendered_path:
+                possible_locations.append(rendered_path)
+            
+            # 2. Artifact index
+            indexed_path = find_processed_video(video_obj)
+            if indexed_path:
+                possible_locations.append(indexed_path)
             
             # 3. Try the first valid file found
             for file_path in possible_locations:
                 if os.path.exists(file_path):
                     print(f"✓ Direct serving video: {file_path}")
-                    response = FileResponse(open(file_path, 'rb'), content_type='video/mp4')
-                    response['Content-Disposition'] = f'inline; filename="processed_{video_obj.filename}"'
-                    return response
+                    return serve_video_file(request, file_path, f"processed_{video_obj.filename}")
+            
+            # 4. Have a worker render it from stored detections
+            render_job = queue_render(video_obj)
+            if render_job:
+                return render_pending_response(render_job)
             
             return Response(
                 {'error': 'No processed video file found'}, 
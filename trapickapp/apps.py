@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TrapickappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trapickapp'
+
+    def ready(self):
+        from .jobs import start_workers_with_server
+
+        # Requeue jobs orphaned by a restart now instead of on the next upload
+        start_workers_with_server()
@@ -0,0 +1,152 @@
+# trapickapp/artifacts.py
+import os
+import re
+from django.conf import settings
+from .models import VideoArtifact
+from .uploads import hash_file
+
+# Renditions of an upload's annotated video
+PROCESSED = 'processed'     # written by the analysis (processed_video_path)
+RENDERED = 'rendered'       # rendered on demand from stored detections (trapickapp.rendering)
+
+
+def relative_media_path(path):
+    """``path`` relative to MEDIA_ROOT; accepts absolute paths and the 'media/...' paths the detectors write"""
+    path = str(path)
+    if os.path.isabs(path):
+        return os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+    path = path.replace(os.sep, '/')
+    return path[len('media/'):] if path.startswith('media/') else path
+
+
+def owner_id(video_obj):
+    # Duplicate uploads share the artifacts of the upload they reuse
+    return video_obj.duplicate_of_id or video_obj.id
+
+
+def probe_codec(path):
+    """FourCC of a video file's codec, or '' when OpenCV cannot open it"""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC)) if cap.isOpened() else 0
+    finally:
+        cap.release()
+    return ''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip('\0 ') if fourcc else ''
+
+
+def record_artifact(video_obj, path, rendition=PROCESSED, codec=None):
+    """Index a file just written for ``video_obj``, replacing its previous entry for ``rendition``"""
+    relative = relative_media_path(path)
+    full_path = os.path.join(settings.MEDIA_ROOT, relative)
+    if not os.path.isfile(full_path):
+        print(f"⚠️  Not indexing missing {rendition} artifact: {relative}")
+        return None
+    artifact, _ = VideoArtifact.objects.update_or_create(
+        video_file_id=owner_id(video_obj), rendition=rendition,
+        defaults={
+            'path': relative,
+            'size': os.path.getsize(full_path),
+            'codec': probe_codec(full_path) if codec is None else codec,
+            'checksum': hash_file(full_path)
+        }
+    )
+    print(f"🗂️ Indexed {rendition} artifact: {relative}")
+    return artifact
+
+
+def forget_artifact(path):
+    """Drop the index entries of a file that was deleted"""
+    return VideoArtifact.objects.filter(path=relative_media_path(path)).delete()[0]
+
+
+def artifact_path(video_obj, rendition=PROCESSED):
+    """Absolute path of an indexed artifact that still exists on disk, or None"""
+    artifact = VideoArtifact.objects.filter(video_file_id=owner_id(video_obj), rendition=rendition).first()
+    if artifact is None:
+        return None
+    full_path = os.path.join(settings.MEDIA_ROOT, artifact.path)
+    if not os.path.isfile(full_path):
+        print(f"⚠️  Indexed artifact is missing, dropping it: {artifact.path}")
+        artifact.delete()
+        return None
+    return full_path
+
+
+def find_processed_video(video_obj):
+    """Any indexed annotated video of ``video_obj`` (analysis output first, then a cached render)"""
+    return artifact_path(video_obj, PROCESSED) or artifact_path(video_obj, RENDERED)
+
+
+# processed_<stored name>_<YYYYmmdd_HHMMSS>.mp4, as written by the detectors
+LEGACY_OUTPUT_NAME = re.compile(r'^(?:\w+_)?processed_(?P<stem>.+)_\d{8}_\d{6}\.mp4$')
+
+
+def reconcile_artifacts(rehash=False, dry_run=False):
+    """Bring the index in line with the files on disk (one-time backfill and periodic repair).
+
+    Indexes processed videos and cached renders of every upload, matches
+    processed videos that were never linked to their upload by their exact
+    output name (one directory scan in total), drops entries whose file is
+    gone and lists unindexed files. Returns counts per outcome.
+    """
+    from .models import VideoFile
+    from .rendering import get_render_cache
+
+    stats = {'indexed': 0, 'unchanged': 0, 'linked': 0, 'removed': 0, 'orphans': []}
+    processed_dir = os.path.join(settings.MEDIA_ROOT, 'processed_videos')
+    legacy_outputs = {}
+    if os.path.isdir(processed_dir):
+        for entry in os.scandir(processed_dir):
+            match = LEGACY_OUTPUT_NAME.match(entry.name)
+            if match and entry.is_file():
+                newest = legacy_outputs.get(match.group('stem'))
+                if newest is None or entry.stat().st_mtime > newest.stat().st_mtime:
+                    legacy_outputs[match.group('stem')] = entry
+
+    existing = {(a.video_file_id, a.rendition): a for a in VideoArtifact.objects.all()}
+    render_cache = get_render_cache()
+
+    def index(video_obj, path, rendition):
+        artifact = existing.get((video_obj.id, rendition))
+        if (artifact and not rehash and artifact.path == relative_media_path(path)
+                and artifact.size == os.path.getsize(path)):
+            stats['unchanged'] += 1
+            return
+        stats['indexed'] += 1
+        if not dry_run:
+            record_artifact(video_obj, path, rendition)
+
+    for video_obj in VideoFile.objects.filter(duplicate_of__isnull=True).iterator():
+        processed_path = video_obj.processed_video_path.path if video_obj.processed_video_path else None
+        if processed_path is None and video_obj.file_path:
+            entry = legacy_outputs.get(os.path.splitext(os.path.basename(video_obj.file_path.name))[0])
+            if entry is not None:
+                processed_path = entry.path
+                stats['linked'] += 1
+                print(f"🔗 Linked {entry.name} to upload {video_obj.id}")
+                if not dry_run:
+                    video_obj.processed_video_path = relative_media_path(entry.path)
+                    video_obj.save(update_fields=['processed_video_path'])
+        if processed_path and os.path.isfile(processed_path):
+            index(video_obj, processed_path, PROCESSED)
+
+        rendered_path = render_cache.path_for(video_obj)
+        if os.path.isfile(rendered_path):
+            index(video_obj, rendered_path, RENDERED)
+
+    for artifact in VideoArtifact.objects.all():
+        if not os.path.isfile(os.path.join(settings.MEDIA_ROOT, artifact.path)):
+            stats['removed'] += 1
+            print(f"🗑️ Dropping index entry for missing file: {artifact.path}")
+            if not dry_run:
+                artifact.delete()
+
+    indexed_paths = set(VideoArtifact.objects.values_list('path', flat=True))
+    for directory in (processed_dir, render_cache.cache_dir):
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                if entry.is_file() and relative_media_path(entry.path) not in indexed_paths:
+                    stats['orphans'].append(relative_media_path(entry.path))
+    return stats
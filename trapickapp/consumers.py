@@ -51,6 +51,25 @@ class VideoProgressConsumer(AsyncWebsocketConsumer):
             'message': event['message']
         }))
 
+class LocationTrafficConsumer(AsyncWebsocketConsumer):
+    """Per-minute counts of a location's live stream (see trapickapp.streams)"""
+
+    async def connect(self):
+        self.location_id = self.scope['url_route']['kwargs']['location_id']
+        self.room_group_name = f'location_traffic_{self.location_id}'
+        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+
+    async def traffic_window(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'traffic_window',
+            'location_id': event['location_id'],
+            'window': event['window']
+        }))
+
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         await self.accept()
@@ -0,0 +1,369 @@
+# trapickapp/jobs.py
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import ProcessingJob
+from .progress import ProgressTracker
+
+DEFAULT_JOB_QUEUE = {
+    'BACKEND': 'local',     # 'local' (in-process worker threads) or 'celery'
+    'WORKERS': 1,           # videos analysed at the same time by each web process (local) or worker
+    'ORDERING': 'fifo',     # 'fifo' or 'priority'
+    'HEARTBEAT_SECONDS': 30,        # how often a running job reports that its worker is alive
+    'STALE_AFTER_SECONDS': 120,     # a running job without a heartbeat for this long is requeued
+    'START_WITH_SERVER': True,      # start local workers (and recovery) when the web server starts
+}
+
+# Programs whose processes serve the app and so run the local workers
+SERVER_PROGRAMS = {'daphne', 'gunicorn', 'uvicorn', 'hypercorn', 'uwsgi'}
+
+
+def get_queue_config():
+    config = dict(DEFAULT_JOB_QUEUE)
+    config.update(getattr(settings, 'TRAPICK_JOB_QUEUE', {}))
+    return config
+
+
+class JobHeartbeat:
+    """Refreshes ``heartbeat_at`` of a running job from a side thread, so other
+    processes can tell a busy worker from a dead one"""
+
+    def __init__(self, job_id, worker_name, interval):
+        self.job_id = job_id
+        self.worker_name = worker_name
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f'heartbeat-{job_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self):
+        try:
+            while not self._stop.wait(self.interval):
+                ProcessingJob.objects.filter(id=self.job_id, status='running', worker=self.worker_name).update(
+                    heartbeat_at=timezone.now()
+                )
+        except Exception as e:
+            print(f"⚠️  Heartbeat of job {self.job_id} stopped: {e}")
+        finally:
+            connection.close()
+
+
+def job_progress_key(job):
+    # Analyses keep the bare video id the upload page polls; other kinds get their own entry
+    return str(job.video_file_id) if job.kind == 'analysis' else f"{job.kind}_{job.video_file_id}"
+
+
+def run_job(job_id):
+    """Claim a queued job and process it; safe to call from any worker"""
+    from .processing import process_video_with_location_profile, process_video_background
+    from .rendering import render_video
+    from .renditions import build_renditions_for_job
+
+    close_old_connections()
+    worker_name = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"[:100]
+
+    # Atomic claim so two workers never run the same job
+    now = timezone.now()
+    claimed = ProcessingJob.objects.filter(id=job_id, status='queued').update(
+        status='running',
+        started_at=now,
+        heartbeat_at=now,
+        attempts=F('attempts') + 1,
+        worker=worker_name
+    )
+    if not claimed:
+        print(f"⏭️ Job {job_id} is no longer queued, skipping")
+        return
+
+    job = ProcessingJob.objects.select_related('video_file', 'location').get(id=job_id)
+    print(f"🏃 Worker {worker_name} running {job.kind} job {job.id} for {job.video_file.filename}")
+    progress_tracker = ProgressTracker(job_progress_key(job))
+
+    try:
+        with JobHeartbeat(job.id, worker_name, get_queue_config()['HEARTBEAT_SECONDS']):
+            if job.kind == 'render':
+                render_video(job.video_file, progress_tracker)
+            elif job.kind == 'renditions':
+                build_renditions_for_job(job.video_file, progress_tracker)
+            elif job.location_id:
+                process_video_with_location_profile(
+                    job.video_file_id, job.video_path, job.location_id, progress_tracker,
+                    save_output=not job.analysis_only
+                )
+            else:
+                process_video_background(job.video_file_id, job.video_path, save_output=not job.analysis_only)
+        job.status = 'completed'
+        job.error_message = ''
+    except Exception as e:
+        traceback.print_exc()
+        job.status = 'failed'
+        job.error_message = str(e)
+    finally:
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'finished_at'])
+        close_old_connections()
+
+    print(f"🏁 Job {job.id} {job.status}")
+
+
+class LocalJobQueue:
+    """In-process worker pool used when no message broker is available.
+
+    Workers are plain threads pulling job IDs from a shared queue, so only
+    ``WORKERS`` videos are analysed at once no matter how many are uploaded.
+    The bound is per process: every gunicorn/daphne process serving the app
+    starts its own pool, so up to WORKERS x processes jobs run in total. Run
+    a single server process, or use the Celery backend, for a global limit.
+    The database stays the source of truth; the in-memory queue is rebuilt
+    from it on startup, and a periodic sweep picks up jobs whose worker died
+    in another process as well as jobs queued from outside this process
+    (``manage.py requeue_jobs --failed``).
+    """
+
+    def __init__(self, workers=1, ordering='fifo'):
+        self.workers = max(1, int(workers))
+        self.ordering = ordering
+        self._queue = queue.PriorityQueue()
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        # IDs waiting in _queue, so a sweep does not submit them twice
+        self._held = set()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f'trapick-worker-{i + 1}')
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+            recovery = threading.Thread(target=self._recovery_loop, name='trapick-job-recovery', daemon=True)
+            recovery.start()
+            self._threads.append(recovery)
+        print(f"👷 Started {self.workers} local processing worker(s) ({self.ordering})")
+
+    def submit(self, job):
+        """Hand ``job`` to the workers; False when it is already waiting here"""
+        with self._lock:
+            if job.id in self._held:
+                return False
+            self._held.add(job.id)
+            self._counter += 1
+            # PriorityQueue pops the smallest key; the counter keeps FIFO among equals
+            key = -job.priority if self.ordering == 'priority' else 0
+            self._queue.put((key, self._counter, job.id))
+        return True
+
+    def sweep(self):
+        """Requeue orphaned jobs and submit every queued job not waiting here yet; returns the submitted jobs.
+
+        Another process may hold some of them too; run_job's atomic claim
+        makes sure each runs once.
+        """
+        return [job for job in recover_jobs() if self.submit(job)]
+
+    def _recovery_loop(self):
+        interval = get_queue_config()['STALE_AFTER_SECONDS']
+        while True:
+            # The first sweep runs on startup, when the table may not be migrated yet or SQLite may be locked
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️  Job recovery sweep failed, retrying in {interval}s: {e}")
+            finally:
+                close_old_connections()
+            time.sleep(interval)
+
+    def _worker_loop(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            with self._lock:
+                self._held.discard(job_id)
+            try:
+                run_job(job_id)
+            except Exception as e:
+                print(f"❌ Worker error on job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+class CeleryJobQueue:
+    """Hands jobs to Celery workers through the configured broker"""
+
+    def start(self):
+        pass
+
+    def submit(self, job):
+        from .tasks import process_video_job
+
+        options = {}
+        if get_queue_config()['ORDERING'] == 'priority':
+            # Celery/Redis priorities run 0 (highest) to 9
+            options['priority'] = max(0, min(9, 9 - job.priority))
+        process_video_job.apply_async(args=[str(job.id)], **options)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def worker_is_gone(job, stale_before):
+    """Whether the worker that claimed a running job has died.
+
+    A job is orphaned when its heartbeat stopped, or sooner when its worker
+    process ran on this host and no longer exists.
+    """
+    if job.heartbeat_at is None or job.heartbeat_at < stale_before:
+        return True
+    host, _, rest = job.worker.partition(':')
+    pid = rest.split(':', 1)[0]
+    # os.kill(pid, 0) would terminate the process on Windows
+    if host == socket.gethostname() and pid.isdigit() and os.name != 'nt':
+        return int(pid) != os.getpid() and not _pid_alive(int(pid))
+    return False
+
+
+def requeue_orphaned_jobs(include_failed=False):
+    """Requeue running jobs whose worker died (and failed ones, if asked); returns the requeued jobs"""
+    stale_before = timezone.now() - timedelta(seconds=get_queue_config()['STALE_AFTER_SECONDS'])
+    orphaned = [job for job in ProcessingJob.objects.filter(status='running') if worker_is_gone(job, stale_before)]
+    requeue = Q(id__in=[job.id for job in orphaned], status='running')
+    if include_failed:
+        requeue |= Q(status='failed')
+    ids = list(ProcessingJob.objects.filter(requeue).values_list('id', flat=True))
+    # Only rows still in the state they were picked in, in case a worker finished meanwhile
+    count = ProcessingJob.objects.filter(requeue, id__in=ids).update(status='queued', worker='', heartbeat_at=None)
+    if count:
+        print(f"🔁 Requeued {count} interrupted processing job(s)")
+    return list(ProcessingJob.objects.filter(id__in=ids, status='queued').order_by('created_at'))
+
+
+def recover_jobs(include_failed=False):
+    """Requeue jobs whose worker died (and failed ones, if asked) and return everything still queued.
+
+    Jobs that are still running elsewhere, in another web process or a live
+    Celery worker, keep running. Analyses resume from their last checkpoint
+    (see ml.checkpoints) instead of frame zero.
+    """
+    requeue_orphaned_jobs(include_failed)
+    return list(ProcessingJob.objects.filter(status='queued').order_by('created_at'))
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide job queue, starting local workers on first use"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            config = get_queue_config()
+            if config['BACKEND'] == 'celery':
+                _job_queue = CeleryJobQueue()
+            else:
+                _job_queue = LocalJobQueue(config['WORKERS'], config['ORDERING'])
+            _job_queue.start()
+    return _job_queue
+
+
+def is_server_process(argv=None):
+    """Whether this process is serving the app (runserver or an ASGI/WSGI server)"""
+    argv = sys.argv if argv is None else argv
+    program = os.path.basename(argv[0]) if argv else ''
+    if program == 'manage.py':
+        # With the autoreloader only its child process serves requests
+        return len(argv) > 1 and argv[1] == 'runserver' and (
+            os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+        )
+    return program in SERVER_PROGRAMS
+
+
+def start_workers_with_server():
+    """Start the local workers, and with them job recovery, when the server starts (see TrapickappConfig.ready)"""
+    config = get_queue_config()
+    if config['BACKEND'] == 'local' and config['START_WITH_SERVER'] and is_server_process():
+        get_job_queue()
+
+
+def enqueue_video(video_obj, video_path, location=None, priority=0, analysis_only=False):
+    """Create a ProcessingJob for the video and hand it to the workers"""
+    # Start (and recover) the workers before adding this job so it is submitted once
+    job_queue = get_job_queue()
+    job = ProcessingJob.objects.create(
+        video_file=video_obj,
+        location=location,
+        video_path=video_path,
+        priority=priority,
+        analysis_only=analysis_only
+    )
+    video_obj.processing_status = 'queued'
+    video_obj.save(update_fields=['processing_status'])
+
+    job_queue.submit(job)
+    print(f"📥 Queued job {job.id} (priority {priority})")
+    return job
+
+
+def enqueue_once(video_obj, kind, video_path, priority=0):
+    """Queue a post-processing job (see ProcessingJob.KIND_CHOICES) unless one is already pending; returns the job"""
+    job_queue = get_job_queue()
+    job = ProcessingJob.objects.filter(video_file=video_obj, kind=kind, status__in=['queued', 'running']).first()
+    if job is not None:
+        return job
+    job = ProcessingJob.objects.create(video_file=video_obj, kind=kind, video_path=video_path, priority=priority)
+    job_queue.submit(job)
+    print(f"📥 Queued {kind} job {job.id} for {video_obj.filename}")
+    return job
+
+
+def get_job_status(video_id, kind='analysis'):
+    """Latest job of ``kind`` for a video plus its position in the queue"""
+    job = ProcessingJob.objects.filter(video_file_id=video_id, kind=kind).order_by('-created_at').first()
+    if job is None:
+        return None
+
+    data = {
+        'job_id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'priority': job.priority,
+        'analysis_only': job.analysis_only,
+        'attempts': job.attempts,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'error_message': job.error_message,
+    }
+    if job.status == 'queued':
+        ahead = ProcessingJob.objects.filter(status='queued')
+        if get_queue_config()['ORDERING'] == 'priority':
+            ahead = ahead.filter(priority__gt=job.priority) | ahead.filter(priority=job.priority, created_at__lt=job.created_at)
+        else:
+            ahead = ahead.filter(created_at__lt=job.created_at)
+        data['queue_position'] = ahead.count() + 1
+    return data
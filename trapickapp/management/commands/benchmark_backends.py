@@ -0,0 +1,58 @@
+# trapickapp/management/commands/benchmark_backends.py
+from django.core.management.base import BaseCommand, CommandError
+from ml.inference_backend import BACKENDS, backend_available
+from ml.vehicle_detector import RTXVehicleDetector
+from trapickapp.models import ProcessingProfile
+
+
+class Command(BaseCommand):
+    help = "Compare inference backends on a reference clip: frames per second and vehicle counts vs PyTorch"
+
+    def add_arguments(self, parser):
+        parser.add_argument('video', help="Reference clip")
+        parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+        parser.add_argument('--int8', action='store_true', help="Also run INT8 exports of the non-torch backends")
+        parser.add_argument('--threads', type=int, default=None, help="CPU inference threads")
+        parser.add_argument('--profile', help="ProcessingProfile name whose detector and config_parameters are used")
+
+    def handle(self, *args, **options):
+        detector_class, config = RTXVehicleDetector, {}
+        if options['profile']:
+            try:
+                profile = ProcessingProfile.objects.get(name=options['profile'])
+            except ProcessingProfile.DoesNotExist:
+                raise CommandError(f"No processing profile named '{options['profile']}'")
+            module = __import__(profile.detector_module, fromlist=[profile.detector_class])
+            detector_class, config = getattr(module, profile.detector_class), dict(profile.config_parameters)
+
+        runs = [(backend, False) for backend in options['backends']]
+        if options['int8']:
+            runs += [(backend, True) for backend in options['backends'] if backend != 'torch']
+
+        results = []
+        for backend, int8 in runs:
+            name = f"{backend}{' int8' if int8 else ''}"
+            if not backend_available(backend):
+                self.stdout.write(self.style.WARNING(f"Skipping {name}: runtime not installed"))
+                continue
+            detector = detector_class(**dict(
+                config, inference_backend=backend, int8=int8, inference_threads=options['threads'],
+                analysis_only=True
+            ))
+            # Load (and export, the first time) before timing
+            detector.shared_model
+            report = detector.analyze_video(options['video'], save_output=False)
+            frames = report['metadata']['total_frames_processed']
+            seconds = report['metadata']['processing_time']
+            results.append((name, frames / seconds if seconds > 0 else 0, report['summary']))
+
+        if not results:
+            raise CommandError("No backend could be run")
+
+        reference = next((summary for name, _, summary in results if name == 'torch'), None)
+        self.stdout.write(f"\n{'backend':<14}{'fps':>9}{'vehicles':>10}{'Δ vs torch':>12}  breakdown")
+        for name, fps, summary in results:
+            total = summary['total_vehicles_counted']
+            delta = f"{total - reference['total_vehicles_counted']:+d}" if reference else "-"
+            breakdown = ', '.join(f"{vehicle}: {count}" for vehicle, count in sorted(summary['vehicle_breakdown'].items()))
+            self.stdout.write(f"{name:<14}{fps:>9.2f}{total:>10}{delta:>12}  {breakdown}")
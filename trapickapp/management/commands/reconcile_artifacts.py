@@ -0,0 +1,22 @@
+# trapickapp/management/commands/reconcile_artifacts.py
+from django.core.management.base import BaseCommand
+from trapickapp.artifacts import reconcile_artifacts
+
+
+class Command(BaseCommand):
+    help = "Index existing processed videos and renders, and drop index entries whose files are gone"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rehash', action='store_true',
+                            help="Recompute size, codec and checksum of files that are already indexed")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+
+    def handle(self, *args, **options):
+        stats = reconcile_artifacts(rehash=options['rehash'], dry_run=options['dry_run'])
+        for path in stats['orphans']:
+            self.stdout.write(f"Unindexed file: {path}")
+        prefix = "Would index" if options['dry_run'] else "Indexed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {stats['indexed']} artifact(s) ({stats['linked']} newly linked to their upload), "
+            f"{stats['unchanged']} unchanged, {stats['removed']} missing removed, {len(stats['orphans'])} unindexed file(s)"
+        ))
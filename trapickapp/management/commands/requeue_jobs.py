@@ -0,0 +1,25 @@
+# trapickapp/management/commands/requeue_jobs.py
+from django.core.management.base import BaseCommand
+from trapickapp.jobs import recover_jobs, get_queue_config, CeleryJobQueue
+
+
+class Command(BaseCommand):
+    help = "Requeue processing jobs whose worker died (and resubmit them to Celery)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true',
+                            help="Also retry failed jobs; they resume from their last analysis checkpoint")
+
+    def handle(self, *args, **options):
+        jobs = recover_jobs(include_failed=options['failed'])
+        if get_queue_config()['BACKEND'] == 'celery':
+            celery_queue = CeleryJobQueue()
+            for job in jobs:
+                celery_queue.submit(job)
+            self.stdout.write(self.style.SUCCESS(f"Resubmitted {len(jobs)} queued job(s) to Celery"))
+        else:
+            # Running servers pick queued jobs up on their next recovery sweep, new ones when they start
+            interval = get_queue_config()['STALE_AFTER_SECONDS']
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(jobs)} job(s) queued; running servers pick them up within {interval}s"
+            ))
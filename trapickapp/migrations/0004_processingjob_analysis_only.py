@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0003_processingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='analysis_only',
+            field=models.BooleanField(default=False, help_text='Count vehicles without rendering a processed video'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0004_processingjob_analysis_only'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='detections_path',
+            field=models.CharField(blank=True, help_text='Compact per-frame detections (relative to MEDIA_ROOT) used to render the annotated video on demand', max_length=500, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-17 01:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0005_videofile_detections_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='analysis_fingerprint',
+            field=models.CharField(blank=True, help_text='Hash of the detector class and settings the video was queued with', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the uploaded file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Upload whose analysis and processed video this one reuses', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='trapickapp.videofile'),
+        ),
+    ]
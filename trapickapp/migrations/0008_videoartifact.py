@@ -0,0 +1,30 @@
+# Generated by Django 4.2.23 on 2026-10-17 01:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0007_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rendition', models.CharField(help_text="Kind of file, e.g. 'processed' or 'rendered'", max_length=50)),
+                ('path', models.CharField(db_index=True, help_text='Relative to MEDIA_ROOT', max_length=500)),
+                ('size', models.BigIntegerField()),
+                ('codec', models.CharField(blank=True, max_length=20)),
+                ('checksum', models.CharField(blank=True, help_text='SHA-256 of the file', max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('video_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artifacts', to='trapickapp.videofile')),
+            ],
+            options={
+                'unique_together': {('video_file', 'rendition')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0008_videoartifact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last sign of life from the worker', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trapickapp', '0010_processingjob_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processingjob',
+            name='kind',
+            field=models.CharField(choices=[('analysis', 'Analysis'), ('render', 'Annotated video render'), ('renditions', 'Streaming renditions')], default='analysis', max_length=20),
+        ),
+    ]
@@ -20,10 +20,15 @@ class VideoFile(models.Model):
     # Existing fields
     processed = models.BooleanField(default=False)
     processed_video_path = models.FileField(upload_to='processed_videos/', null=True, blank=True)
+    detections_path = models.CharField(
+        max_length=500, null=True, blank=True,
+        help_text="Compact per-frame detections (relative to MEDIA_ROOT) used to render the annotated video on demand"
+    )
     processing_status = models.CharField(
         max_length=50,
         choices=[
             ('pending', 'Pending'),
+            ('queued', 'Queued'),
             ('processing', 'Processing'),
             ('completed', 'Completed'),
             ('failed', 'Failed')
@@ -36,6 +41,15 @@ class VideoFile(models.Model):
     processed_at = models.DateTimeField(null=True, blank=True)
     title = models.CharField(max_length=200, null=True, blank=True)
     resolution = models.CharField(max_length=20, null=True, blank=True)
+    # Uploads with the same content and detector settings share files and analysis (see trapickapp.uploads)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the uploaded file")
+    analysis_fingerprint = models.CharField(
+        max_length=64, blank=True, help_text="Hash of the detector class and settings the video was queued with"
+    )
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates',
+        help_text="Upload whose analysis and processed video this one reuses"
+    )
 
     def __str__(self):
         date_str = self.video_date.strftime("%Y-%m-%d") if self.video_date else "Unknown Date"
@@ -112,17 +126,16 @@ class ProcessingProfile(models.Model):
     def __str__(self):
         return f"{self.display_name} ({self.get_road_type_display()})"
     
-    def get_detector_instance(self):
-        """Dynamically import and return the detector instance"""
-        try:
-            module = __import__(self.detector_module, fromlist=[self.detector_class])
-            detector_class = getattr(module, self.detector_class)
-            return detector_class(**self.config_parameters)
-        except (ImportError, AttributeError) as e:
-            print(f"Error loading detector {self.detector_class}: {e}")
-            # Fallback to default detector
-            from ml.vehicle_detector import RTXVehicleDetector
-            return RTXVehicleDetector()
+    def get_detector_instance(self, overrides=None):
+        """Dynamically import and return the detector instance.
+
+        Errors are raised rather than replaced by a default detector: the
+        analysis fingerprint records this profile's settings, so results from
+        any other detector would be filed under the wrong configuration.
+        """
+        module = __import__(self.detector_module, fromlist=[self.detector_class])
+        detector_class = getattr(module, self.detector_class)
+        return detector_class(**dict(self.config_parameters, **(overrides or {})))
 
 class Location(models.Model):
     name = models.CharField(max_length=100)
@@ -147,10 +160,16 @@ class Location(models.Model):
     def __str__(self):
         return f"{self.display_name} ({self.processing_profile.display_name})"
 
+    def get_detector_overrides(self):
+        """Detector kwargs this location adds to its profile (counting zones and lines)"""
+        from ml.counting_zones import counting_geometry_config
+        counting_zones = counting_geometry_config(self.detection_config)
+        return {'counting_zones': counting_zones} if counting_zones else {}
+
     def get_detector_class(self):
         """Return the appropriate detector instance for this location"""
         from ml.detector_factory import DetectorFactory
-        return DetectorFactory.get_detector(self.processing_profile)
+        return DetectorFactory.get_detector(self.processing_profile, self.get_detector_overrides())
 
 class TrafficAnalysis(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -428,6 +447,111 @@ class TrafficPrediction(models.Model):
     def __str__(self):
         return f"{self.prediction_date} {self.hour_of_day:02d}:00 → {self.predicted_congestion}"
 
+class ProcessingJob(models.Model):
+    """A video waiting for, or going through, analysis (or post-processing) by a worker"""
+    KIND_CHOICES = [
+        ('analysis', 'Analysis'),
+        ('render', 'Annotated video render'),
+        ('renditions', 'Streaming renditions'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    video_file = models.ForeignKey(VideoFile, on_delete=models.CASCADE, related_name='processing_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='analysis')
+    location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True)
+    video_path = models.CharField(max_length=500)
+    priority = models.IntegerField(default=0, help_text="Higher runs first when the queue uses priority ordering")
+    analysis_only = models.BooleanField(default=False, help_text="Count vehicles without rendering a processed video")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last sign of life from the worker")
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'priority', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} job for {self.video_file.filename} - {self.status}"
+
+class UploadSession(models.Model):
+    """A resumable chunked upload, written in place at ``file_path`` (see trapickapp.uploads)"""
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500, help_text="Storage name the chunks are written into")
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True)
+    title = models.CharField(max_length=200, null=True, blank=True)
+    video_date = models.DateField(null=True, blank=True)
+    video_start_time = models.TimeField(null=True, blank=True)
+    video_end_time = models.TimeField(null=True, blank=True)
+    priority = models.IntegerField(default=0)
+    analysis_only = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    video_file = models.ForeignKey(
+        VideoFile, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_sessions'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_range(self, index):
+        """(offset, length) of chunk ``index`` in the file"""
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.size - offset)
+
+    def __str__(self):
+        return f"Upload of {self.filename} - {self.status}"
+
+class UploadChunk(models.Model):
+    """A chunk of an UploadSession that arrived with a matching checksum"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    sha256 = models.CharField(max_length=64)
+    received_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['session', 'index']
+
+class VideoArtifact(models.Model):
+    """A file derived from an upload (processed video, cached render, ...), see trapickapp.artifacts"""
+    video_file = models.ForeignKey(VideoFile, on_delete=models.CASCADE, related_name='artifacts')
+    rendition = models.CharField(max_length=50, help_text="Kind of file, e.g. 'processed' or 'rendered'")
+    path = models.CharField(max_length=500, db_index=True, help_text="Relative to MEDIA_ROOT")
+    size = models.BigIntegerField()
+    codec = models.CharField(max_length=20, blank=True)
+    checksum = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the file")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['video_file', 'rendition']
+
+    def __str__(self):
+        return f"{self.rendition} of {self.video_file_id}: {self.path}"
+
 class SystemConfig(models.Model):
     key = models.CharField(max_length=100, unique=True)
     value = models.JSONField(default=dict)
@@ -0,0 +1,211 @@
+# trapickapp/processing.py
+from django.utils import timezone
+from .models import VideoFile, TrafficAnalysis, Location
+from .progress import ProgressTracker
+from .rendering import get_render_settings
+from .artifacts import record_artifact, relative_media_path, PROCESSED
+from .renditions import queue_renditions_after_analysis
+
+
+def process_video_with_location_profile(video_id, video_path, location_id, progress_tracker, save_output=True):
+    """Process video using location-specific detector (runs inside a job worker)"""
+    from ml.detector_factory import DetectorFactory
+
+    print("🔄 STARTING BACKGROUND PROCESSING")
+    print(f"   - Video ID: {video_id}")
+    print(f"   - Video Path: {video_path}")
+    print(f"   - Location ID: {location_id}")
+
+    try:
+        video_obj = VideoFile.objects.get(id=video_id)
+        location = Location.objects.get(id=location_id)
+
+        print(f"📍 LOCATION DETAILS:")
+        print(f"   - Name: {location.display_name}")
+        print(f"   - Profile: {location.processing_profile.display_name}")
+
+        video_obj.processing_status = 'processing'
+        video_obj.save()
+
+        print("🔧 TESTING DETECTOR CREATION...")
+        detector = DetectorFactory.get_detector(location.processing_profile, location.get_detector_overrides())
+        print(f"✅ DETECTOR CREATED: {type(detector).__name__}")
+
+        progress_tracker.set_progress(20, f"Starting {location.processing_profile.display_name}...")
+
+        # Analyze video with progress tracking (no rendered video for analysis-only jobs)
+        print(f"🎯 Starting video analysis with {type(detector).__name__}...")
+        # With on-demand rendering the annotated video is drawn from stored detections when first viewed
+        if get_render_settings()['ON_DEMAND']:
+            save_output = False
+        report = detector.analyze_video(video_path, progress_tracker, save_output=save_output)
+
+        # Check if this is Baliwasan report
+        if 'baliwasan_specific' in report:
+            print("✅ BALIWASAN Y-JUNCTION ANALYSIS COMPLETED!")
+            print(f"   - Total vehicles: {report['summary']['total_vehicles_counted']}")
+        else:
+            print("ℹ️  Generic analysis completed")
+
+        progress_tracker.set_progress(95, "Saving location-optimized results...")
+
+        # Create TrafficAnalysis record
+        analysis = TrafficAnalysis.objects.create(
+            video_file=video_obj,
+            location=location,
+            total_vehicles=report['summary']['total_vehicles_counted'],
+            processing_time_seconds=report['metadata']['processing_time'],
+            car_count=report['summary']['vehicle_breakdown'].get('car', 0),
+            truck_count=report['summary']['vehicle_breakdown'].get('truck', 0),
+            motorcycle_count=report['summary']['vehicle_breakdown'].get('motorcycle', 0),
+            bus_count=report['summary']['vehicle_breakdown'].get('bus', 0),
+            bicycle_count=report['summary']['vehicle_breakdown'].get('bicycle', 0),
+            peak_traffic=report['summary']['peak_traffic'],
+            average_traffic=report['summary']['average_traffic_density'],
+            congestion_level=report['metrics']['congestion_level'],
+            traffic_pattern=report['metrics']['traffic_pattern'],
+            analysis_data=report,
+            metrics_summary={
+                'processing_profile': location.processing_profile.name,
+                'location_name': location.display_name,
+                'detector_type': location.processing_profile.display_name,
+                'detector_class': type(detector).__name__,
+                'frame_skipping': report.get('performance', {}).get('frame_skipping')
+            }
+        )
+
+        # ✅ CRITICAL: Save processed video path to database
+        if 'output_video_path' in report and report['output_video_path']:
+            # Convert absolute path to relative path for Django
+            relative_path = relative_media_path(report['output_video_path'])
+            video_obj.processed_video_path = relative_path
+            video_obj.save()
+            record_artifact(video_obj, report['output_video_path'], PROCESSED)
+            print(f"✅ Saved processed video path to database: {relative_path}")
+        elif report.get('detections_path'):
+            print("ℹ️  No rendered video yet - it will be rendered from stored detections on first view")
+        else:
+            print("⚠️  No output_video_path in report - video may not be saved")
+
+        if report.get('detections_path'):
+            video_obj.detections_path = relative_media_path(report['detections_path'])
+
+        # Update video status
+        video_obj.processing_status = 'completed'
+        video_obj.processed = True
+        video_obj.processed_at = timezone.now()
+        video_obj.save()
+
+        progress_tracker.set_progress(100, f"{location.processing_profile.display_name} completed successfully!")
+        progress_tracker.complete_processing("Video analysis completed!")
+
+        print(f"✅ Location-based processing completed for {video_obj.filename}")
+        print(f"✅ Detector used: {type(detector).__name__}")
+        print(f"✅ Total vehicles counted: {analysis.total_vehicles}")
+
+        # Post-processing: streaming renditions as their own job, once the results are visible
+        if report.get('output_video_path') or report.get('detections_path'):
+            queue_renditions_after_analysis(video_obj)
+        return analysis
+
+    except Exception as e:
+        print(f"❌ Location-based processing failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+        # Update progress with error
+        try:
+            progress_tracker.set_progress(0, f"Processing failed: {str(e)}")
+            video_obj = VideoFile.objects.get(id=video_id)
+            video_obj.processing_status = 'failed'
+            video_obj.save()
+        except:
+            pass
+        # Let the job runner record the failure
+        raise
+
+
+def process_video_background(video_id, video_path, location_id=None, save_output=True):
+    """Process video with the default detector when no location profile applies"""
+    progress_tracker = ProgressTracker(str(video_id))
+    output_video_path = None
+
+    try:
+        video_obj = VideoFile.objects.get(id=video_id)
+        video_obj.processing_status = 'processing'
+        video_obj.save()
+
+        progress_tracker.set_progress(0, "Starting video analysis...")
+
+        # Analyze video with progress tracking
+        from ml.vehicle_detector import RTXVehicleDetector
+        detector = RTXVehicleDetector()
+        # With on-demand rendering the annotated video is drawn from stored detections when first viewed
+        if get_render_settings()['ON_DEMAND']:
+            save_output = False
+        report = detector.analyze_video(video_path, progress_tracker, save_output=save_output)
+
+        progress_tracker.set_progress(95, "Saving results to database...")
+
+        # Get location if provided
+        location = None
+        if location_id:
+            try:
+                location = Location.objects.get(id=location_id)
+            except Location.DoesNotExist:
+                pass
+
+        # Create TrafficAnalysis record
+        analysis = TrafficAnalysis.objects.create(
+            video_file=video_obj,
+            location=location,
+            total_vehicles=report['summary']['total_vehicles_counted'],
+            processing_time_seconds=report['metadata']['processing_time'],
+            car_count=report['summary']['vehicle_breakdown'].get('car', 0),
+            truck_count=report['summary']['vehicle_breakdown'].get('truck', 0),
+            motorcycle_count=report['summary']['vehicle_breakdown'].get('motorcycle', 0),
+            bus_count=report['summary']['vehicle_breakdown'].get('bus', 0),
+            bicycle_count=report['summary']['vehicle_breakdown'].get('bicycle', 0),
+            peak_traffic=report['summary']['peak_traffic'],
+            average_traffic=report['summary']['average_traffic_density'],
+            congestion_level=report['metrics']['congestion_level'],
+            traffic_pattern=report['metrics']['traffic_pattern'],
+            analysis_data=report
+        )
+
+        # Save processed video path if available
+        if 'output_video_path' in report and report['output_video_path']:
+            # Convert absolute path to relative path for Django
+            relative_path = relative_media_path(report['output_video_path'])
+            video_obj.processed_video_path = relative_path
+            output_video_path = report['output_video_path']
+            print(f"✓ Saved processed video path: {relative_path}")
+        if report.get('detections_path'):
+            video_obj.detections_path = relative_media_path(report['detections_path'])
+
+        # Update video status
+        video_obj.processing_status = 'completed'
+        video_obj.processed = True
+        video_obj.save()
+        if report.get('output_video_path'):
+            record_artifact(video_obj, report['output_video_path'], PROCESSED)
+
+        progress_tracker.set_progress(100, "Analysis completed successfully!")
+
+        print(f"✓ Video processing completed: {video_obj.filename}")
+        if output_video_path:
+            print(f"✓ Processed video available at: {output_video_path}")
+        if output_video_path or report.get('detections_path'):
+            queue_renditions_after_analysis(video_obj)
+        return analysis
+
+    except Exception as e:
+        print(f"✗ Video processing failed: {e}")
+        progress_tracker.set_progress(0, f"Processing failed: {str(e)}")
+        video_obj = VideoFile.objects.get(id=video_id)
+        video_obj.processing_status = 'failed'
+        video_obj.save()
+        raise
+    finally:
+        # Progress is dropped 5 minutes from now instead of by a sleeping thread
+        progress_tracker.expire_after(300)
@@ -61,12 +61,28 @@ class ProgressTracker:
         """Get current progress"""
         data = progress_store.get(self.video_id)
         if data:
-            # Check if data is older than 10 minutes
-            if time.time() - data['timestamp'] > 600:
+            # Check if data is older than 10 minutes or past its expiry
+            if time.time() - data['timestamp'] > 600 or time.time() > data.get('expires_at', float('inf')):
+                progress_store.pop(self.video_id, None)
                 return None
             return data
         return None
     
+    def expire_after(self, seconds):
+        """Drop progress data after ``seconds`` without keeping a thread alive"""
+        data = progress_store.get(self.video_id)
+        if data:
+            data['expires_at'] = time.time() + seconds
+        _prune_expired()
+    
     def clear_progress(self):
         """Clear progress data"""
-        progress_store.pop(self.video_id, None)
\ No newline at end of file
+        progress_store.pop(self.video_id, None)
+
+
+def _prune_expired():
+    """Remove expired entries so finished videos don't linger in memory"""
+    now = time.time()
+    for video_id, data in list(progress_store.items()):
+        if now - data['timestamp'] > 600 or now > data.get('expires_at', float('inf')):
+            progress_store.pop(video_id, None)
@@ -0,0 +1,149 @@
+# trapickapp/rendering.py
+import os
+import threading
+import time
+from django.conf import settings
+from .artifacts import record_artifact, forget_artifact, RENDERED
+from .jobs import enqueue_once
+
+DEFAULT_RENDER_SETTINGS = {
+    'ON_DEMAND': True,                  # render annotated videos on first view instead of during analysis
+    'CACHE_DIR': 'rendered_videos',     # relative to MEDIA_ROOT
+    'CACHE_MAX_MB': 2048,               # least recently viewed renders are evicted above this
+}
+
+_render_locks = {}
+_render_locks_lock = threading.Lock()
+
+
+def get_render_settings():
+    config = dict(DEFAULT_RENDER_SETTINGS)
+    config.update(getattr(settings, 'TRAPICK_RENDER', {}))
+    return config
+
+
+def media_path(relative_path):
+    return os.path.join(settings.MEDIA_ROOT, relative_path)
+
+
+class RenderCache:
+    """Disk cache of annotated videos rendered from stored detections.
+
+    File access times double as the LRU clock: a cache hit touches the
+    file's atime, and eviction removes the least recently used files once
+    the cache is over its size cap. Modification times stay the render time,
+    so ETag/Last-Modified of a cached render are stable.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path_for(self, video_obj):
+        # Duplicate uploads share the render of the upload they reuse
+        return os.path.join(self.cache_dir, f"{video_obj.duplicate_of_id or video_obj.id}.mp4")
+
+    def get(self, video_obj):
+        path = self.path_for(video_obj)
+        if os.path.exists(path):
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+            return path
+        return None
+
+    def get_or_render(self, video_obj, progress_tracker=None):
+        """Return the cached render for the video, rendering it first if needed (in a job worker, see render_video)"""
+        from ml.detection_store import render_annotated_video
+
+        path = self.get(video_obj)
+        if path:
+            print(f"✓ Render cache hit: {path}")
+            return path
+
+        with _render_locks_lock:
+            lock = _render_locks.setdefault(str(video_obj.id), threading.Lock())
+
+        # Concurrent requests for the same video wait for one render
+        with lock:
+            path = self.get(video_obj)
+            if path:
+                return path
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.path_for(video_obj)
+            partial_path = path.replace('.mp4', '.partial.mp4')
+            print(f"🎬 Rendering annotated video on demand: {video_obj.filename}")
+            try:
+                render_annotated_video(
+                    video_obj.file_path.path, media_path(video_obj.detections_path), partial_path, progress_tracker
+                )
+                os.replace(partial_path, path)
+                record_artifact(video_obj, path, RENDERED)
+            finally:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Delete least recently used renders until the cache fits its cap"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.mp4') or filename.endswith('.partial.mp4'):
+                continue
+            file_path = os.path.join(self.cache_dir, filename)
+            stat = os.stat(file_path)
+            entries.append((stat.st_atime, stat.st_size, file_path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if file_path == keep:
+                continue
+            os.remove(file_path)
+            forget_artifact(file_path)
+            total -= size
+            print(f"♻️ Evicted rendered video: {file_path}")
+
+
+def get_render_cache():
+    config = get_render_settings()
+    return RenderCache(media_path(config['CACHE_DIR']), int(config['CACHE_MAX_MB'] * 1024 * 1024))
+
+
+def has_stored_detections(video_obj):
+    return bool(video_obj.detections_path) and os.path.exists(media_path(video_obj.detections_path))
+
+
+def get_rendered_video_path(video_obj):
+    """Path of the cached render of ``video_obj``, or None when it has not been rendered yet"""
+    return get_render_cache().get(video_obj)
+
+
+def render_video(video_obj, progress_tracker=None):
+    """Render the annotated video of ``video_obj`` from its stored detections (runs in a job worker)"""
+    if not has_stored_detections(video_obj):
+        raise RuntimeError(f"No stored detections to render {video_obj.filename} from")
+    try:
+        path = get_render_cache().get_or_render(video_obj, progress_tracker)
+        if progress_tracker:
+            progress_tracker.set_progress(100, "Annotated video ready")
+        return path
+    finally:
+        if progress_tracker:
+            progress_tracker.expire_after(300)
+
+
+def queue_render(video_obj):
+    """Queue the on-demand render of ``video_obj`` (once per upload it shares); None if it has nothing to render.
+
+    Rendering a long video takes about as long as playing it, so requests
+    only queue it and report progress instead of rendering inline.
+    """
+    owner = video_obj.duplicate_of or video_obj
+    if not has_stored_detections(owner):
+        return None
+    return enqueue_once(owner, 'render', owner.file_path.path)
@@ -0,0 +1,275 @@
+# trapickapp/renditions.py
+import os
+import shutil
+import subprocess
+from django.conf import settings
+from .artifacts import record_artifact, artifact_path, find_processed_video, owner_id
+from .jobs import enqueue_once
+from .rendering import media_path, render_video
+
+try:
+    import imageio_ffmpeg
+    IMAGEIO_FFMPEG_AVAILABLE = True
+except ImportError:
+    IMAGEIO_FFMPEG_AVAILABLE = False
+
+DEFAULT_RENDITION_SETTINGS = {
+    'FORMATS': ['hls'],                 # 'hls' and/or 'dash'
+    'HEIGHTS': [360, 720, 1080],        # ladder; heights above the source are skipped
+    'SEGMENT_SECONDS': 4,
+    'PRESET': 'veryfast',               # libx264 preset
+    'AFTER_ANALYSIS': True,             # queue a build after an analysis that wrote a processed video or detections
+    'THUMBNAILS': 20,                   # frames in the poster thumbnail strip
+    'THUMBNAIL_WIDTH': 160,
+    'OUTPUT_DIR': 'streams',            # relative to MEDIA_ROOT
+    'FFMPEG_BINARY': None,              # default: ffmpeg on PATH, then imageio-ffmpeg's bundled binary
+}
+
+# Target bitrates of the H.264 ladder, in kbit/s
+LADDER_BITRATES = {240: 400, 360: 800, 480: 1400, 720: 2800, 1080: 5000, 1440: 8000, 2160: 14000}
+
+# Renditions in the artifact index (see trapickapp.artifacts)
+HLS = 'hls'
+DASH = 'dash'
+POSTER = 'poster'
+THUMBNAILS = 'thumbnails'
+
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.mpd': 'application/dash+xml',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+    '.jpg': 'image/jpeg',
+    '.vtt': 'text/vtt',
+}
+
+def get_rendition_settings():
+    config = dict(DEFAULT_RENDITION_SETTINGS)
+    config.update(getattr(settings, 'TRAPICK_RENDITIONS', {}))
+    return config
+
+
+def find_ffmpeg(config=None):
+    """Path of an ffmpeg binary, or None when none is installed"""
+    config = config or get_rendition_settings()
+    if config['FFMPEG_BINARY']:
+        return config['FFMPEG_BINARY']
+    binary = shutil.which('ffmpeg')
+    if binary is None and IMAGEIO_FFMPEG_AVAILABLE:
+        binary = imageio_ffmpeg.get_ffmpeg_exe()
+    return binary
+
+
+def stream_dir(video_obj, config=None):
+    config = config or get_rendition_settings()
+    return media_path(os.path.join(config['OUTPUT_DIR'], str(owner_id(video_obj))))
+
+
+def ladder(source_height, heights):
+    """Rendition heights (even, at most the source's) with their bitrates, smallest first"""
+    picked = sorted({h - h % 2 for h in heights if h <= source_height}) or [source_height - source_height % 2]
+    return [(height, min(LADDER_BITRATES.items(), key=lambda item: abs(item[0] - height))[1]) for height in picked]
+
+
+def _encoding_args(rungs, fps, segment_seconds, preset):
+    """filter_complex splitting the source into one scaled H.264 stream per rung"""
+    labels = ''.join(f'[v{i}]' for i in range(len(rungs)))
+    filters = [f'[0:v]split={len(rungs)}{labels}'] + [
+        f'[v{i}]scale=-2:{height}[o{i}]' for i, (height, _) in enumerate(rungs)
+    ]
+    # Keyframes on segment boundaries so every rendition switches cleanly
+    gop = max(1, round(fps * segment_seconds))
+    args = ['-filter_complex', ';'.join(filters)]
+    for i, (_, kbps) in enumerate(rungs):
+        args += [
+            '-map', f'[o{i}]', f'-c:v:{i}', 'libx264', f'-b:v:{i}', f'{kbps}k',
+            f'-maxrate:v:{i}', f'{int(kbps * 1.07)}k', f'-bufsize:v:{i}', f'{int(kbps * 1.5)}k'
+        ]
+    return args + [
+        '-preset', preset, '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0', '-an'
+    ]
+
+
+def _hls_args(rungs, output_dir, segment_seconds):
+    stream_map = ' '.join(f'v:{i},name:{height}p' for i, (height, _) in enumerate(rungs))
+    return [
+        '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments', '-hls_segment_type', 'mpegts',
+        '-hls_segment_filename', os.path.join(output_dir, 'hls', '%v', 'segment_%05d.ts'),
+        '-master_pl_name', 'master.m3u8', '-var_stream_map', stream_map,
+        os.path.join(output_dir, 'hls', '%v', 'index.m3u8')
+    ]
+
+
+def _dash_args(output_dir, segment_seconds):
+    return [
+        '-f', 'dash', '-seg_duration', str(segment_seconds), '-use_template', '1', '-use_timeline', '1',
+        '-adaptation_sets', 'id=0,streams=v',
+        '-init_seg_name', 'init_$RepresentationID$.m4s',
+        '-media_seg_name', 'chunk_$RepresentationID$_$Number%05d$.m4s',
+        os.path.join(output_dir, 'dash', 'manifest.mpd')
+    ]
+
+
+def write_thumbnails(source_path, output_dir, count, width):
+    """Poster frame plus a horizontal strip of ``count`` evenly spaced frames with a WebVTT index"""
+    import cv2
+
+    cap = cv2.VideoCapture(source_path)
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        count = max(1, min(count, total))
+        poster = None
+        tiles = []
+        for i in range(count):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(i * total / count))
+            ok, frame = cap.read()
+            if not ok:
+                break
+            # A frame a little into the video makes a better poster than the first one
+            if poster is None or i == count // 10:
+                poster = frame
+            height = round(frame.shape[0] * width / frame.shape[1])
+            tiles.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+    finally:
+        cap.release()
+    if not tiles:
+        return False
+
+    cv2.imwrite(os.path.join(output_dir, 'poster.jpg'), poster, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    cv2.imwrite(os.path.join(output_dir, 'thumbnails.jpg'), cv2.hconcat(tiles), [cv2.IMWRITE_JPEG_QUALITY, 75])
+    step = total / count / fps
+    height = tiles[0].shape[0]
+
+    def timestamp(seconds):
+        return f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{seconds % 60:06.3f}"
+
+    with open(os.path.join(output_dir, 'thumbnails.vtt'), 'w') as f:
+        f.write('WEBVTT\n\n')
+        for i in range(len(tiles)):
+            end = total / fps if i == len(tiles) - 1 else (i + 1) * step
+            f.write(f"{timestamp(i * step)} --> {timestamp(end)}\nthumbnails.jpg#xywh={i * width},0,{width},{height}\n\n")
+    return True
+
+
+def build_renditions(video_obj, source_path):
+    """Encode ``source_path`` into the configured HLS/DASH ladders and thumbnails, and index them.
+
+    Everything is written to a temporary directory first, so a stream
+    directory is either complete or absent.
+    """
+    import cv2
+
+    config = get_rendition_settings()
+    ffmpeg = find_ffmpeg(config)
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is not installed (install it, or pip install imageio-ffmpeg)")
+
+    cap = cv2.VideoCapture(source_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    source_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    if source_height <= 0:
+        raise RuntimeError(f"cannot read video: {source_path}")
+
+    rungs = ladder(source_height, config['HEIGHTS'])
+    segment_seconds = config['SEGMENT_SECONDS']
+    output_dir = stream_dir(video_obj, config)
+    partial_dir = f"{output_dir}.partial"
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    os.makedirs(partial_dir)
+    print(f"🎞️ Building {', '.join(config['FORMATS'])} renditions ({', '.join(f'{h}p' for h, _ in rungs)}) "
+          f"for {video_obj.filename}")
+
+    try:
+        encoding = _encoding_args(rungs, fps, segment_seconds, config['PRESET'])
+        for output_format in config['FORMATS']:
+            if output_format == HLS:
+                for height, _ in rungs:
+                    os.makedirs(os.path.join(partial_dir, 'hls', f'{height}p'))
+                outputs = _hls_args(rungs, partial_dir, segment_seconds)
+            elif output_format == DASH:
+                os.makedirs(os.path.join(partial_dir, 'dash'))
+                outputs = _dash_args(partial_dir, segment_seconds)
+            else:
+                raise ValueError(f"unknown stream format '{output_format}' (use 'hls' or 'dash')")
+            command = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-y', '-i', source_path] + encoding + outputs
+            result = subprocess.run(command, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"ffmpeg {output_format} failed: {result.stderr.strip()[-500:]}")
+        has_thumbnails = write_thumbnails(source_path, partial_dir, config['THUMBNAILS'], config['THUMBNAIL_WIDTH'])
+
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.replace(partial_dir, output_dir)
+    finally:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+
+    if HLS in config['FORMATS']:
+        record_artifact(video_obj, os.path.join(output_dir, 'hls', 'master.m3u8'), HLS, codec='avc1')
+    if DASH in config['FORMATS']:
+        record_artifact(video_obj, os.path.join(output_dir, 'dash', 'manifest.mpd'), DASH, codec='avc1')
+    if has_thumbnails:
+        record_artifact(video_obj, os.path.join(output_dir, 'poster.jpg'), POSTER, codec='')
+        record_artifact(video_obj, os.path.join(output_dir, 'thumbnails.jpg'), THUMBNAILS, codec='')
+    print(f"✅ Renditions ready: {output_dir}")
+    return output_dir
+
+
+def source_video_path(video_obj):
+    """Annotated video to encode, rendering it from stored detections when there is none yet"""
+    if video_obj.processed_video_path and os.path.exists(video_obj.processed_video_path.path):
+        return video_obj.processed_video_path.path
+    return find_processed_video(video_obj) or render_video(video_obj)
+
+
+def build_renditions_for_job(video_obj, progress_tracker=None):
+    """Job handler for 'renditions' jobs (see trapickapp.jobs)"""
+    try:
+        if progress_tracker:
+            progress_tracker.set_progress(5, "Preparing the annotated video...")
+        source_path = source_video_path(video_obj)
+        if progress_tracker:
+            progress_tracker.set_progress(20, "Encoding streaming renditions...")
+        output_dir = build_renditions(video_obj, source_path)
+        if progress_tracker:
+            progress_tracker.set_progress(100, "Streaming renditions ready")
+        return output_dir
+    finally:
+        if progress_tracker:
+            progress_tracker.expire_after(300)
+
+
+def queue_renditions(video_obj, priority=0):
+    """Queue a rendition build for ``video_obj`` (once per upload it shares) and return the job"""
+    owner = video_obj.duplicate_of or video_obj
+    return enqueue_once(owner, 'renditions', owner.file_path.path, priority=priority)
+
+
+def queue_renditions_after_analysis(video_obj):
+    """Post-processing of an analysis that wrote a processed video or stored detections (the job
+    renders the video from them first): a separate, low-priority job, so the worker moves on to
+    the next upload instead of encoding the ladder first"""
+    config = get_rendition_settings()
+    if not config['AFTER_ANALYSIS']:
+        return None
+    if find_ffmpeg(config) is None:
+        print("ℹ️  ffmpeg not installed - skipping streaming renditions")
+        return None
+    return queue_renditions(video_obj, priority=-1)
+
+
+def renditions_ready(video_obj):
+    config = get_rendition_settings()
+    return all(artifact_path(video_obj, output_format) for output_format in config['FORMATS'])
+
+
+def stream_file_path(video_obj, name):
+    """Absolute path of a file inside the video's stream directory, or None if it escapes it or is missing"""
+    root = os.path.realpath(stream_dir(video_obj))
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
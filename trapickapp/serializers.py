@@ -34,6 +34,24 @@ class LocationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
 
+    def validate_detection_config(self, value):
+        """Reject counting zones / lines the detectors could not build"""
+        from ml.counting_zones import CountingGeometry, counting_geometry_config
+        config = counting_geometry_config(value)
+        if config is None:
+            return value
+        try:
+            if config.get('units', 'fraction') not in ('fraction', 'pixels'):
+                raise ValueError("units must be 'fraction' or 'pixels'")
+            if any(len(zone['polygon']) < 3 for zone in config.get('zones', [])):
+                raise ValueError("each zone polygon needs at least 3 points")
+            if any(len(line['points']) < 2 for line in config.get('count_lines', [])):
+                raise ValueError("each count line needs at least 2 points")
+            CountingGeometry.from_config(config).bind(64, 64)
+        except (KeyError, TypeError, ValueError) as e:
+            raise serializers.ValidationError(f"Invalid counting zones: {e}")
+        return value
+
 class VideoFileSerializer(serializers.ModelSerializer):
     video_date_display = serializers.SerializerMethodField()
     time_range = serializers.SerializerMethodField()
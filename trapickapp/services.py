@@ -2,27 +2,25 @@
 from django.db.models import Count, Avg, Max, Min, Q, F
 from django.utils import timezone
 from datetime import timedelta, datetime
-from .models import TrafficAnalysis, Detection, VideoFile, HourlyTrafficSummary, DailyTrafficSummary, TrafficPrediction
+from .models import TrafficAnalysis, Detection, HourlyTrafficSummary, DailyTrafficSummary, TrafficPrediction
+from .aggregations import (
+    daily_vehicle_totals, daily_vehicle_counts, daily_detection_counts, empty_vehicle_counts,
+    detections_per_hour, busiest_hour_of_day, detections_per_day_and_hour, system_counts
+)
 
 def calculate_real_weekly_data():
     """Calculate actual weekly vehicle counts from TrafficAnalysis"""
     try:
         one_week_ago = timezone.now() - timedelta(days=7)
         
-        # Get analyses from last 7 days
-        recent_analyses = TrafficAnalysis.objects.filter(analyzed_at__gte=one_week_ago)
+        # Sum vehicles per day in the database
+        daily_totals = daily_vehicle_totals(one_week_ago)
         
-        if not recent_analyses.exists():
+        if not daily_totals:
             print("No recent analyses found for weekly data")
             return [0, 0, 0, 0, 0, 0, 0]  # Return zeros for frontend
         
-        # Group by day and sum vehicles
-        daily_data = []
-        for i in range(7):
-            day = one_week_ago + timedelta(days=i)
-            day_analyses = recent_analyses.filter(analyzed_at__date=day)
-            total_vehicles = sum(analysis.total_vehicles for analysis in day_analyses)
-            daily_data.append(total_vehicles)
+        daily_data = [daily_totals.get(timezone.localdate(one_week_ago + timedelta(days=i)), 0) for i in range(7)]
         
         print(f"Weekly data calculated: {daily_data}")
         return daily_data
@@ -32,53 +30,27 @@ def calculate_real_weekly_data():
         return [0, 0, 0, 0, 0, 0, 0]
 
 def calculate_real_vehicle_stats():
-    """Calculate actual vehicle statistics from Detection model"""
+    """Calculate actual vehicle statistics from TrafficAnalysis (Detection rows as a fallback)"""
     try:
         today = timezone.now().date()
         yesterday = today - timedelta(days=1)
         
-        def get_daily_counts(date):
-            """Get vehicle counts for a specific date"""
-            try:
-                # Try to get from TrafficAnalysis first (more reliable)
-                analyses = TrafficAnalysis.objects.filter(analyzed_at__date=date)
-                if analyses.exists():
-                    return {
-                        'cars': sum(a.car_count for a in analyses),
-                        'trucks': sum(a.truck_count for a in analyses),
-                        'buses': sum(a.bus_count for a in analyses),
-                        'motorcycles': sum(a.motorcycle_count for a in analyses),
-                        'bicycles': sum(a.bicycle_count for a in analyses),
-                        'others': sum(a.other_count for a in analyses)
-                    }
-                
-                # Fallback to Detection model
-                detections = Detection.objects.filter(timestamp__date=date)
-                return {
-                    'cars': detections.filter(vehicle_type__name='car').count(),
-                    'trucks': detections.filter(vehicle_type__name='truck').count(),
-                    'buses': detections.filter(vehicle_type__name='bus').count(),
-                    'motorcycles': detections.filter(vehicle_type__name='motorcycle').count(),
-                    'bicycles': detections.filter(vehicle_type__name='bicycle').count(),
-                    'others': detections.filter(vehicle_type__name='other').count()
-                }
-            except Exception as e:
-                print(f"Error getting daily counts for {date}: {e}")
-                return {'cars': 0, 'trucks': 0, 'buses': 0, 'motorcycles': 0, 'bicycles': 0, 'others': 0}
-        
-        today_data = get_daily_counts(today)
-        yesterday_data = get_daily_counts(yesterday)
+        # TrafficAnalysis is more reliable; Detection rows only fill in days without analyses
+        daily_counts = daily_vehicle_counts([today, yesterday])
+        missing_days = [date for date in (today, yesterday) if date not in daily_counts]
+        if missing_days:
+            daily_counts.update(daily_detection_counts(missing_days))
         
         return {
-            'today': today_data,
-            'yesterday': yesterday_data
+            'today': daily_counts.get(today, empty_vehicle_counts()),
+            'yesterday': daily_counts.get(yesterday, empty_vehicle_counts())
         }
         
     except Exception as e:
         print(f"Error calculating vehicle stats: {e}")
         return {
-            'today': {'cars': 0, 'trucks': 0, 'buses': 0, 'motorcycles': 0, 'bicycles': 0, 'others': 0},
-            'yesterday': {'cars': 0, 'trucks': 0, 'buses': 0, 'motorcycles': 0, 'bicycles': 0, 'others': 0}
+            'today': empty_vehicle_counts(),
+            'yesterday': empty_vehicle_counts()
         }
 
 def calculate_real_congestion_data():
@@ -86,7 +58,7 @@ def calculate_real_congestion_data():
     # Get recent analyses with locations
     recent_analyses = TrafficAnalysis.objects.filter(
         location__isnull=False
-    ).select_related('location').order_by('-analyzed_at')[:10]
+    ).select_related('location', 'video_file').order_by('-analyzed_at')[:10]
     
     if not recent_analyses.exists():
         return []  # Return empty instead of fake data
@@ -126,46 +98,24 @@ def calculate_real_congestion_data():
     return congestion_data
 
 def calculate_hourly_traffic_summary():
-    """Calculate hourly traffic patterns for today - SQLite compatible"""
+    """Calculate hourly traffic patterns for today"""
     today = timezone.now().date()
     today_start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
     today_end = today_start + timedelta(days=1)
     
-    # Get all detections for today
-    detections = Detection.objects.filter(timestamp__range=(today_start, today_end))
-    
-    # Manual grouping by hour for SQLite compatibility
-    hourly_counts = {}
-    for detection in detections:
-        hour = detection.timestamp.hour
-        hourly_counts[hour] = hourly_counts.get(hour, 0) + 1
-    
     # Convert to format expected by frontend
-    hourly_summary = {f"{hour:02d}:00": count for hour, count in sorted(hourly_counts.items())}
-    
-    return hourly_summary
+    return {
+        f"{timezone.localtime(hour).hour:02d}:00": count
+        for hour, count in detections_per_hour(today_start, today_end)
+    }
 
 def get_system_overview_stats():
     """Get real system overview statistics"""
-    total_videos = VideoFile.objects.count()
-    processed_videos = VideoFile.objects.filter(processed=True).count()
-    total_analyses = TrafficAnalysis.objects.count()
-    total_detections = Detection.objects.count()
-    
-    # Recent activity (last 24 hours)
     one_day_ago = timezone.now() - timedelta(hours=24)
-    recent_analyses = TrafficAnalysis.objects.filter(analyzed_at__gte=one_day_ago)
-    recent_detections = Detection.objects.filter(timestamp__gte=one_day_ago)
-    
-    return {
-        'total_videos': total_videos,
-        'processed_videos': processed_videos,
-        'total_analyses': total_analyses,
-        'total_detections': total_detections,
-        'recent_analyses_count': recent_analyses.count(),
-        'recent_detections_count': recent_detections.count(),
-        'processing_success_rate': (processed_videos / total_videos * 100) if total_videos > 0 else 0
-    }
+    stats = system_counts(one_day_ago)
+    total_videos = stats['total_videos']
+    stats['processing_success_rate'] = (stats['processed_videos'] / total_videos * 100) if total_videos > 0 else 0
+    return stats
 
 def get_vehicle_type_distribution():
     """Get distribution of vehicle types across all detections"""
@@ -179,30 +129,14 @@ def get_vehicle_type_distribution():
     return {item['vehicle_type__name']: item['count'] for item in distribution}
 
 def get_peak_hours_analysis():
-    """Analyze peak traffic hours across all data - SQLite compatible"""
-    # Get all detections
-    detections = Detection.objects.all()
-    
-    # Manual grouping by hour for SQLite compatibility
-    hourly_counts = {}
-    hourly_confidence = {}
-    
-    for detection in detections:
-        hour = detection.timestamp.hour
-        hourly_counts[hour] = hourly_counts.get(hour, 0) + 1
-        hourly_confidence[hour] = hourly_confidence.get(hour, []) + [detection.confidence]
+    """Analyze peak traffic hours across all data"""
+    peak = busiest_hour_of_day()
     
-    # Find peak hour
-    if hourly_counts:
-        peak_hour = max(hourly_counts.items(), key=lambda x: x[1])
-        hour = peak_hour[0]
-        count = peak_hour[1]
-        avg_confidence = sum(hourly_confidence[hour]) / len(hourly_confidence[hour]) if hour in hourly_confidence else 0
-        
+    if peak:
         return {
-            'peak_hour': f"{hour:02d}:00",
-            'peak_hour_count': count,
-            'average_confidence': float(avg_confidence)
+            'peak_hour': f"{peak['hour']:02d}:00",
+            'peak_hour_count': peak['count'],
+            'average_confidence': float(peak['average_confidence'] or 0)
         }
     
     return {
@@ -228,7 +162,10 @@ def generate_traffic_predictions(location_id=None, days_ahead=7):
     else:
         location = None
     
-    if not historical_data.exists():
+    # Detections per (date, hour) - the only rows the predictions need
+    hourly_rows = detections_per_day_and_hour(historical_data)
+    
+    if not hourly_rows:
         print("No historical data available for predictions")
         return []
     
@@ -241,8 +178,8 @@ def generate_traffic_predictions(location_id=None, days_ahead=7):
         
         for hour in range(6, 22):  # 6 AM to 10 PM
             # Simple prediction algorithm (can be enhanced with ML later)
-            predicted_count = predict_hourly_traffic(historical_data, day_of_week, hour)
-            confidence_score = calculate_confidence(historical_data, day_of_week, hour)
+            predicted_count = predict_hourly_traffic(hourly_rows, day_of_week, hour)
+            confidence_score = calculate_confidence(hourly_rows, day_of_week, hour)
             
             # Determine congestion level
             if predicted_count > 150:
@@ -275,19 +212,19 @@ def generate_traffic_predictions(location_id=None, days_ahead=7):
     print(f"Generated {len(predictions)} traffic predictions")
     return predictions
 
-def predict_hourly_traffic(historical_data, day_of_week, hour):
-    """Simple prediction algorithm based on historical patterns"""
-    # Filter historical data for same day of week and hour
-    similar_data = [
-        det for det in historical_data 
-        if det.timestamp.weekday() == day_of_week and det.timestamp.hour == hour
+def predict_hourly_traffic(hourly_rows, day_of_week, hour):
+    """Simple prediction algorithm based on historical patterns (rows from detections_per_day_and_hour)"""
+    # Detections per date for the same day of week and hour
+    similar_counts = [
+        count for day, row_hour, count in hourly_rows
+        if day.weekday() == day_of_week and row_hour == hour
     ]
     
-    if not similar_data:
+    if not similar_counts:
         # Fallback: average of all data for that hour
-        similar_data = [det for det in historical_data if det.timestamp.hour == hour]
+        similar_counts = [count for _, row_hour, count in hourly_rows if row_hour == hour]
     
-    if not similar_data:
+    if not similar_counts:
         # Default patterns based on common traffic flows
         if 7 <= hour <= 9:  # Morning rush hour
             return 120
@@ -299,30 +236,20 @@ def predict_hourly_traffic(historical_data, day_of_week, hour):
             return 30
     
     # Calculate average count for this time slot
-    hourly_counts = {}
-    for detection in similar_data:
-        hour_key = f"{detection.timestamp.date()}_{hour}"
-        hourly_counts[hour_key] = hourly_counts.get(hour_key, 0) + 1
-    
-    if hourly_counts:
-        average_count = sum(hourly_counts.values()) / len(hourly_counts)
-        return int(average_count)
-    
-    return 50  # Fallback default
+    return int(sum(similar_counts) / len(similar_counts))
 
-def calculate_confidence(historical_data, day_of_week, hour):
+def calculate_confidence(hourly_rows, day_of_week, hour):
     """Calculate confidence score for predictions (0.0 to 1.0)"""
     # Count how much historical data we have for this time slot
-    similar_data = [
-        det for det in historical_data 
-        if det.timestamp.weekday() == day_of_week and det.timestamp.hour == hour
-    ]
+    data_points = sum(
+        count for day, row_hour, count in hourly_rows
+        if day.weekday() == day_of_week and row_hour == hour
+    )
     
-    if not similar_data:
+    if not data_points:
         return 0.3  # Low confidence for no historical data
     
     # More data = higher confidence
-    data_points = len(similar_data)
     if data_points > 100:
         return 0.9
     elif data_points > 50:
@@ -0,0 +1,9 @@
+# trapickapp/tasks.py
+from celery import shared_task
+from .jobs import run_job
+
+
+@shared_task(name='trapickapp.process_video_job', acks_late=True)
+def process_video_job(job_id):
+    """Celery entry point for a queued ProcessingJob"""
+    run_job(job_id)
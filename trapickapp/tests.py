@@ -1,3 +1,1533 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from collections import Counter
+from types import SimpleNamespace
+from datetime import datetime, time, timedelta
+from unittest import mock
+import numpy as np
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
 
-# Create your tests here.
+from ml.checkpoints import AnalysisCheckpoint
+from ml.counting_zones import CountingGeometry
+from ml.detection_batch import DetectionBatch
+from ml.detection_store import DetectionRecorder, DetectionReplay, detections_output_path
+from ml.detector_factory import DetectorFactory
+from ml.frame_scheduler import MotionFrameScheduler
+from ml.frame_source import FrameSource
+from ml.report_aggregator import StreamingReportAggregator
+from ml.sharded_analysis import merge_segment_results
+from ml.stream_analysis import StreamSource, StreamWindows
+from ml.tiled_inference import TileLayout
+from ml.track_expiry import ExpiringTrackSet
+from . import aggregations, artifacts, services, uploads
+from .jobs import LocalJobQueue, recover_jobs, is_server_process, run_job
+from .models import (
+    Detection, Location, ProcessingJob, ProcessingProfile, TrafficAnalysis, VehicleType, VideoArtifact, VideoFile
+)
+from .video_serving import parse_range_header, serve_video_file
+
+
+def tile_box(tile, x1, y1, x2, y2, conf=0.9, cls=2):
+    """x1 y1 x2 y2 conf cls row in ``tile``'s coordinates, clipped to the tile like a detector output"""
+    left, top, right, bottom = tile
+    return [max(0, x1 - left), max(0, y1 - top), min(right - left - 1, x2 - left),
+            min(bottom - top - 1, y2 - top), conf, cls]
+
+
+class TileLayoutMergeTests(SimpleTestCase):
+    def setUp(self):
+        # Tiles at x 0-640, 320-960 and 640-1280
+        self.layout = TileLayout((1280, 640), {'left': 0, 'right': 1279, 'top': 0, 'bottom': 639})
+
+    def merge(self, vehicles):
+        tile_boxes = []
+        for tile in self.layout.tiles:
+            rows = [tile_box(tile, *vehicle) for vehicle in vehicles
+                    if vehicle[0] < tile[2] and vehicle[2] > tile[0]]
+            tile_boxes.append(np.array(rows, dtype=np.float32).reshape(-1, 6))
+        return self.layout.merge(tile_boxes)
+
+    def test_whole_vehicle_and_its_fragments_give_one_box(self):
+        merged = self.merge([(560, 100, 700, 200)])
+        self.assertEqual(len(merged), 1)
+        np.testing.assert_array_equal(merged[0, :4], [560, 100, 700, 200])
+
+    def test_touching_whole_vehicles_stay_apart(self):
+        merged = self.merge([(560, 100, 700, 200, 0.9), (680, 100, 820, 200, 0.8)])
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(sorted(merged[:, 0].tolist()), [560, 680])
+
+    def test_fragments_of_one_tile_are_not_joined(self):
+        # Two cars cut off by the same tile edge, with no tile seeing them whole
+        tile = np.array([[500, 100, 639, 200, 0.9, 2], [600, 150, 639, 260, 0.8, 2]], dtype=np.float32)
+        empty = np.zeros((0, 6), dtype=np.float32)
+        merged = self.layout.merge([tile, empty, empty])
+        self.assertEqual(len(merged), 2)
+
+    def test_other_classes_are_not_merged(self):
+        merged = self.merge([(560, 100, 700, 200, 0.9, 2), (560, 100, 700, 200, 0.8, 7)])
+        self.assertEqual(len(merged), 2)
+
+
+class JobRecoveryTests(TestCase):
+    def setUp(self):
+        self.video = VideoFile.objects.create(filename='clip.mp4', file_path='videos/clip.mp4')
+
+    def running_job(self, worker, heartbeat_age):
+        return ProcessingJob.objects.create(
+            video_file=self.video, video_path='media/videos/clip.mp4', status='running', worker=worker,
+            heartbeat_at=timezone.now() - timedelta(seconds=heartbeat_age)
+        )
+
+    def test_live_jobs_of_other_workers_keep_running(self):
+        job = self.running_job('other-host:4242:trapick-worker-1', 5)
+        self.assertEqual(recover_jobs(), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+
+    def test_job_without_heartbeat_is_requeued(self):
+        job = self.running_job('other-host:4242:trapick-worker-1', 600)
+        self.assertEqual(recover_jobs(), [job])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.heartbeat_at), ('queued', '', None))
+
+    def test_job_of_dead_local_process_is_requeued_at_once(self):
+        job = self.running_job(f'{socket.gethostname()}:4242:trapick-worker-1', 5)
+        with mock.patch('trapickapp.jobs._pid_alive', return_value=False), mock.patch('trapickapp.jobs.os.name', 'posix'):
+            self.assertEqual(recover_jobs(), [job])
+
+    def test_recovery_outlives_a_failing_startup_sweep(self):
+        from django.db import OperationalError
+
+        job_queue = LocalJobQueue()
+        sweep = mock.Mock(side_effect=[OperationalError('no such table: trapickapp_processingjob'), []])
+        # The second sleep ends the loop
+        with mock.patch.object(job_queue, 'sweep', sweep), \
+                mock.patch('trapickapp.jobs.time.sleep', side_effect=[None, SystemExit]):
+            with self.assertRaises(SystemExit):
+                job_queue._recovery_loop()
+        self.assertEqual(sweep.call_count, 2)
+
+    def test_failed_jobs_only_when_asked(self):
+        job = ProcessingJob.objects.create(video_file=self.video, video_path='media/videos/clip.mp4', status='failed')
+        self.assertEqual(recover_jobs(), [])
+        self.assertEqual(recover_jobs(include_failed=True), [job])
+
+
+class ServerProcessTests(SimpleTestCase):
+    def test_management_commands_do_not_start_workers(self):
+        self.assertFalse(is_server_process(['manage.py', 'migrate']))
+        self.assertFalse(is_server_process(['manage.py', 'test']))
+
+    def test_runserver_starts_workers_in_the_reloader_child(self):
+        with mock.patch.dict(os.environ, {'RUN_MAIN': 'true'}):
+            self.assertTrue(is_server_process(['manage.py', 'runserver']))
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(is_server_process(['manage.py', 'runserver']))
+            self.assertTrue(is_server_process(['manage.py', 'runserver', '--noreload']))
+
+    def test_asgi_servers_start_workers(self):
+        self.assertTrue(is_server_process(['/usr/local/bin/daphne', 'trapick.asgi:application']))
+
+
+class MediaRootTestCase(TestCase):
+    """Runs each test against an empty temporary MEDIA_ROOT"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def media_file(self, relative_path, content=b''):
+        path = os.path.join(self.media_root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+
+class OnDemandRenderTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.submitted = []
+        queue_patch = mock.patch('trapickapp.jobs.get_job_queue', return_value=mock.Mock(submit=self.submitted.append))
+        queue_patch.start()
+        self.addCleanup(queue_patch.stop)
+        self.media_file('videos/clip.mp4')
+        self.media_file('detections/clip.npz')
+        self.video = VideoFile.objects.create(
+            filename='clip.mp4', file_path='videos/clip.mp4', processing_status='completed',
+            detections_path='detections/clip.npz'
+        )
+
+    def test_detections_are_written_under_media_root(self):
+        self.assertTrue(detections_output_path('videos/clip.mp4').startswith(os.path.join(self.media_root, 'detections')))
+
+    def test_view_queues_one_render_and_answers_202(self):
+        for url in ('view', 'download', 'direct'):
+            response = self.client.get(f'/api/video/{self.video.id}/{url}/')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()['job']['kind'], 'render')
+        self.assertEqual(len(self.submitted), 1)
+        self.assertEqual(ProcessingJob.objects.get().kind, 'render')
+
+    def test_cached_render_is_served(self):
+        self.media_file(f'rendered_videos/{self.video.id}.mp4', b'rendered')
+        response = self.client.get(f'/api/video/{self.video.id}/view/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'rendered')
+        self.assertEqual(self.submitted, [])
+
+
+class RenditionJobTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.submitted = []
+        queue_patch = mock.patch('trapickapp.jobs.get_job_queue', return_value=mock.Mock(submit=self.submitted.append))
+        queue_patch.start()
+        self.addCleanup(queue_patch.stop)
+        self.media_file('processed_videos/clip.mp4')
+        self.video = VideoFile.objects.create(
+            filename='clip.mp4', file_path='videos/clip.mp4', processing_status='completed',
+            processed_video_path='processed_videos/clip.mp4'
+        )
+
+    def test_without_ffmpeg_the_endpoint_answers_503(self):
+        with mock.patch('trapickapp.renditions.find_ffmpeg', return_value=None):
+            response = self.client.get(f'/api/video/{self.video.id}/stream/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.submitted, [])
+
+    def test_build_is_queued_once_as_its_own_job(self):
+        with mock.patch('trapickapp.renditions.find_ffmpeg', return_value='/usr/bin/ffmpeg'):
+            for _ in range(2):
+                response = self.client.get(f'/api/video/{self.video.id}/stream/')
+                self.assertEqual(response.status_code, 202)
+                self.assertEqual(response.json()['job']['kind'], 'renditions')
+        self.assertEqual(len(self.submitted), 1)
+
+    def test_failed_build_is_reported_until_retried(self):
+        ProcessingJob.objects.create(video_file=self.video, kind='renditions', video_path='', status='failed',
+                                     error_message='ffmpeg hls failed')
+        with mock.patch('trapickapp.renditions.find_ffmpeg', return_value='/usr/bin/ffmpeg'):
+            response = self.client.get(f'/api/video/{self.video.id}/stream/')
+            self.assertEqual((response.status_code, response.json()['error']), (500, 'ffmpeg hls failed'))
+            response = self.client.get(f'/api/video/{self.video.id}/stream/?retry=1')
+            self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(self.submitted), 1)
+
+
+class ArtifactIndexTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.video = VideoFile.objects.create(filename='clip.mp4', file_path='videos/clip_x1.mp4')
+
+    def test_legacy_outputs_are_linked_by_name(self):
+        older = self.media_file('processed_videos/processed_clip_x1_20240101_090000.mp4', b'old')
+        newest = self.media_file('processed_videos/processed_clip_x1_20240301_090000.mp4', b'newest')
+        os.utime(older, (1, 1))
+        os.utime(newest, (2, 2))
+
+        stats = artifacts.reconcile_artifacts(dry_run=True)
+        self.assertEqual((stats['linked'], stats['indexed']), (1, 1))
+        self.assertFalse(VideoArtifact.objects.exists())
+
+        stats = artifacts.reconcile_artifacts()
+        self.assertEqual((stats['linked'], stats['indexed'], stats['orphans']),
+                         (1, 1, ['processed_videos/processed_clip_x1_20240101_090000.mp4']))
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.processed_video_path.name, 'processed_videos/processed_clip_x1_20240301_090000.mp4')
+        self.assertEqual(artifacts.artifact_path(self.video), newest)
+        artifact = VideoArtifact.objects.get()
+        self.assertEqual((artifact.size, artifact.checksum), (6, sha256(b'newest')))
+
+        # Nothing left to do on the next run
+        stats = artifacts.reconcile_artifacts()
+        self.assertEqual((stats['linked'], stats['indexed'], stats['unchanged']), (0, 0, 1))
+
+    def test_entries_of_missing_files_are_dropped(self):
+        path = self.media_file('processed_videos/clip.mp4', b'video')
+        artifacts.record_artifact(self.video, path)
+        kept = self.media_file(f'rendered_videos/{self.video.id}.mp4', b'render')
+        artifacts.record_artifact(self.video, kept, artifacts.RENDERED)
+        os.remove(path)
+
+        stats = artifacts.reconcile_artifacts()
+        self.assertEqual(stats['removed'], 1)
+        self.assertEqual(list(VideoArtifact.objects.values_list('rendition', flat=True)), [artifacts.RENDERED])
+        # Looking one up drops it as well
+        os.remove(kept)
+        self.assertIsNone(artifacts.find_processed_video(self.video))
+        self.assertFalse(VideoArtifact.objects.exists())
+
+    def test_unindexed_files_are_reported_as_orphans(self):
+        self.media_file('processed_videos/unknown.mp4', b'?')
+        self.media_file('rendered_videos/0000.mp4', b'?')
+        stats = artifacts.reconcile_artifacts()
+        self.assertEqual(sorted(stats['orphans']), ['processed_videos/unknown.mp4', 'rendered_videos/0000.mp4'])
+        self.assertEqual((stats['indexed'], stats['removed']), (0, 0))
+
+    def test_duplicates_share_the_original_upload_artifacts(self):
+        duplicate = VideoFile.objects.create(filename='copy.mp4', file_path='videos/clip_x1.mp4', duplicate_of=self.video)
+        path = self.media_file('processed_videos/clip.mp4', b'video')
+        artifacts.record_artifact(duplicate, path)
+        self.assertEqual(VideoArtifact.objects.get().video_file_id, self.video.id)
+        self.assertEqual(artifacts.artifact_path(self.video), path)
+
+    @override_settings(TRAPICK_RENDER={'CACHE_MAX_MB': 10 / (1024 * 1024)})
+    def test_evicted_renders_leave_the_index(self):
+        from .rendering import get_render_cache
+
+        other = VideoFile.objects.create(filename='other.mp4', file_path='videos/other.mp4')
+        cache = get_render_cache()
+        for video, atime in ((self.video, 1), (other, 2)):
+            path = self.media_file(os.path.relpath(cache.path_for(video), self.media_root), b'8 bytes!')
+            artifacts.record_artifact(video, path, artifacts.RENDERED)
+            os.utime(path, (atime, atime))
+
+        cache.evict()
+        self.assertIsNone(artifacts.artifact_path(self.video, artifacts.RENDERED))
+        self.assertEqual(artifacts.artifact_path(other, artifacts.RENDERED), cache.path_for(other))
+        self.assertEqual(list(VideoArtifact.objects.values_list('video_file_id', flat=True)), [other.id])
+
+
+def frame_detections(count, rng):
+    boxes = [[10, 10, 50, 50, i + 1, rng.uniform(0.4, 1.0), 2] for i in range(count)]
+    return DetectionBatch.from_boxes(np.array(boxes, dtype=np.float32).reshape(-1, 7), {2: 'car'}, True)
+
+
+class StreamingReportAggregatorTests(SimpleTestCase):
+    def old_report(self, frames):
+        """What RTXVehicleDetector computed from its per-frame list before the streaming aggregator"""
+        totals = [total for total, _ in frames]
+        confidences = [c for _, detections in frames for c in detections.confidences.tolist()]
+        first_half = np.mean(totals[:len(totals) // 2])
+        second_half = np.mean(totals[len(totals) // 2:])
+        if len(totals) < 10:
+            pattern = 'Insufficient Data'
+        elif second_half > first_half * 1.2:
+            pattern = 'Increasing'
+        elif second_half < first_half * 0.8:
+            pattern = 'Decreasing'
+        else:
+            pattern = 'Stable'
+        return {'peak': max(totals), 'mean': np.mean(totals), 'confidence': np.mean(confidences),
+                'first_half': first_half, 'second_half': second_half, 'pattern': pattern}
+
+    def aggregate(self, frames, segments=1):
+        from ml.vehicle_detector import RTXVehicleDetector
+
+        bounds = np.linspace(0, len(frames), segments + 1).astype(int)
+        merged = StreamingReportAggregator()
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            segment = StreamingReportAggregator()
+            # Frame numbers do not matter, as when the container reports no frame count
+            for total, detections in frames[start:end]:
+                segment.add(0, total, detections)
+            merged.merge(segment)
+        detector = RTXVehicleDetector()
+        detector.report_stats = merged
+        return {'peak': merged.peak, 'mean': merged.mean_vehicles, 'confidence': merged.mean_confidence,
+                'first_half': merged.first_half_mean, 'second_half': merged.second_half_mean,
+                'pattern': detector.identify_traffic_pattern()}
+
+    def test_matches_the_per_frame_list(self):
+        rng = np.random.default_rng(9)
+        for shape in ('rising', 'falling', 'flat'):
+            frames = []
+            for i in range(501):
+                level = {'rising': i / 100, 'falling': 5 - i / 100, 'flat': 2}[shape]
+                count = int(rng.poisson(level))
+                frames.append((count, frame_detections(count, rng)))
+            expected = self.old_report(frames)
+            for segments in (1, 3, 7):
+                actual = self.aggregate(frames, segments)
+                self.assertEqual(actual['pattern'], expected['pattern'])
+                for key in ('peak', 'mean', 'confidence', 'first_half', 'second_half'):
+                    self.assertAlmostEqual(actual[key], expected[key], places=9)
+
+    def test_memory_stays_bounded_on_long_videos(self):
+        rng = np.random.default_rng(3)
+        empty = DetectionBatch.empty()
+        totals = np.concatenate([rng.poisson(2, 60001), rng.poisson(4, 47000)])
+        single, merged = StreamingReportAggregator(), StreamingReportAggregator()
+        for segment in np.array_split(totals, 5):
+            part = StreamingReportAggregator()
+            for total in segment.tolist():
+                single.add(0, total, empty)
+                part.add(0, total, empty)
+            merged.merge(part)
+
+        half = len(totals) // 2
+        for stats in (single, merged):
+            self.assertLessEqual(len(stats.bucket_frames), StreamingReportAggregator.BUCKETS)
+            self.assertEqual((sum(stats.bucket_frames), sum(stats.bucket_sums)), (len(totals), totals.sum()))
+            # Only the bucket holding the split is estimated
+            self.assertAlmostEqual(stats.first_half_mean, totals[:half].mean(), delta=0.01)
+            self.assertAlmostEqual(stats.second_half_mean, totals[half:].mean(), delta=0.01)
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ChunkVerificationTests(MediaRootTestCase):
+    content = b'0123456789'
+
+    def setUp(self):
+        super().setUp()
+        self.session = uploads.create_upload_session('clip.mp4', len(self.content), None, chunk_size=4)
+
+    def send(self, index, data=None):
+        good = self.content[index * 4:index * 4 + 4]
+        data = good if data is None else data
+        return uploads.receive_chunk(self.session, index, io.BytesIO(data), sha256(good))
+
+    def stored(self):
+        with open(os.path.join(self.media_root, self.session.file_path), 'rb') as f:
+            return f.read()
+
+    def test_bad_resend_does_not_overwrite_a_received_chunk(self):
+        self.send(0)
+        self.assertNotEqual(self.send(0, b'XXXX'), sha256(b'0123'))
+        self.assertEqual(self.stored()[:4], b'0123')
+        self.assertNotIn(0, uploads.missing_chunks(self.session))
+
+    def test_bad_chunk_is_neither_written_nor_recorded(self):
+        self.send(1, b'XXXX')
+        self.assertEqual(self.stored(), bytes(len(self.content)))
+        self.assertEqual(uploads.missing_chunks(self.session), [0, 1, 2])
+
+    def test_whole_file_hash_survives_a_bad_chunk(self):
+        self.send(0)
+        self.send(1, b'XXXX')
+        self.send(1)
+        self.send(2)
+        self.assertEqual(self.stored(), self.content)
+        offset, content_hash = uploads._content_hashes[self.session.id]
+        self.assertEqual((offset, content_hash.hexdigest()), (len(self.content), sha256(self.content)))
+
+
+class FakeCapture:
+    """cv2.VideoCapture of a 640x360 camera at 25 FPS, reachable from the ``opens_at``-th open"""
+
+    opens = 0
+    opens_at = 1
+
+    def __init__(self, *args):
+        FakeCapture.opens += 1
+        self.opened = FakeCapture.opens >= FakeCapture.opens_at
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop):
+        import cv2
+
+        values = {cv2.CAP_PROP_FPS: 25, cv2.CAP_PROP_FRAME_WIDTH: 640, cv2.CAP_PROP_FRAME_HEIGHT: 360}
+        return values.get(prop, 0) if self.opened else 0
+
+    def release(self):
+        self.opened = False
+
+
+@mock.patch('ml.stream_analysis.RECONNECT_DELAYS', (0,))
+@mock.patch('cv2.VideoCapture', FakeCapture)
+class StreamStartupTests(SimpleTestCase):
+    def setUp(self):
+        FakeCapture.opens = 0
+
+    def test_camera_down_at_startup_is_waited_for(self):
+        FakeCapture.opens_at = 3
+        source = StreamSource('rtsp://camera/stream')
+        self.assertFalse(source.isOpened())
+        self.assertTrue(source.wait_until_open())
+        self.assertEqual((source.width, source.height, source.fps), (640, 360, 25))
+        self.assertEqual(source.view_size, (640, 360))
+        self.assertEqual(source.reconnects, 0)
+
+    def test_stop_while_waiting(self):
+        FakeCapture.opens_at = 1000
+        stop_event = threading.Event()
+        stop_event.set()
+        self.assertFalse(StreamSource('rtsp://camera/stream', stop_event=stop_event).wait_until_open())
+
+    def test_missing_local_file_is_not_retried(self):
+        FakeCapture.opens_at = 2
+        self.assertFalse(StreamSource('clip.mp4').wait_until_open())
+        self.assertEqual(FakeCapture.opens, 1)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    MB = 1024 * 1024
+
+    def setUp(self):
+        # Weights are never read: a "model" is its path, and its size comes from self.sizes
+        self.sizes = {}
+        self.loads = []
+        patches = [
+            mock.patch('ml.model_registry.YOLO', side_effect=self.load),
+            mock.patch('ml.model_registry.ModelRegistry._estimate_size', side_effect=lambda model: self.sizes[model])
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def load(self, path):
+        self.loads.append(path)
+        return path
+
+    def registry(self, **kwargs):
+        from ml.model_registry import ModelRegistry
+        return ModelRegistry(**kwargs)
+
+    def cached(self, registry):
+        return [model['weights'] for model in registry.stats()['models']]
+
+    def test_least_recently_used_model_is_evicted_past_max_models(self):
+        registry = self.registry()
+        self.sizes.update({'a.pt': self.MB, 'b.pt': self.MB, 'c.pt': self.MB, 'd.pt': self.MB})
+        for path in ('a.pt', 'b.pt', 'c.pt', 'a.pt', 'd.pt'):
+            registry.get(path)
+        self.assertEqual(registry.max_models, 3)
+        self.assertEqual(self.cached(registry), ['c.pt', 'a.pt', 'd.pt'])
+        self.assertEqual(self.loads, ['a.pt', 'b.pt', 'c.pt', 'd.pt'])
+
+    def test_memory_budget_evicts_before_max_models(self):
+        registry = self.registry()
+        self.sizes.update({'l.pt': 900 * self.MB, 'm.pt': 900 * self.MB, 'x.pt': 300 * self.MB})
+        registry.get('l.pt')
+        registry.get('m.pt')
+        self.assertEqual(registry.stats()['memory_budget_mb'], 2048)
+        # 2100 MB is over the 2048 MB budget although only three models are loaded
+        registry.get('x.pt')
+        self.assertEqual(self.cached(registry), ['m.pt', 'x.pt'])
+        self.assertEqual(registry.stats()['total_mb'], 1200)
+
+    def test_a_model_over_the_budget_is_still_kept(self):
+        registry = self.registry(memory_budget_mb=100)
+        self.sizes.update({'s.pt': 10 * self.MB, 'huge.pt': 500 * self.MB})
+        registry.get('s.pt')
+        self.assertIs(registry.get('huge.pt').model, 'huge.pt')
+        self.assertEqual(self.cached(registry), ['huge.pt'])
+
+    def test_detectors_share_one_model(self):
+        from ml.vehicle_detector import Config, RTXVehicleDetector
+
+        registry = self.registry()
+        self.sizes[Config.MODEL_PATH] = self.MB
+        with mock.patch('ml.vehicle_detector.model_registry', registry):
+            first, second = RTXVehicleDetector(), RTXVehicleDetector()
+            self.assertIs(first.shared_model, second.shared_model)
+            self.assertIsNot(first._get_tracker(), second._get_tracker())
+        self.assertEqual(self.loads, [Config.MODEL_PATH])
+        model = registry.stats()['models'][0]
+        self.assertEqual((model['imgsz'], model['hits']), (Config.IMAGE_SIZE, 1))
+        self.assertEqual(first._get_tracker().imgsz, Config.IMAGE_SIZE)
+
+
+class DetectorFactoryTests(SimpleTestCase):
+    def profile(self, **kwargs):
+        return ProcessingProfile(**dict({
+            'name': 'highway', 'display_name': 'Highway',
+            'detector_module': 'ml.vehicle_detector', 'detector_class': 'RTXVehicleDetector'
+        }, **kwargs))
+
+    def test_missing_detector_class_is_an_error(self):
+        with self.assertRaises(AttributeError):
+            DetectorFactory.get_detector(self.profile(detector_class='NoSuchDetector'))
+
+    def test_rejected_settings_are_an_error(self):
+        with self.assertRaises(TypeError):
+            DetectorFactory.get_detector(self.profile(config_parameters={'no_such_setting': 1}))
+        with self.assertRaises(TypeError):
+            DetectorFactory.get_detector(self.profile(), overrides={'no_such_override': 1})
+
+
+class ShardedDetectionTests(SimpleTestCase):
+    def segment_result(self, index, frames, counted):
+        """Result of a segment that saw tracks 1 and 2 on each of ``frames`` and counted ``counted`` cars"""
+        recorder = DetectionRecorder(object(), 25, 640, 360)
+        for running, frame in enumerate(frames, start=1):
+            boxes = [[10, 10, 50, 50, 1, 0.9, 2], [100, 10, 150, 50, 2, 0.8, 2]]
+            recorder.add_frame(frame, frame, 2, min(running, counted), DetectionBatch.from_boxes(boxes, {2: 'car'}, True))
+        return {
+            'segment': {'index': index}, 'vehicle_counts': {'car': counted}, 'report_stats': StreamingReportAggregator(),
+            'detections': recorder, 'seam_suppressed': 0,
+            'frame_skipping': {'mode': 'off', 'frames_inferred': len(frames), 'frames_skipped': 0}
+        }
+
+    def test_segment_detections_are_merged_in_video_order(self):
+        results = [self.segment_result(1, [3, 4, 5], counted=1), self.segment_result(0, [0, 1, 2], counted=2)]
+        vehicle_counts, _, _, detections, _, _ = merge_segment_results(results)
+        self.assertEqual(dict(vehicle_counts), {'car': 3})
+
+        with tempfile.TemporaryDirectory() as directory:
+            replay = DetectionReplay(detections.save(os.path.join(directory, 'clip.npz')))
+        self.assertEqual(sorted(replay.positions), [0, 1, 2, 3, 4, 5])
+        label, current, counted, _, batch = replay.frame(1)
+        self.assertEqual((label, current, counted, batch.track_ids.tolist()), (1, 2, 2, [1, 2]))
+        # Running totals continue from the first segment; its tracks 1 and 2 are new vehicles
+        label, current, counted, _, batch = replay.frame(4)
+        self.assertEqual((label, current, counted, batch.track_ids.tolist()), (4, 2, 3, [4, 5]))
+        self.assertEqual(batch.bboxes.tolist(), [[10, 10, 40, 40], [100, 10, 50, 40]])
+
+
+class RangeHeaderTests(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), [(0, 99)])
+        self.assertEqual(parse_range_header('bytes=900-', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=-100', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=-5000', 1000), [(0, 999)])
+        self.assertEqual(parse_range_header('bytes=500-5000', 1000), [(500, 999)])
+
+    def test_overlapping_and_adjacent_ranges_are_merged(self):
+        self.assertEqual(parse_range_header('bytes=50-99, 0-49, 70-120', 1000), [(0, 120)])
+        self.assertEqual(parse_range_header('bytes=0-9,20-29,-10', 1000), [(0, 9), (20, 29), (990, 999)])
+
+    def test_unsatisfiable_ranges(self):
+        self.assertEqual(parse_range_header('bytes=1000-', 1000), [])
+        self.assertEqual(parse_range_header('bytes=-0', 1000), [])
+        self.assertEqual(parse_range_header('bytes=-5', 0), [])
+        self.assertEqual(parse_range_header('bytes=0-', 0), [])
+
+    def test_ignored_headers(self):
+        self.assertIsNone(parse_range_header(None, 1000))
+        self.assertIsNone(parse_range_header('items=0-9', 1000))
+        self.assertIsNone(parse_range_header('bytes=9-0', 1000))
+        self.assertIsNone(parse_range_header('bytes=-', 1000))
+        self.assertIsNone(parse_range_header('bytes=a-b', 1000))
+
+
+class ServeVideoFileTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.mp4')
+        self.content = bytes(range(256)) * 4
+        with os.fdopen(handle, 'wb') as f:
+            f.write(self.content)
+        self.addCleanup(os.remove, self.path)
+
+    def get(self, **headers):
+        response = serve_video_file(RequestFactory().get('/video', **headers), self.path, 'clip.mp4')
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_range_request(self):
+        response, body = self.get(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertEqual(body, self.content[100:200])
+
+    def test_multiple_ranges(self):
+        response, body = self.get(HTTP_RANGE='bytes=0-9,-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges'))
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertIn(b'Content-Range: bytes 1014-1023/1024\r\n\r\n' + self.content[-10:], body)
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get(HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_range(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual((response.status_code, body), (206, self.content[:10]))
+        # A changed file is sent whole
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, body), (200, self.content))
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='Thu, 01 Jan 1970 00:00:00 GMT')
+        self.assertEqual((response.status_code, body), (200, self.content))
+
+
+class DetectionBatchTests(SimpleTestCase):
+    def test_boxes_are_clipped_to_the_frame(self):
+        batch = DetectionBatch.from_boxes([[-5, 10, 250, 120, 7, 0.9, 2]], {2: 'car'}, True, frame_shape=(100, 200, 3))
+        self.assertEqual(batch.bboxes.tolist(), [[0, 10, 200, 90]])
+        self.assertEqual((batch.track_ids.tolist(), batch.class_name(2)), ([7], 'car'))
+
+    def test_view_boxes_are_mapped_to_the_full_frame(self):
+        batch = DetectionBatch.from_boxes(
+            [[10, 20, 30, 40, 3, 0.5, 7]], {7: 'truck'}, True, view_scale=0.5, view_offset=(100, 50)
+        )
+        self.assertEqual(batch.bboxes.tolist(), [[120, 90, 40, 40]])
+        self.assertEqual([tuple(c.tolist()) for c in batch.centers()], [(140,), (110,)])
+
+    def test_boxes_without_track_ids(self):
+        batch = DetectionBatch.from_boxes([[0, 0, 10, 10, 0.75, 2], [5, 5, 20, 20, 0.5, 3]], {}, False)
+        self.assertFalse(batch.has_ids)
+        self.assertEqual(batch.track_ids.tolist(), [0, 1])
+        self.assertEqual(batch.confidences.tolist(), [0.75, 0.5])
+        self.assertEqual(batch.class_ids.tolist(), [2, 3])
+        self.assertEqual(list(batch.rows())[1], (1, 'Unknown', [5, 5, 15, 15], 0.5, False, None))
+
+
+def baseline_overlay(detector, frame, detections, frame_number, fps):
+    """The overlay as draw_detection_info drew it before zone/panel layers and sprites, one cv2 call at a time"""
+    import cv2
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    height, width = frame.shape[:2]
+    left, top, right, bottom = detector.zone_left, detector.zone_top, detector.zone_right, detector.zone_bottom
+
+    cv2.rectangle(frame, (left, top), (right, bottom), detector.zone_color, detector.zone_thickness)
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (left, top), (right, bottom), (255, 255, 0), -1)
+    cv2.addWeighted(overlay, 0.08, frame, 0.92, 0, frame)
+    cv2.rectangle(frame, (left, top), (right, bottom), detector.zone_color, detector.zone_thickness)
+    label_w, label_h = cv2.getTextSize("HIGHER COUNTING ZONE", font, 0.7, 2)[0]
+    cv2.rectangle(frame, (left, top - label_h - 10), (left + label_w + 10, top), (0, 0, 0), -1)
+    cv2.putText(frame, "HIGHER COUNTING ZONE", (left + 5, top - 5), font, 0.7, (255, 255, 255), 2)
+    position = f"Top {int((top / height) * 100)}%-{int((bottom / height) * 100)}%"
+    cv2.putText(frame, f"Position: {position}", (left, bottom + 25), font, 0.5, detector.zone_color, 1)
+    direction = "↑ Vehicles counted as they enter frame ↑"
+    text_x = (width - cv2.getTextSize(direction, font, 0.5, 1)[0][0]) // 2
+    cv2.putText(frame, direction, (text_x, top - 30), font, 0.5, (255, 255, 255), 1)
+
+    for track_id, class_name, (x1, y1, w, h), confidence, in_zone, zone_entry in detections.rows():
+        color = detector.colors.get(class_name, detector.colors['other'])
+        cv2.rectangle(frame, (x1, y1), (x1 + w, y1 + h), (0, 255, 0) if in_zone else color, 4 if in_zone else 2)
+        label = f"{class_name} {confidence:.2f} ID:{track_id}" + (" ✓IN ZONE" if in_zone else "")
+        label_w, label_h = cv2.getTextSize(label, font, 0.5, 2)[0]
+        cv2.rectangle(frame, (x1, y1 - label_h - 10), (x1 + label_w, y1), (0, 100, 0) if in_zone else color, -1)
+        cv2.putText(frame, label, (x1, y1 - 5), font, 0.5, (255, 255, 255), 1)
+        cv2.circle(frame, (x1 + w // 2, y1 + h // 2), 5, (0, 255, 0) if in_zone else color, -1)
+        if zone_entry:
+            cv2.circle(frame, zone_entry, 8, (0, 255, 255), -1)
+            cv2.circle(frame, zone_entry, 8, (0, 0, 0), 2)
+        if track_id in detector.track_history and in_zone:
+            points = list(detector.track_history[track_id])
+            for i in range(1, len(points)):
+                alpha = i / len(points)
+                cv2.line(frame, points[i - 1], points[i], tuple(int(c * alpha) for c in color), 2)
+
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (10, 10), (380, 240), (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+    seconds = frame_number / fps
+    in_zone = Counter(detections.class_name(c) for c in detections.class_ids[detections.in_zone].tolist())
+    stats = [
+        (f"Time: {int(seconds // 60):02d}:{int(seconds % 60):02d}", (255, 255, 255)),
+        (f"Frame: {frame_number}", (255, 255, 255)),
+        (f"FPS: {fps:.1f}", (255, 255, 255)),
+        (f"TOTAL COUNTED: {sum(detector.vehicle_counts.values())}", (0, 255, 255)),
+        (f"IN HIGHER ZONE NOW: {int(detections.in_zone.sum())}", (0, 255, 0)),
+        (f"Zone Position: {position}", (255, 255, 0)),
+        (f"Zone Size: {bottom - top}h x {right - left}w", (255, 255, 255)),
+        ("CURRENT IN ZONE:", (255, 255, 255))
+    ] + [(f"  {name}: {in_zone[name]}", detector.colors.get(name, (255, 255, 255))) for name in sorted(in_zone)]
+    for i, (text, color) in enumerate(stats):
+        cv2.putText(frame, text, (20, 40 + i * 20), font, 0.5, color, 1)
+    return frame
+
+
+class OverlayRenderingTests(SimpleTestCase):
+    def test_overlay_matches_the_direct_drawing(self):
+        from ml.vehicle_detector import RTXVehicleDetector
+
+        detector = RTXVehicleDetector()
+        frame = np.random.default_rng(7).integers(0, 256, (360, 640, 3), dtype=np.uint8)
+        detector.setup_counting_zone(frame.shape)
+        detector.vehicle_counts.update({'car': 4, 'truck': 1})
+        detections = DetectionBatch.from_boxes(
+            [[300, 120, 380, 170, 3, 0.87, 2], [40, 250, 140, 330, 8, 0.61, 7], [500, 90, 600, 160, 11, 0.55, 3]],
+            {2: 'car', 3: 'motorcycle', 7: 'truck'}, True
+        )
+        detections.in_zone[:] = [True, False, True]
+        detections.entries[0] = (340, 145)
+        detector.track_history[3].extend([(330, 120), (335, 132), (340, 145)])
+
+        # Second frame: the zone and panel layers and cached text are reused
+        for frame_number in (45, 46):
+            expected = baseline_overlay(detector, frame.copy(), detections, frame_number, 30.0)
+            drawn = detector.draw_detection_info(frame.copy(), detections, frame_number, 30.0, 3)
+            difference = np.abs(drawn.astype(np.int16) - expected.astype(np.int16))
+            # Blends are computed over the zone / panel only, which can round a channel differently
+            self.assertLessEqual(difference.max(), 1)
+
+
+class DetectionStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_round_trip(self):
+        recorder = DetectionRecorder(object(), 25, 640, 360)
+        batch = DetectionBatch.from_boxes([[10, 10, 50, 60, 4, 0.9, 2], [0, 0, 8, 8, 5, 0.6, 7]], {2: 'car', 7: 'truck'}, True)
+        batch.in_zone[0] = True
+        recorder.add_frame(0, 0, 0, 0, DetectionBatch.empty())
+        recorder.add_frame(2, 2, 1, 3, batch, active_tracks=2)
+        replay = DetectionReplay(recorder.save(os.path.join(self.directory, 'clip.npz')))
+
+        self.assertEqual(replay.meta['fps'], 25)
+        self.assertIsNone(replay.frame(1))
+        self.assertEqual(len(replay.frame(0)[4]), 0)
+        label, current, counted, active, restored = replay.frame(2)
+        self.assertEqual((label, current, counted, active), (2, 1, 3, 2))
+        self.assertEqual(list(restored.rows()), [
+            (4, 'car', [10, 10, 40, 50], 0.89990234375, True, None),
+            (5, 'truck', [0, 0, 8, 8], 0.60009765625, False, None)
+        ])
+
+    def test_files_written_before_class_ids_were_coco_ids(self):
+        # class_id used to index a table of class names in first-seen order
+        path = os.path.join(self.directory, 'old.npz')
+        np.savez_compressed(
+            path, meta=np.array('{"detector": "ml.vehicle_detector.RTXVehicleDetector", "fps": 30, '
+                                '"width": 640, "height": 360, "class_names": ["truck", "car"]}'),
+            frame_index=np.array([0, 1], dtype=np.int32), frame_label=np.array([0, 1], dtype=np.int32),
+            current_total=np.array([1, 1], dtype=np.int32), total_counted=np.array([0, 1], dtype=np.int32),
+            active_tracks=np.array([1, 2], dtype=np.int32), first_detection=np.array([0, 1], dtype=np.int64),
+            track_id=np.array([1, 2], dtype=np.int32), class_id=np.array([1, 0], dtype=np.uint8),
+            bbox=np.array([[1, 2, 3, 4], [5, 6, 7, 8]], dtype=np.int32),
+            confidence=np.array([0.5, 0.25], dtype=np.float16), in_zone=np.array([False, True])
+        )
+        replay = DetectionReplay(path)
+        self.assertEqual(list(replay.frame(0)[4].rows()), [(1, 'car', [1, 2, 3, 4], 0.5, False, None)])
+        self.assertEqual(list(replay.frame(1)[4].rows()), [(2, 'truck', [5, 6, 7, 8], 0.25, True, None)])
+
+
+class ExpiringTrackSetTests(SimpleTestCase):
+    def test_tracks_expire_at_their_frame(self):
+        tracks = ExpiringTrackSet()
+        tracks.add(1, 10)
+        tracks.add(2, 5)
+        tracks.expire(4)
+        self.assertEqual(len(tracks), 2)
+        tracks.expire(5)
+        self.assertNotIn(2, tracks)
+        self.assertIn(1, tracks)
+
+    def test_re_adding_extends_a_track(self):
+        tracks = ExpiringTrackSet()
+        tracks.add(1, 10)
+        tracks.add(1, 20)
+        tracks.expire(10)
+        self.assertIn(1, tracks)
+        tracks.expire(20)
+        self.assertNotIn(1, tracks)
+
+    def test_discard(self):
+        tracks = ExpiringTrackSet()
+        tracks.add(1, 10)
+        tracks.discard(1)
+        tracks.discard(2)
+        tracks.expire(10)
+        self.assertEqual(len(tracks), 0)
+
+
+class CountingGeometryTests(SimpleTestCase):
+    def geometry(self, config):
+        geometry = CountingGeometry.from_config(config)
+        geometry.bind(101, 101)
+        return geometry
+
+    def step(self, geometry, *tracks):
+        """Advance one frame of (track_id, x, y) centers; returns the counting events as (approach, track_id)"""
+        track_ids = [track_id for track_id, _, _ in tracks]
+        _, events = geometry.update(track_ids, np.array([t[1] for t in tracks]), np.array([t[2] for t in tracks]))
+        return [(name, track_ids[i]) for name, i in events]
+
+    def test_empty_config(self):
+        self.assertIsNone(CountingGeometry.from_config({'units': 'pixels'}))
+
+    def test_zone_counts_tracks_moving_along_its_direction_once(self):
+        geometry = self.geometry({'zones': [{'name': 'south', 'polygon': [[0, 0.5], [1, 0.5], [1, 1], [0, 1]],
+                                             'direction': 'down'}]})
+        self.assertEqual(self.step(geometry, (1, 50, 40), (2, 20, 90)), [])
+        self.assertEqual(self.step(geometry, (1, 50, 60), (2, 20, 70)), [('south', 1)])
+        self.assertEqual(self.step(geometry, (1, 50, 80), (2, 20, 60)), [])
+        self.assertEqual(geometry.contains([50, 50], [10, 90]).tolist(), [False, True])
+
+    def test_count_line_counts_crossings_in_its_direction(self):
+        geometry = self.geometry({'units': 'pixels', 'count_lines': [
+            {'name': 'gate', 'points': [[0, 50], [100, 50]], 'direction': 'down', 'band': 10}
+        ]})
+        self.assertEqual(self.step(geometry, (1, 30, 45), (2, 60, 55), (3, 90, 10)), [])
+        self.assertEqual(self.step(geometry, (1, 30, 55), (2, 60, 45), (3, 90, 90)), [('gate', 1)])
+        # Back and forth again does not count twice
+        self.step(geometry, (1, 30, 45))
+        self.assertEqual(self.step(geometry, (1, 30, 55)), [])
+
+    def test_forgotten_tracks_can_count_again(self):
+        geometry = self.geometry({'zones': [{'name': 'all', 'polygon': [[0, 0], [1, 0], [1, 1], [0, 1]]}]})
+        self.assertEqual(self.step(geometry, (1, 50, 50)), [('all', 1)])
+        geometry.forget([1])
+        self.assertEqual(geometry.last_points, {})
+        self.assertEqual(self.step(geometry, (1, 50, 50)), [('all', 1)])
+
+
+def scalar_in_zone(zone, x, y, w, h):
+    """One box at a time, as RTXVehicleDetector.is_in_counting_zone tested boxes before it was vectorized"""
+    left, top, right, bottom = zone
+    center_x, center_y = x + w / 2, y + h / 2
+    corners = [(x, y), (x + w, y), (x, y + h), (x + w, y + h)]
+    return (
+        (left <= center_x <= right and top <= center_y <= bottom)
+        or any(left <= cx <= right and top <= cy <= bottom for cx, cy in corners)
+        or (x < right and x + w > left and y < bottom and y + h > top)
+        or (left <= center_x <= right and top <= y + h <= bottom)
+    )
+
+
+def scalar_entry_point(zone, history):
+    """Latest point of a track history inside the zone, or None"""
+    left, top, right, bottom = zone
+    for point in reversed(list(history)):
+        if left <= point[0] <= right and top <= point[1] <= bottom:
+            return point
+    return None
+
+
+class CountingZoneEquivalenceTests(SimpleTestCase):
+    def setUp(self):
+        from ml.vehicle_detector import RTXVehicleDetector
+
+        self.detector = RTXVehicleDetector()
+        self.detector.setup_counting_zone((360, 640, 3))
+        d = self.detector
+        self.zone = (d.zone_left, d.zone_top, d.zone_right, d.zone_bottom)
+
+    def boundary_boxes(self):
+        """Boxes whose edges, corners, centers or bottom centers sit on, just inside or just outside the zone"""
+        left, top, right, bottom = self.zone
+        boxes = []
+        for x in (left - 41, left - 40, left - 21, left - 20, left - 1, left, right - 1, right, right + 1):
+            for y in (top - 41, top - 40, top - 21, top - 20, top - 1, top, bottom - 1, bottom, bottom + 1):
+                for w, h in ((40, 40), (41, 21), (0, 0), (1, 1)):
+                    boxes.append((x, y, w, h))
+        # Larger than the zone, and far away
+        boxes += [(left - 5, top - 5, right - left + 10, bottom - top + 10), (0, 0, 10, 10)]
+        return boxes
+
+    def test_vectorized_zone_test_matches_the_scalar_one(self):
+        rng = np.random.default_rng(11)
+        left, top, right, bottom = self.zone
+        random_boxes = np.column_stack([
+            rng.integers(left - 80, right + 80, 500), rng.integers(top - 80, bottom + 80, 500),
+            rng.integers(0, 80, 500), rng.integers(0, 80, 500)
+        ])
+        cases = {
+            'boundary': np.array(self.boundary_boxes()),
+            'random': random_boxes,
+            'empty frame': np.zeros((0, 4), dtype=np.int32),
+            'single box': np.array([[left - 10, top - 30, 20, 30]]),
+        }
+        for name, boxes in cases.items():
+            with self.subTest(name):
+                flags = self.detector.is_in_counting_zone(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3])
+                self.assertEqual(flags.shape, (len(boxes),))
+                self.assertEqual(flags.tolist(), [scalar_in_zone(self.zone, *box) for box in boxes.tolist()])
+        # Plain numbers still work for a single box
+        for box in self.boundary_boxes():
+            self.assertEqual(bool(self.detector.is_in_counting_zone(*box)), scalar_in_zone(self.zone, *box))
+
+    def test_entry_points_match_a_scan_of_the_track_history(self):
+        detector = self.detector
+        left, top, right, bottom = self.zone
+        rng = np.random.default_rng(5)
+        # Tracks walking in and out of the zone, their centers often on its edges, some frames empty
+        positions = {track_id: [left + 20 * track_id, top - 30] for track_id in (1, 2, 3)}
+        for frame_number in range(200):
+            rows = []
+            for track_id, position in positions.items():
+                position[0] = int(np.clip(position[0] + rng.choice([-20, 0, 20]), left - 60, right + 60))
+                position[1] = int(np.clip(position[1] + rng.choice([-10, 0, 10]), top - 60, bottom + 60))
+                if rng.random() < 0.8:
+                    x, y = position
+                    rows.append([x - 10, y - 10, x + 10, y + 10, track_id, 0.9, 2])
+            if frame_number % 37 == 0:
+                rows = []
+            batch = DetectionBatch.from_boxes(np.array(rows, dtype=np.float32).reshape(-1, 7), {}, True)
+            _, detections = detector._process_tracking_result(batch, frame_number)
+            for track_id, _, _, _, in_zone, entry in detections.rows():
+                expected = scalar_entry_point(self.zone, detector.track_history[track_id]) if in_zone else None
+                self.assertEqual(entry, expected)
+
+
+class MotionFrameSchedulerTests(SimpleTestCase):
+    zone = {'top': 120, 'bottom': 220, 'left': 270, 'right': 370}
+
+    def scheduler(self, **kwargs):
+        scheduler = MotionFrameScheduler(**kwargs)
+        scheduler.set_zone(self.zone, (360, 640, 3))
+        return scheduler
+
+    def road(self, block_at=None):
+        frame = np.full((360, 640, 3), 90, dtype=np.uint8)
+        if block_at is not None:
+            x, y = block_at
+            frame[y:y + 20, x:x + 20] = 255
+        return frame
+
+    def inferred(self, scheduler, frames, visible=None):
+        visible = visible or [False] * len(frames)
+        return [i for i, frame in enumerate(frames) if scheduler.should_infer(frame, i, visible[i])]
+
+    def test_static_empty_road_is_inferred_every_max_skip_frames(self):
+        scheduler = self.scheduler(max_skip=5)
+        self.assertEqual(self.inferred(scheduler, [self.road()] * 23), [0, 5, 10, 15, 20])
+        self.assertEqual(scheduler.get_stats()['frames_skipped'], 18)
+
+    def test_frames_after_visible_vehicles_are_always_inferred(self):
+        scheduler = self.scheduler(max_skip=50)
+        visible = [False] * 5 + [True] * 10 + [False] * 5
+        self.assertEqual(self.inferred(scheduler, [self.road()] * 20, visible), [0] + list(range(5, 15)))
+        self.assertEqual(scheduler.track_triggers, 10)
+
+    def test_motion_near_the_zone_triggers_inference(self):
+        # A small block moving inside the zone; the same block far from it barely changes the whole frame
+        for start, expected in (((280, 150), list(range(8))), ((20, 320), [0])):
+            scheduler = self.scheduler(max_skip=50)
+            frames = [self.road((start[0] + 12 * i, start[1])) for i in range(8)]
+            self.assertEqual(self.inferred(scheduler, frames), expected)
+
+    def test_never_skips_more_than_max_skip_frames(self):
+        rng = np.random.default_rng(2)
+        for max_skip in (1, 3, 8):
+            scheduler = self.scheduler(max_skip=max_skip, motion_threshold=4.0)
+            frames, visible = [], []
+            for i in range(150):
+                noise = rng.integers(0, 3 if rng.random() < 0.9 else 60, (360, 640, 3), dtype=np.uint8)
+                frames.append(self.road() + noise)
+                visible.append(bool(rng.random() < 0.1))
+            inferred = self.inferred(scheduler, frames, visible)
+            self.assertEqual(inferred[0], 0)
+            self.assertLessEqual(max(np.diff(inferred + [len(frames)])), max_skip)
+            for i in range(1, len(frames)):
+                if visible[i]:
+                    self.assertIn(i, inferred)
+
+
+class StreamWindowsTests(SimpleTestCase):
+    def test_windows_follow_the_clock(self):
+        windows = []
+        stream = StreamWindows(windows.append, window_seconds=60, rolling_seconds=120)
+        empty = DetectionBatch.empty()
+        for timestamp, totals, approaches in [
+            (0, {}, {}), (30, {'car': 2}, {}),
+            (61, {'car': 3}, {'north': {'car': 1}}), (125, {'car': 5}, {'north': {'car': 1}}),
+            (190, {'car': 6, 'bus': 1}, {'north': {'car': 1}})
+        ]:
+            stream.advance(timestamp, totals, approaches, 4)
+            stream.add_frame(timestamp, 2, empty)
+
+        self.assertEqual([w['start'].timestamp() for w in windows], [0, 60, 120])
+        self.assertEqual([w['vehicle_counts'] for w in windows], [{'car': 3}, {'car': 2}, {'car': 1, 'bus': 1}])
+        self.assertEqual([w['approach_counts'] for w in windows], [{'north': {'car': 1}}, {}, {}])
+        self.assertEqual([w['rolling_counts'] for w in windows], [{'car': 3}, {'car': 5}, {'car': 3, 'bus': 1}])
+        self.assertEqual([w['frames'] for w in windows], [2, 1, 1])
+
+        last = stream.flush({'car': 8, 'bus': 1}, {}, 0, partial=True)
+        self.assertEqual((last['vehicle_counts'], last['partial']), ({'car': 2}, True))
+        # Nothing more to report
+        self.assertIsNone(stream.flush({'car': 8, 'bus': 1}, {}, 0))
+        self.assertEqual(stream.windows, 4)
+
+
+class AnalysisCheckpointTests(SimpleTestCase):
+    def setUp(self):
+        from ultralytics.trackers.basetrack import BaseTrack
+
+        self.directory = os.path.join(tempfile.mkdtemp(), 'checkpoint')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.directory), ignore_errors=True)
+        self.addCleanup(setattr, BaseTrack, '_count', BaseTrack._count)
+
+    def recorder(self):
+        return DetectionRecorder(object(), 25, 640, 360)
+
+    def test_save_and_resume(self):
+        from ultralytics.trackers.basetrack import BaseTrack
+
+        checkpoint = AnalysisCheckpoint(self.directory, 60)
+        self.assertIsNone(checkpoint.load(self.recorder()))
+        recorder = self.recorder()
+        car = DetectionBatch.from_boxes([[0, 0, 10, 10, 1, 0.9, 2]], {2: 'car'}, True)
+        recorder.add_frame(0, 0, 1, 0, car)
+        BaseTrack._count = 41
+        checkpoint.save(1, {'vehicle_counts': {'car': 0}}, recorder)
+        recorder.add_frame(1, 1, 1, 1, car)
+        checkpoint.save(2, {'vehicle_counts': {'car': 1}}, recorder)
+
+        BaseTrack._count = 0
+        resumed = AnalysisCheckpoint(self.directory, 60)
+        restored = self.recorder()
+        self.assertEqual(resumed.load(restored), (2, {'vehicle_counts': {'car': 1}}))
+        self.assertEqual(BaseTrack._count, 41)
+        self.assertEqual(list(restored.frame_index), [0, 1])
+        self.assertEqual(restored.detection_count, 2)
+        self.assertEqual(resumed.describe()['resumed_from_frame'], 2)
+        resumed.clear()
+        self.assertFalse(os.path.exists(self.directory))
+
+    def test_unreadable_checkpoint_is_ignored(self):
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, 'state.pkl'), 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertIsNone(AnalysisCheckpoint(self.directory, 60).load(self.recorder()))
+
+
+class ChunkedUploadTests(MediaRootTestCase):
+    content = bytes(range(256)) * 10
+
+    def setUp(self):
+        super().setUp()
+        profile = ProcessingProfile.objects.create(
+            name='highway', display_name='Highway',
+            detector_module='ml.vehicle_detector', detector_class='RTXVehicleDetector'
+        )
+        self.location = Location.objects.create(name='gate', display_name='Gate', processing_profile=profile)
+        self.submitted = []
+        queue_patch = mock.patch('trapickapp.jobs.get_job_queue', return_value=mock.Mock(submit=self.submitted.append))
+        queue_patch.start()
+        self.addCleanup(queue_patch.stop)
+
+    def upload(self, order):
+        session = uploads.create_upload_session('clip.mp4', len(self.content), self.location, chunk_size=1000)
+        for index in order:
+            chunk = self.content[index * 1000:(index + 1) * 1000]
+            uploads.receive_chunk(session, index, io.BytesIO(chunk), sha256(chunk))
+        return session
+
+    def test_upload_is_queued_once_complete(self):
+        session = self.upload([2, 0])
+        self.assertEqual(session.total_chunks, 3)
+        self.assertEqual(uploads.missing_chunks(session), [1])
+        uploads.receive_chunk(session, 1, io.BytesIO(self.content[1000:2000]), sha256(self.content[1000:2000]))
+        self.assertEqual(uploads.missing_chunks(session), [])
+
+        video, job, reused = uploads.finish_upload(session)
+        self.assertIsNone(reused)
+        self.assertEqual(self.submitted, [job])
+        self.assertEqual((job.video_file, job.location), (video, self.location))
+        self.assertEqual(video.content_hash, sha256(self.content))
+        self.assertEqual(video.analysis_fingerprint, uploads.analysis_fingerprint(self.location))
+        with open(os.path.join(self.media_root, video.file_path.name), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        # A second request for the same session does nothing
+        self.assertIsNone(uploads.finish_upload(session))
+
+    def test_same_content_reuses_the_stored_file(self):
+        first, _, _ = uploads.finish_upload(self.upload([0, 1, 2]))
+        session = self.upload([0, 1, 2])
+        second, _, _ = uploads.finish_upload(session)
+        self.assertEqual(second.file_path.name, first.file_path.name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'videos')), [os.path.basename(first.file_path.name)])
+
+    def complete(self, video, total_vehicles=7):
+        """Finish ``video``'s analysis as a worker would, with stored detections"""
+        self.media_file('detections/clip.npz', b'detections')
+        TrafficAnalysis.objects.create(video_file=video, location=self.location, total_vehicles=total_vehicles)
+        video.processing_status = 'completed'
+        video.processed_at = timezone.now()
+        video.detections_path = 'detections/clip.npz'
+        video.save()
+
+    def test_identical_upload_reuses_the_analysis(self):
+        first, job, _ = uploads.finish_upload(self.upload([0, 1, 2]))
+        self.complete(first)
+
+        second, second_job, reused = uploads.finish_upload(self.upload([2, 1, 0]))
+        self.assertIsNone(second_job)
+        self.assertEqual(reused, first)
+        self.assertEqual(self.submitted, [job])
+        self.assertEqual(second.duplicate_of, first)
+        self.assertEqual((second.processing_status, second.detections_path), ('completed', 'detections/clip.npz'))
+        analysis = second.traffic_analysis
+        self.assertNotEqual(analysis.id, first.traffic_analysis.id)
+        self.assertEqual((analysis.total_vehicles, analysis.metrics_summary['reused_from']), (7, str(first.id)))
+        # A third copy points at the original, not at the duplicate
+        third, _, _ = uploads.finish_upload(self.upload([0, 1, 2]))
+        self.assertEqual(third.duplicate_of, first)
+
+    def test_other_analysis_settings_are_not_reused(self):
+        first, _, _ = uploads.finish_upload(self.upload([0, 1, 2]))
+        self.complete(first)
+
+        profile = ProcessingProfile.objects.create(
+            name='junction', display_name='Junction', detector_module='ml.vehicle_detector',
+            detector_class='RTXVehicleDetector', config_parameters={'batch_size': 4}
+        )
+        self.location = Location.objects.create(name='junction', display_name='Junction', processing_profile=profile)
+        second, job, reused = uploads.finish_upload(self.upload([0, 1, 2]))
+        self.assertIsNone(reused)
+        self.assertEqual(self.submitted[-1], job)
+        self.assertIsNone(second.duplicate_of)
+        self.assertNotEqual(second.analysis_fingerprint, first.analysis_fingerprint)
+        # Only the analysis is redone; the bytes are still stored once
+        self.assertEqual(second.file_path.name, first.file_path.name)
+
+    def test_deleting_the_original_keeps_the_shared_files(self):
+        first, _, _ = uploads.finish_upload(self.upload([0, 1, 2]))
+        self.complete(first)
+        second, _, _ = uploads.finish_upload(self.upload([0, 1, 2]))
+
+        response = self.client.delete(f'/api/videos/{first.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(VideoFile.objects.filter(id=first.id).exists())
+        second.refresh_from_db()
+        self.assertIsNone(second.duplicate_of)
+        with open(second.file_path.path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertTrue(os.path.isfile(os.path.join(self.media_root, second.detections_path)))
+        self.assertEqual(second.traffic_analysis.total_vehicles, 7)
+
+        # The last upload using them takes the files along
+        self.client.delete(f'/api/videos/{second.id}/')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'videos')), [])
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'detections')), [])
+
+    def test_short_chunk_is_rejected(self):
+        session = uploads.create_upload_session('clip.mp4', len(self.content), self.location, chunk_size=1000)
+        with self.assertRaises(ValueError):
+            uploads.receive_chunk(session, 0, io.BytesIO(self.content[:10]), sha256(self.content[:1000]))
+        with self.assertRaises(ValueError):
+            uploads.receive_chunk(session, 3, io.BytesIO(b''), sha256(b''))
+        self.assertEqual(uploads.missing_chunks(session), [0, 1, 2])
+
+    def test_abort_removes_the_partial_file(self):
+        session = self.upload([0])
+        self.assertTrue(uploads.abort_upload(session))
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'videos')), [])
+        self.assertEqual((session.status, session.chunks.count()), ('aborted', 0))
+        self.assertFalse(uploads.abort_upload(session))
+
+
+class DashboardAggregationTests(TestCase):
+    """The grouped queries give what the per-row loops they replaced computed"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+        midnight = timezone.make_aware(datetime.combine(self.today, time.min))
+        self.types = {name: VehicleType.objects.create(name=name) for name in ('car', 'truck', 'bus')}
+        self.video = VideoFile.objects.create(filename='clip.mp4', file_path='videos/clip.mp4', processed=True)
+
+        # Analyses today, 2, 3, 5 and 8 days ago; yesterday only has detections
+        for days_ago, cars, trucks in [(0, 5, 1), (0, 2, 0), (2, 7, 3), (3, 1, 1), (5, 4, 0), (8, 9, 9)]:
+            video = VideoFile.objects.create(filename=f'{days_ago}.mp4', file_path=f'videos/{days_ago}.mp4')
+            TrafficAnalysis.objects.create(
+                video_file=video, analyzed_at=self.now - timedelta(days=days_ago),
+                car_count=cars, truck_count=trucks, total_vehicles=cars + trucks
+            )
+        for day, hour, minute, vehicle, confidence in [
+            (0, 8, 10, 'car', 0.5), (0, 8, 20, 'car', 0.75), (0, 8, 40, 'bus', 1.0),
+            (0, 17, 5, 'car', 0.25), (0, 17, 15, 'truck', 0.5), (0, 17, 25, 'truck', 0.5),
+            (-1, 17, 30, 'car', 0.5), (-1, 17, 45, 'truck', 1.0), (-1, 9, 0, 'car', 0.5),
+        ]:
+            Detection.objects.create(
+                video_file=self.video, vehicle_type=self.types[vehicle], frame_number=0, confidence=confidence,
+                timestamp=midnight + timedelta(days=day, hours=hour, minutes=minute),
+                bbox_x=0, bbox_y=0, bbox_width=1, bbox_height=1
+            )
+
+    def test_weekly_data(self):
+        one_week_ago = self.now - timedelta(days=7)
+        analyses = TrafficAnalysis.objects.filter(analyzed_at__gte=one_week_ago)
+        expected = [
+            sum(a.total_vehicles for a in analyses if a.analyzed_at.date() == (one_week_ago + timedelta(days=i)).date())
+            for i in range(7)
+        ]
+        self.assertEqual(services.calculate_real_weekly_data(), expected)
+        # The seven days before today: 2, 3 and 5 days ago
+        self.assertEqual(sum(expected), 16)
+
+    def test_vehicle_stats_fall_back_to_detections(self):
+        stats = services.calculate_real_vehicle_stats()
+        self.assertEqual(stats['today'], dict(aggregations.empty_vehicle_counts(), cars=7, trucks=1))
+        self.assertEqual(stats['yesterday'], dict(aggregations.empty_vehicle_counts(), cars=2, trucks=1))
+
+    def test_hourly_summary_and_day_hour_rows(self):
+        self.assertEqual(services.calculate_hourly_traffic_summary(), {'08:00': 3, '17:00': 3})
+        expected = Counter((d.timestamp.date(), d.timestamp.hour) for d in Detection.objects.all())
+        rows = aggregations.detections_per_day_and_hour(Detection.objects.all())
+        self.assertEqual({(day, hour): count for day, hour, count in rows}, dict(expected))
+
+    def test_peak_hour(self):
+        peak = services.get_peak_hours_analysis()
+        self.assertEqual((peak['peak_hour'], peak['peak_hour_count']), ('17:00', 5))
+        self.assertAlmostEqual(peak['average_confidence'], 0.55)
+
+    def test_peak_hour_ties_go_to_the_earliest_hour(self):
+        peak = aggregations.busiest_hour_of_day(Detection.objects.filter(timestamp__date=self.today))
+        self.assertEqual((peak['hour'], peak['count']), (8, 3))
+        self.assertAlmostEqual(peak['average_confidence'], 0.75)
+        self.assertIsNone(aggregations.busiest_hour_of_day(Detection.objects.none()))
+
+    def test_overview_counts(self):
+        day_ago = self.now - timedelta(hours=24)
+        processed = VideoFile.objects.filter(processed=True).count()
+        self.assertEqual(services.get_system_overview_stats(), {
+            'total_videos': VideoFile.objects.count(),
+            'processed_videos': processed,
+            'total_analyses': TrafficAnalysis.objects.count(),
+            'total_detections': Detection.objects.count(),
+            'recent_analyses_count': TrafficAnalysis.objects.filter(analyzed_at__gte=day_ago).count(),
+            'recent_detections_count': Detection.objects.filter(timestamp__gte=day_ago).count(),
+            'processing_success_rate': processed / VideoFile.objects.count() * 100
+        })
+
+
+class BlockDetector:
+    """Stand-in for a YOLO model: every bright block in a frame is a car with confidence 0.9"""
+
+    def __init__(self, fail_after=None):
+        self.frames = 0
+        self.fail_after = fail_after
+
+    def predict(self, inputs, **kwargs):
+        import cv2
+        from ultralytics.engine.results import Boxes
+
+        results = []
+        for frame in inputs:
+            if self.fail_after is not None and self.frames >= self.fail_after:
+                raise RuntimeError("worker crashed")
+            self.frames += 1
+            count, _, stats, _ = cv2.connectedComponentsWithStats((frame[..., 0] > 128).astype(np.uint8))
+            rows = [[x, y, x + w, y + h, 0.9, 2] for x, y, w, h, _ in stats[1:count]]
+            results.append(SimpleNamespace(boxes=Boxes(np.array(rows, dtype=np.float32).reshape(-1, 6), frame.shape[:2])))
+        return results
+
+
+def block_frames(count, size=(160, 120), blocks=((40, 5, 5),)):
+    """Black frames with 20x20 white blocks at (y, x of the first frame, x step per frame)"""
+    width, height = size
+    for i in range(count):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        for y, x, step in blocks:
+            frame[y:y + 20, x + step * i:x + step * i + 20] = 255
+        yield frame
+
+
+def write_video(path, frames, fps=25):
+    import cv2
+
+    frames = list(frames)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frames[0].shape[1::-1])
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class BlockVideoJobTestCase(MediaRootTestCase):
+    """An analysis job for a short block video at a location, with BlockDetector as the model"""
+
+    def setUp(self):
+        from ultralytics.trackers.basetrack import BaseTrack
+
+        super().setUp()
+        self.addCleanup(setattr, BaseTrack, '_count', BaseTrack._count)
+        # Checkpoints go to media/checkpoints under the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.media_root)
+
+        self.video_path = write_video(os.path.join(self.media_root, 'videos', 'clip.mp4'), block_frames(30))
+        profile = ProcessingProfile.objects.create(
+            name='highway', display_name='Highway', detector_module='ml.vehicle_detector',
+            detector_class='RTXVehicleDetector', config_parameters={
+                'checkpoint_interval': 1e-9, 'batch_size': 1, 'pipelined': False, 'shard_workers': 1,
+                'adaptive_skip': False, 'spill_frame_records': False
+            }
+        )
+        location = Location.objects.create(name='gate', display_name='Gate', processing_profile=profile)
+        video = VideoFile.objects.create(filename='clip.mp4', file_path='videos/clip.mp4')
+        self.job = ProcessingJob.objects.create(video_file=video, location=location, video_path=self.video_path)
+
+        self.model = BlockDetector()
+        registry_patch = mock.patch(
+            'ml.vehicle_detector.model_registry.get',
+            return_value=SimpleNamespace(model=self.model, lock=threading.Lock())
+        )
+        registry_patch.start()
+        self.addCleanup(registry_patch.stop)
+
+
+class RenditionsAfterAnalysisTests(BlockVideoJobTestCase):
+    def test_default_settings_queue_renditions_from_stored_detections(self):
+        submitted = []
+        with mock.patch('trapickapp.jobs.get_job_queue', return_value=mock.Mock(submit=submitted.append)), \
+                mock.patch('trapickapp.renditions.find_ffmpeg', return_value='/usr/bin/ffmpeg'):
+            run_job(self.job.id)
+
+        video = self.job.video_file
+        video.refresh_from_db()
+        # On-demand rendering: detections are stored, no processed video is written
+        self.assertTrue(video.detections_path)
+        self.assertFalse(video.processed_video_path)
+        renditions = ProcessingJob.objects.get(kind='renditions')
+        self.assertEqual((renditions.video_file_id, renditions.priority), (video.id, -1))
+        self.assertEqual(submitted, [renditions])
+
+
+class CheckpointResumeTests(BlockVideoJobTestCase):
+    def setUp(self):
+        super().setUp()
+        self.model.fail_after = 12
+
+    def test_failed_job_is_retried_from_its_checkpoint(self):
+        run_job(self.job.id)
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.error_message), ('failed', 'worker crashed'))
+        self.assertEqual(len(os.listdir('media/checkpoints')), 1)
+
+        output = io.StringIO()
+        call_command('requeue_jobs', '--failed', stdout=output)
+        self.assertIn('1 job(s) queued', output.getvalue())
+        # A running server's sweep hands the job to its workers, once
+        job_queue = LocalJobQueue()
+        self.assertEqual([job.id for job in job_queue.sweep()], [self.job.id])
+        self.assertEqual(job_queue.sweep(), [])
+
+        self.model.fail_after = None
+        self.model.frames = 0
+        run_job(self.job.id)
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts), ('completed', 2))
+        # Only the frames after the checkpoint went through the model again
+        self.assertEqual(self.model.frames, 18)
+        analysis = TrafficAnalysis.objects.get(video_file=self.job.video_file)
+        self.assertEqual(analysis.analysis_data['performance']['checkpoints']['resumed_from_frame'], 12)
+        self.assertEqual(os.listdir('media/checkpoints'), [])
+
+
+class BatchedTrackingTests(SimpleTestCase):
+    def setUp(self):
+        from ultralytics.trackers.basetrack import BaseTrack
+
+        self.addCleanup(setattr, BaseTrack, '_count', BaseTrack._count)
+        registry_patch = mock.patch(
+            'ml.vehicle_detector.model_registry.get',
+            return_value=SimpleNamespace(model=BlockDetector(), lock=threading.Lock())
+        )
+        registry_patch.start()
+        self.addCleanup(registry_patch.stop)
+
+    def track(self, frames, batch_size):
+        from ultralytics.trackers.basetrack import BaseTrack
+        from ml.vehicle_detector import RTXVehicleDetector
+
+        BaseTrack._count = 0
+        detector = RTXVehicleDetector(adaptive_skip=False)
+        detector.setup_counting_zone(frames[0].shape)
+        track_ids = []
+        for start in range(0, len(frames), batch_size):
+            for _, detections in detector.detect_and_track_batch(frames[start:start + batch_size], start):
+                track_ids.append(sorted(detections.track_ids.tolist()))
+        return track_ids, dict(detector.vehicle_counts)
+
+    def test_batch_size_does_not_change_ids_or_counts(self):
+        # One block drifting right through the zone, one entering from the right edge and drifting left
+        frames = list(block_frames(40, blocks=((38, 5, 3), (70, 170, -4))))
+        track_ids, counts = self.track(frames, 1)
+        self.assertEqual(counts, {'car': 2})
+        for batch_size in (4, 7):
+            self.assertEqual(self.track(frames, batch_size), (track_ids, counts))
+
+    def test_lost_tracks_are_kept_for_the_same_time_at_any_frame_rate(self):
+        from ml.vehicle_detector import RTXVehicleDetector
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # bytetrack.yaml keeps lost tracks for 30 frames at 30 fps; a fixed skip feeds the tracker fewer frames
+        for fps, adaptive_skip, every_n, frames_lost in ((10, True, 1, 10), (60, True, 1, 60), (60, False, 2, 30)):
+            detector = RTXVehicleDetector(adaptive_skip=adaptive_skip)
+            with mock.patch('ml.vehicle_detector.Config.PROCESS_EVERY_N_FRAMES', every_n):
+                source = detector._open_frame_source(
+                    write_video(os.path.join(directory, f'clip{fps}.mp4'), block_frames(3), fps=fps)
+                )
+            source.release()
+            self.assertEqual(detector._get_tracker().tracker.max_time_lost, frames_lost)
+
+
+class FrameSourceTests(SimpleTestCase):
+    def setUp(self):
+        import cv2
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        frames = []
+        for i in range(12):
+            frame = np.full((240, 320, 3), 10 + 15 * i, dtype=np.uint8)
+            frame[60:80, 40 + 10 * i:60 + 10 * i] = 255
+            frames.append(frame)
+        self.path = write_video(os.path.join(directory, 'clip.mp4'), frames)
+        # What a plain capture decodes, frame by frame
+        cap = cv2.VideoCapture(self.path)
+        self.decoded = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            self.decoded.append(frame)
+        cap.release()
+
+    def source(self, *view):
+        source = FrameSource(self.path)
+        self.addCleanup(source.release)
+        if view:
+            source.set_view(*view)
+        return source
+
+    def test_views_are_cropped_and_shrunk_and_map_back(self):
+        import cv2
+
+        source = self.source((40, 20, 200, 140), 80)
+        self.assertEqual((source.view_size, source.view_scale, source.view_offset), ((80, 60), 0.5, (40, 20)))
+        source.allocate(2)
+        for i in range(3):
+            ret, view = source.read()
+            self.assertTrue(ret)
+            expected = cv2.resize(self.decoded[i][20:140, 40:200], (80, 60), interpolation=cv2.INTER_AREA)
+            self.assertTrue(np.array_equal(view, expected))
+            self.assertTrue(np.array_equal(source.full_frame(view), self.decoded[i]))
+
+            # The white block, found in the view, lands on the block in the full frame
+            ys, xs = np.nonzero(view[..., 0] > 200)
+            box = [[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9, 2]]
+            batch = DetectionBatch.from_boxes(box, {}, False, view_scale=source.view_scale, view_offset=source.view_offset)
+            x1, y1, w, h = batch.bboxes[0].tolist()
+            self.assertLessEqual(abs(x1 - (40 + 10 * i)), 2)
+            self.assertLessEqual(abs(y1 - 60), 2)
+            self.assertLessEqual(abs(w - 20), 4)
+        zone = source.zone_to_view({'top': 60, 'bottom': 140, 'left': 40, 'right': 200})
+        self.assertEqual(zone, {'top': 20, 'bottom': 60, 'left': 0, 'right': 80})
+
+    def test_crop_without_shrinking_is_a_slice_of_the_frame(self):
+        source = self.source((100, 50, 300, 200))
+        self.assertEqual((source.view_size, source.view_scale), ((200, 150), 1.0))
+        ret, view = source.read()
+        self.assertTrue(np.array_equal(view, self.decoded[0][50:200, 100:300]))
+        self.assertIs(view.base, source.full_frame(view))
+
+    def test_buffers_in_flight_are_not_overwritten(self):
+        # Three buffers: two frames are still held downstream when the next one is read
+        for view in ((), ((40, 20, 200, 140), 80)):
+            source = self.source(*view)
+            source.allocate(3)
+            in_flight = []
+            for i in range(len(self.decoded)):
+                ret, frame = source.read()
+                self.assertTrue(ret)
+                in_flight = in_flight[-2:] + [(i, frame, frame.copy())]
+                for j, held, copy in in_flight:
+                    self.assertTrue(np.array_equal(held, copy))
+                    self.assertTrue(np.array_equal(source.full_frame(held), self.decoded[j]))
+            self.assertEqual(source.read(), (False, None))
+
+    def test_empty_region_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.source((50, 50, 50, 100))
@@ -0,0 +1,325 @@
+# trapickapp/uploads.py
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from .jobs import enqueue_video
+from .models import VideoFile, UploadSession, UploadChunk
+from .progress import ProgressTracker
+
+DEFAULT_UPLOAD_SETTINGS = {
+    'CHUNK_SIZE_MB': 8,         # default chunk size of resumable uploads
+    'MAX_CHUNK_SIZE_MB': 64,    # largest chunk a client may ask for
+    'SESSION_TTL_HOURS': 48,    # unfinished uploads idle this long are aborted and their file removed
+}
+
+COPY_BLOCK_SIZE = 1024 * 1024
+# Chunks are verified in memory up to this size, in a temporary file above it
+CHUNK_SPOOL_SIZE = 8 * 1024 * 1024
+
+# Running SHA-256 of uploads whose chunks arrive in order: session id -> (next offset, hash)
+_content_hashes = {}
+_content_hashes_lock = threading.Lock()
+
+
+def get_upload_settings():
+    config = dict(DEFAULT_UPLOAD_SETTINGS)
+    config.update(getattr(settings, 'TRAPICK_UPLOAD', {}))
+    return config
+
+
+def save_upload(uploaded_file, storage=None):
+    """Write an upload under videos/ while hashing it; returns (stored name, SHA-256).
+
+    When a file with the same content is already stored, the new copy is
+    discarded and the stored name is returned instead.
+    """
+    storage = storage or FileSystemStorage()
+    os.makedirs(storage.path('videos'), exist_ok=True)
+    incoming_path = storage.path(f'videos/.incoming-{uuid.uuid4().hex}')
+    digest = hashlib.sha256()
+    try:
+        with open(incoming_path, 'wb') as f:
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+                f.write(chunk)
+        content_hash = digest.hexdigest()
+
+        existing = stored_copy(content_hash, storage)
+        if existing:
+            print(f"♻️ Identical video already stored as {existing}")
+            return existing, content_hash
+        name = storage.get_available_name(f'videos/{uploaded_file.name}')
+        os.replace(incoming_path, storage.path(name))
+        return name, content_hash
+    finally:
+        if os.path.exists(incoming_path):
+            os.remove(incoming_path)
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stored_copy(content_hash, storage):
+    """Name of a stored upload with this content, if one is still on disk"""
+    names = VideoFile.objects.filter(content_hash=content_hash).values_list('file_path', flat=True).distinct()
+    return next((name for name in names if name and storage.exists(name)), None)
+
+
+def analysis_fingerprint(location):
+    """Hash of everything that decides a location's counts: detector class, profile config and zones"""
+    profile = location.processing_profile
+    settings = {
+        'detector': f"{profile.detector_module}.{profile.detector_class}",
+        'config': profile.config_parameters,
+        'overrides': location.get_detector_overrides()
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def find_reusable_analysis(content_hash, fingerprint, analysis_only=False):
+    """Latest completed upload of the same content analysed with the same settings"""
+    candidates = VideoFile.objects.filter(
+        content_hash=content_hash, analysis_fingerprint=fingerprint,
+        processing_status='completed', traffic_analysis__isnull=False
+    ).select_related('traffic_analysis').order_by('-processed_at')
+    for video in candidates:
+        # Without a processed video or stored detections there is nothing to show
+        if analysis_only or video.processed_video_path or video.detections_path:
+            return video
+    return None
+
+
+def reuse_analysis(source, video_obj, location):
+    """Complete ``video_obj`` with a copy of ``source``'s analysis and its processed video"""
+    analysis = source.traffic_analysis
+    analysis.id = uuid.uuid4()
+    analysis._state.adding = True
+    analysis.video_file = video_obj
+    analysis.location = location
+    analysis.metrics_summary = dict(analysis.metrics_summary or {}, reused_from=str(source.id))
+    analysis.save()
+
+    video_obj.duplicate_of = source.duplicate_of or source
+    video_obj.processed_video_path = source.processed_video_path
+    video_obj.detections_path = source.detections_path
+    video_obj.duration_seconds = source.duration_seconds
+    video_obj.fps = source.fps
+    video_obj.total_frames = source.total_frames
+    video_obj.resolution = source.resolution
+    video_obj.processed = True
+    video_obj.processing_status = 'completed'
+    video_obj.processed_at = timezone.now()
+    video_obj.save()
+    print(f"♻️ Reused analysis of {source.id} for {video_obj.id}")
+    return analysis
+
+
+def file_in_use(video_obj, field, name):
+    """Whether another upload still references ``name`` through ``field`` (deduplicated storage)"""
+    return bool(name) and VideoFile.objects.exclude(id=video_obj.id).filter(**{field: name}).exists()
+
+
+def queue_or_reuse(video_obj, video_path, location, priority=0, analysis_only=False):
+    """Reuse a finished analysis of the same content and settings, or queue the video.
+
+    Returns (job, reused upload); exactly one of them is None.
+    """
+    progress_tracker = ProgressTracker(str(video_obj.id))
+    # The same video analysed with the same settings: reuse that analysis instead of running YOLO again
+    source = find_reusable_analysis(video_obj.content_hash, video_obj.analysis_fingerprint, analysis_only)
+    if source is not None:
+        reuse_analysis(source, video_obj, location)
+        progress_tracker.set_progress(100, "Identical video already analysed - results reused")
+        progress_tracker.complete_processing("Video analysis completed!")
+        return None, source
+
+    progress_tracker.set_progress(10, "Video uploaded, waiting for a processing worker...")
+    return enqueue_video(video_obj, video_path, location, priority=priority, analysis_only=analysis_only), None
+
+
+# ==================== RESUMABLE UPLOADS ====================
+
+def create_upload_session(filename, size, location, chunk_size=None, storage=None, **metadata):
+    """Reserve the final file for a chunked upload and return its UploadSession.
+
+    The file is created at its full size (sparse where the filesystem allows)
+    so chunks can be written at their offsets in any order.
+    """
+    storage = storage or FileSystemStorage()
+    config = get_upload_settings()
+    max_chunk_size = config['MAX_CHUNK_SIZE_MB'] * 1024 * 1024
+    chunk_size = min(int(chunk_size or config['CHUNK_SIZE_MB'] * 1024 * 1024), max_chunk_size)
+    if size <= 0 or chunk_size <= 0:
+        raise ValueError('size and chunk_size must be positive')
+
+    expire_upload_sessions(storage)
+
+    os.makedirs(storage.path('videos'), exist_ok=True)
+    name = storage.get_available_name(f'videos/{os.path.basename(filename)}')
+    with open(storage.path(name), 'xb') as f:
+        f.truncate(size)
+
+    session = UploadSession.objects.create(
+        filename=filename, file_path=name, size=size, chunk_size=chunk_size, location=location, **metadata
+    )
+    print(f"📤 Upload session {session.id}: {filename} ({size} bytes in {session.total_chunks} chunks)")
+    return session
+
+
+def receive_chunk(session, index, stream, expected_sha256, storage=None):
+    """Verify chunk ``index`` from ``stream`` and write it into the upload's file.
+
+    The chunk is hashed into a scratch buffer and only written to its offset
+    and recorded as received when its SHA-256 matches ``expected_sha256``, so
+    a corrupt resend never overwrites a chunk that was already good. A
+    mismatched chunk is simply sent again. Returns the SHA-256 of the bytes
+    received.
+    """
+    storage = storage or FileSystemStorage()
+    if not 0 <= index < session.total_chunks:
+        raise ValueError(f"chunk index must be between 0 and {session.total_chunks - 1}")
+    offset, length = session.chunk_range(index)
+
+    # Chunks that continue the in-order prefix also feed the whole-file hash
+    with _content_hashes_lock:
+        prefix = _content_hashes.get(session.id)
+        if prefix is not None and prefix[0] == offset:
+            content_hash = _content_hashes.pop(session.id)[1]
+        elif offset == 0 and prefix is None:
+            content_hash = hashlib.sha256()
+        else:
+            content_hash = None
+
+    digest = hashlib.sha256()
+    # The whole-file hash only takes the chunk once it is verified
+    extended_hash = content_hash.copy() if content_hash is not None else None
+    with tempfile.SpooledTemporaryFile(max_size=CHUNK_SPOOL_SIZE) as scratch:
+        remaining = length
+        while remaining:
+            block = stream.read(min(COPY_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if extended_hash is not None:
+                extended_hash.update(block)
+            scratch.write(block)
+            remaining -= len(block)
+
+        actual = digest.hexdigest()
+        verified = not remaining and actual == expected_sha256.lower()
+        if verified:
+            scratch.seek(0)
+            with open(storage.path(session.file_path), 'r+b') as f:
+                f.seek(offset)
+                shutil.copyfileobj(scratch, f, COPY_BLOCK_SIZE)
+
+    if verified:
+        UploadChunk.objects.get_or_create(session=session, index=index, defaults={'sha256': actual})
+        session.save(update_fields=['updated_at'])
+    if content_hash is not None:
+        with _content_hashes_lock:
+            _content_hashes[session.id] = (offset + length, extended_hash) if verified else (offset, content_hash)
+    if remaining:
+        raise ValueError(f"chunk {index} is {length} bytes, received {length - remaining}")
+    return actual
+
+
+def missing_chunks(session):
+    received = set(session.chunks.values_list('index', flat=True))
+    return [index for index in range(session.total_chunks) if index not in received]
+
+
+def finish_upload(session, storage=None):
+    """Turn a fully received upload into a VideoFile and queue (or reuse) its analysis.
+
+    Returns (video_obj, job, reused upload), or None when another request
+    already finished this session.
+    """
+    storage = storage or FileSystemStorage()
+    # Only one of several concurrent last chunks gets to finish the upload
+    claimed = UploadSession.objects.filter(id=session.id, status='uploading').update(
+        status='completed', completed_at=timezone.now()
+    )
+    if not claimed:
+        return None
+
+    # Analysis waits for the whole file, sharded or not (ml.sharded_analysis): an MP4's
+    # index (moov atom) usually sits at the end, so no segment decodes before the last chunk
+    try:
+        with _content_hashes_lock:
+            prefix = _content_hashes.pop(session.id, None)
+        if prefix is not None and prefix[0] == session.size:
+            content_hash = prefix[1].hexdigest()
+        else:
+            # Chunks arrived out of order or in another process
+            content_hash = hash_file(storage.path(session.file_path))
+
+        filename = session.file_path
+        existing = stored_copy(content_hash, storage)
+        if existing:
+            print(f"♻️ Identical video already stored as {existing}")
+            os.remove(storage.path(filename))
+            filename = existing
+
+        location = session.location
+        video_obj = VideoFile.objects.create(
+            filename=session.filename,
+            file_path=filename,
+            title=session.title or session.filename,
+            video_date=session.video_date,
+            video_start_time=session.video_start_time,
+            video_end_time=session.video_end_time,
+            processing_status='uploaded',
+            uploaded_at=timezone.now(),
+            content_hash=content_hash,
+            analysis_fingerprint=analysis_fingerprint(location)
+        )
+        session.status = 'completed'
+        session.file_path = filename
+        session.video_file = video_obj
+        session.save(update_fields=['status', 'file_path', 'video_file', 'updated_at'])
+        print(f"✅ Upload {session.id} complete: {filename} (sha256 {content_hash[:12]})")
+
+        job, source = queue_or_reuse(
+            video_obj, storage.path(filename), location, priority=session.priority, analysis_only=session.analysis_only
+        )
+        return video_obj, job, source
+    except Exception:
+        UploadSession.objects.filter(id=session.id).update(status='uploading', completed_at=None)
+        raise
+
+
+def abort_upload(session, storage=None):
+    """Stop an unfinished upload and remove its partial file"""
+    storage = storage or FileSystemStorage()
+    if session.status != 'uploading':
+        return False
+    with _content_hashes_lock:
+        _content_hashes.pop(session.id, None)
+    if storage.exists(session.file_path):
+        storage.delete(session.file_path)
+    session.status = 'aborted'
+    session.save(update_fields=['status', 'updated_at'])
+    session.chunks.all().delete()
+    print(f"🗑️ Aborted upload {session.id}")
+    return True
+
+
+def expire_upload_sessions(storage=None):
+    """Abort unfinished uploads that have been idle longer than SESSION_TTL_HOURS"""
+    cutoff = timezone.now() - timedelta(hours=get_upload_settings()['SESSION_TTL_HOURS'])
+    stale = UploadSession.objects.filter(status='uploading', updated_at__lt=cutoff)
+    return sum(abort_upload(session, storage) for session in stale)
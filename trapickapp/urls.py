@@ -4,6 +4,9 @@ from . import api_views
 urlpatterns = [
     # ==================== VIDEO PROCESSING ENDPOINTS ====================
     path('api/upload/video/', api_views.VideoUploadAPI.as_view(), name='upload_video'),
+    path('api/upload/sessions/', api_views.UploadSessionCreateAPI.as_view(), name='upload_session_create'),
+    path('api/upload/sessions/<uuid:session_id>/', api_views.UploadSessionAPI.as_view(), name='upload_session'),
+    path('api/upload/sessions/<uuid:session_id>/chunks/<int:index>/', api_views.UploadChunkAPI.as_view(), name='upload_chunk'),
     path('api/progress/<uuid:video_id>/', api_views.VideoProgressAPI.as_view(), name='video_progress'),
     path('api/analysis/<uuid:upload_id>/', api_views.AnalysisResultsAPI.as_view(), name='analysis_results'),
     
@@ -11,6 +14,8 @@ urlpatterns = [
     path('api/video/<uuid:video_id>/view/', api_views.ProcessedVideoViewAPI.as_view(), name='view_processed_video'),
     path('api/video/<uuid:video_id>/download/', api_views.ProcessedVideoDownloadAPI.as_view(), name='download_processed_video'),
     path('api/video/<uuid:video_id>/direct/', api_views.ProcessedVideoDirectAPI.as_view(), name='direct_processed_video'),
+    path('api/video/<uuid:video_id>/stream/', api_views.ProcessedVideoStreamAPI.as_view(), name='processed_video_stream'),
+    path('api/video/<uuid:video_id>/stream/<path:name>', api_views.ProcessedVideoStreamFileAPI.as_view(), name='processed_video_stream_file'),
     
     # ==================== VIDEO MANAGEMENT ====================
     path('api/videos/', api_views.VideoListAPI.as_view(), name='video_list'),
@@ -0,0 +1,163 @@
+# trapickapp/video_serving.py
+import os
+import re
+import uuid
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+DEFAULT_VIDEO_SERVING = {
+    'SENDFILE': None,                       # None, 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect' (nginx)
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',   # nginx internal location aliased to MEDIA_ROOT
+    'CACHE_MAX_AGE': 0,                     # seconds browsers may reuse a video without revalidating
+}
+
+STREAM_BLOCK_SIZE = 256 * 1024
+RANGE_SPEC = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+def get_video_serving_settings():
+    config = dict(DEFAULT_VIDEO_SERVING)
+    config.update(getattr(settings, 'TRAPICK_VIDEO_SERVING', {}))
+    return config
+
+
+def parse_range_header(header, size):
+    """Byte ranges of a ``Range`` header as sorted, merged (start, end) pairs with inclusive ends.
+
+    Returns None when the header should be ignored (not a bytes range, or
+    malformed) and [] when no range is satisfiable.
+    """
+    if not header or not header.strip().lower().startswith('bytes='):
+        return None
+    ranges = []
+    for spec in header.split('=', 1)[1].split(','):
+        match = RANGE_SPEC.match(spec)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if first == '':
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0 or size == 0:
+                continue
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+        ranges.append((start, end))
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _read_ranges(path, ranges, parts=None):
+    """Yield the bytes of ``ranges``, each preceded by its multipart header when ``parts`` is given"""
+    with open(path, 'rb') as f:
+        for i, (start, end) in enumerate(ranges):
+            if parts:
+                yield parts[i]
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+                if not block:
+                    return
+                remaining -= len(block)
+                yield block
+        if parts:
+            yield parts[-1]
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def serve_video_file(request, path, filename, disposition='inline', content_type='video/mp4'):
+    """Serve a video file with byte ranges, conditional GET and optional front-server offload.
+
+    Range requests get 206 responses (multipart/byteranges for several
+    ranges) so players can seek without downloading from the start, and
+    ETag/Last-Modified let browsers revalidate instead of downloading again.
+    With ``SENDFILE`` configured, the front server streams the file and
+    handles ranges itself.
+    """
+    config = get_video_serving_settings()
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+
+    def with_headers(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Accept-Ranges'] = 'bytes'
+        response['Cache-Control'] = f"private, max-age={int(config['CACHE_MAX_AGE'])}"
+        return response
+
+    # 304 Not Modified / 412 Precondition Failed
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if conditional is not None:
+        return with_headers(conditional)
+
+    disposition_header = f'{disposition}; filename="{filename}"'
+    sendfile = (config['SENDFILE'] or '').lower()
+    if sendfile:
+        response = HttpResponse(content_type=content_type)
+        response['Content-Disposition'] = disposition_header
+        if sendfile == 'x-accel-redirect':
+            relative = os.path.relpath(os.path.abspath(path), os.path.abspath(settings.MEDIA_ROOT))
+            response['X-Accel-Redirect'] = config['ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + relative.replace(os.sep, '/')
+        else:
+            response['X-Sendfile'] = os.path.abspath(path)
+        return with_headers(response)
+
+    ranges = None
+    if _if_range_matches(request, etag, stat.st_mtime):
+        ranges = parse_range_header(request.META.get('HTTP_RANGE'), size)
+
+    if ranges is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Disposition'] = disposition_header
+        return with_headers(response)
+
+    if not ranges:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return with_headers(response)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(_read_ranges(path, ranges), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        boundary = uuid.uuid4().hex
+        parts = []
+        for i, (start, end) in enumerate(ranges):
+            lead = '\r\n' if i else ''
+            parts.append(f"{lead}--{boundary}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n".encode())
+        parts.append(f"\r\n--{boundary}--\r\n".encode())
+        length = sum(len(part) for part in parts) + sum(end - start + 1 for start, end in ranges)
+        response = StreamingHttpResponse(
+            _read_ranges(path, ranges, parts), status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+        )
+        response['Content-Length'] = str(length)
+    response['Content-Disposition'] = disposition_header
+    return with_headers(response)